@@ -2,22 +2,44 @@ from typing import Awaitable, TypeVar
 
 from dependency_injector import containers, providers
 from faststream.redis import RedisBroker
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.infra.aiogram import get_bot
 from app.infra.aiogram.event import AiogramEventPublisher
+from app.infra.aiogram.limits import TelegramRateLimiter
+from app.infra.database.notifications import (
+    DELIVERY_TASKS_CHANNEL,
+    OUTBOX_CHANNEL,
+    SUBSCRIPTIONS_CHANNEL,
+    PgNotifications,
+    create_pg_notifications,
+)
+from app.infra.database.ownership import (
+    OUTBOX_RELAY_KEY,
+    PgPartitionOwnership,
+    create_pg_partition_ownership,
+)
 from app.infra.database.uows.billing import PgBillingUnitOfWork
 from app.infra.database.uows.engine import PgEngineUnitOfWork
 from app.infra.database.uows.outbox import PgOutboxUnitOfWork
 from app.infra.grpc.channel import generate_create_channel_context
 from app.infra.grpc.engine import create_grpc_manager
 from app.infra.logging import logger
-from app.infra.redis.broker import get_redis, get_redis_broker
+from app.infra.redis.broker import create_redis, get_redis, get_redis_broker
+from app.infra.redis.digests import KeyspaceDigests
+from app.infra.redis.snapshots import EngineSnapshotCache
+from app.infra.utils.executor import KeyedExecutor, create_keyed_executor
+from app.infra.utils.jobs import PeriodicJob
+from app.infra.utils.lru import LRUCache
+from app.infra.utils.stats import StatsRegistry
 from app.services.billing import BillingService
 from app.services.delivery import BotDeliveryTaskService
 from app.services.engine import EngineService
 from app.services.fanout import BotTaskFanoutPlanner
 from app.services.outbox import OutboxService
+from app.services.retention import OutboxRetentionService
+from app.services.routing import SubscriptionRoutingIndex
 
 ResourceT = TypeVar("ResourceT")
 
@@ -37,6 +59,7 @@ class OutboxResource(providers.Resource[ResourceT]):
 class Container(containers.DeclarativeContainer):
     config = providers.Configuration()
     logger = providers.Object(logger)
+    stats = providers.Singleton(StatsRegistry)
 
     plain_engine = providers.Singleton(
         create_async_engine,
@@ -61,6 +84,19 @@ class Container(containers.DeclarativeContainer):
         async_sessionmaker[AsyncSession], plain_engine
     )
     tx_sessionmaker = providers.Singleton(async_sessionmaker[AsyncSession], tx_engine)
+    pg_notifications = OutboxResource[PgNotifications](
+        create_pg_notifications,  # type: ignore
+        config.postgres.dsn,
+        channels=[OUTBOX_CHANNEL, DELIVERY_TASKS_CHANNEL, SUBSCRIPTIONS_CHANNEL],
+        logger=logger,
+    )
+    outbox_partitions = OutboxResource[PgPartitionOwnership](
+        create_pg_partition_ownership,  # type: ignore
+        config.postgres.dsn,
+        key=OUTBOX_RELAY_KEY,
+        count=config.outbox.relay_partitions,
+        logger=logger,
+    )
     redis_broker = EventsResource[Awaitable[RedisBroker]](
         get_redis_broker,  # type: ignore
         config.redis.dsn,
@@ -71,6 +107,15 @@ class Container(containers.DeclarativeContainer):
         get_redis,
         redis_broker,
     )
+    keyspace_digests = providers.Singleton(
+        KeyspaceDigests, redis, buckets=config.events.reconcile_buckets
+    )
+    keyevents_executor = EventsResource[KeyedExecutor](
+        create_keyed_executor,  # type: ignore
+        lanes=config.events.lanes,
+        queue_size=config.events.lane_queue_size,
+        logger=logger,
+    )
     create_channel_context = providers.Singleton(
         generate_create_channel_context,
         logger,
@@ -83,7 +128,23 @@ class Container(containers.DeclarativeContainer):
     )
 
     engine_manager = ApiResource(create_grpc_manager, create_channel_context)
-    event_publisher = providers.Singleton(AiogramEventPublisher, bot, logger=logger)
+    telegram_limiter = providers.Singleton(
+        TelegramRateLimiter,
+        global_rate=config.aiogram.global_rate,
+        chat_rate=config.aiogram.chat_rate,
+        chat_burst=config.aiogram.chat_burst,
+        max_wait=config.aiogram.max_wait,
+    )
+    rendered_messages = providers.Singleton(
+        LRUCache, maxsize=config.outbox.render_cache_size
+    )
+    event_publisher = providers.Singleton(
+        AiogramEventPublisher,
+        bot,
+        logger=logger,
+        limiter=telegram_limiter,
+        texts=rendered_messages,
+    )
 
     engine_uow = providers.Factory(
         PgEngineUnitOfWork,
@@ -105,19 +166,65 @@ class Container(containers.DeclarativeContainer):
         BillingService,
         billing_uow,
     )
+    subscription_routes = providers.Singleton(
+        SubscriptionRoutingIndex, billing_uow, logger=logger
+    )
     bot_fanout_planner = providers.Factory(
-        BotTaskFanoutPlanner, billing_service=billing_service, logger=logger
+        BotTaskFanoutPlanner,
+        routes=subscription_routes,
+        logger=logger,
+        mode=config.outbox.fanout_mode,
+    )
+    delivery_events = providers.Singleton(
+        LRUCache, maxsize=config.outbox.render_cache_size
     )
     delivery_task_service = providers.Factory(
         BotDeliveryTaskService,
         outbox_uow,
-        billing_service,
+        subscription_routes,
         event_publisher,
         logger=logger,
+        lease=config.outbox.delivery_lease,
+        max_postpone=config.outbox.delivery_max_postpone,
+        events=delivery_events,
+    )
+    engine_versions = providers.Singleton(
+        LRUCache, maxsize=config.events.version_cache_size
+    )
+    # Shut down by every app resolving `engine_snapshots`
+    snapshot_redis = providers.Resource[Redis](
+        create_redis, config.redis.dsn, db=config.redis.db
+    )
+    engine_snapshots = providers.Selector(
+        config.engines.snapshot_backend,
+        local=providers.Singleton(
+            EngineSnapshotCache,
+            maxsize=config.engines.snapshot_cache_size,
+            ttl=config.engines.snapshot_ttl,
+        ),
+        redis=providers.Singleton(
+            EngineSnapshotCache,
+            maxsize=config.engines.snapshot_cache_size,
+            ttl=config.engines.snapshot_ttl,
+            redis=snapshot_redis,
+            redis_ttl=config.engines.snapshot_redis_ttl,
+        ),
     )
     engine_service = providers.Factory(
-        EngineService, engine_uow, engine_manager, logger=logger
+        EngineService,
+        engine_uow,
+        engine_manager,
+        logger=logger,
+        versions=engine_versions,
+        fast_transitions=config.events.fast_transitions,
+        snapshots=engine_snapshots,
+    )
+    dead_engines_purge = providers.Singleton(
+        PeriodicJob, interval=config.engines.purge_interval
     )
     outbox_service = providers.Factory(
         OutboxService, outbox_uow, bot_fanout_planner, logger=logger
     )
+    outbox_retention_service = providers.Factory(
+        OutboxRetentionService, outbox_uow, logger=logger
+    )
@@ -0,0 +1,63 @@
+import asyncio
+from contextlib import asynccontextmanager
+from logging import Logger
+
+from dependency_injector.wiring import Provide, inject
+
+from app.container import Container
+from app.infra.utils.jobs import PeriodicJob
+from app.services.engine import EngineService
+
+
+@inject
+async def _purge(
+    *,
+    min_age: int,
+    chunk_size: int,
+    max_cascade: int,
+    engine_service: EngineService = Provide[Container.engine_service],
+) -> int:
+    return await engine_service.purge_dead_engines(
+        min_age=min_age, chunk_size=chunk_size, max_cascade=max_cascade
+    )
+
+
+@asynccontextmanager
+async def start_dead_engines_purger(
+    job: PeriodicJob,
+    logger: Logger,
+    *,
+    min_age: int,
+    chunk_size: int,
+    max_cascade: int,
+):
+    """
+    Run the purge of DEAD engines on the schedule of `job`.
+
+    Engines are only purged once they have been DEAD for `min_age` seconds,
+    in chunks of at most `chunk_size` engines, see
+    `EngineService.purge_dead_engines`.
+    """
+
+    async def _loop():
+        while True:
+            await job.wait()
+
+            try:
+                await _purge(
+                    min_age=min_age, chunk_size=chunk_size, max_cascade=max_cascade
+                )
+            except Exception:
+                logger.error("Failed to purge dead engines:", exc_info=True)
+
+    task = asyncio.create_task(_loop())
+
+    try:
+        yield
+    finally:
+        task.cancel()
+
+        try:
+            await task  # Forward erros from task
+        except asyncio.CancelledError:
+            pass
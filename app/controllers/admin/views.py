@@ -15,6 +15,7 @@ from sqladmin.helpers import slugify_class_name
 from app.container import Container
 from app.domains.engine import EngineDead, EngineRestored, EngineStatus, EngineUpdated
 from app.infra.database import aggregates, models
+from app.infra.utils.jobs import PeriodicJob
 from app.services.billing import BillingService
 from app.services.engine import EngineService
 
@@ -92,19 +93,14 @@ class EngineView(ModelView, model=models.Engine):
     async def remove_dead_engines(
         self,
         request,
-        engine_service: EngineService = Provide[Container.engine_service],
-        logger: Logger = Provide[Container.logger],
+        purge: PeriodicJob = Provide[Container.dead_engines_purge],
     ):
         scope = get_current_scope()
         path_format, _, _ = request.scope["path"].rpartition("/")
         path_format += "/{action}"
         scope.set_transaction_name(f"{request.method} {path_format}")
 
-        try:
-            await engine_service.remove_dead_engines()
-        except Exception:
-            logger.error("Error occurred while removing dead engines.")
-            raise
+        purge.trigger()  # Runs in the background, see `start_dead_engines_purger`
 
         return RedirectResponse(request.url_for("admin:list", identity=self.identity))
 
@@ -0,0 +1,3 @@
+from app.controllers.api.engines import create_engines_router
+
+__all__ = ["create_engines_router"]
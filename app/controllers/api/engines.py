@@ -0,0 +1,124 @@
+import hmac
+from typing import AsyncIterator
+
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.container import Container
+from app.domains.engine import Engine, Version
+from app.schemas.engine import EngineChangeDTO, EngineChangesDTO
+from app.services.engine import EngineService
+
+
+@inject
+async def _get_changes(
+    since: Version,
+    *,
+    until: Version,
+    limit: int,
+    engine_service: EngineService = Provide[Container.engine_service],
+) -> list[Engine]:
+    return await engine_service.get_changes(since, until=until, limit=limit)
+
+
+@inject
+async def _get_settled_version(
+    settle: float,
+    *,
+    engine_service: EngineService = Provide[Container.engine_service],
+) -> Version:
+    return await engine_service.get_settled_version(settle)
+
+
+def _parse_since(since: str) -> Version:
+    try:
+        return Version.from_stream_id(since if "-" in since else f"{since}-0")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="`since` must be a version in stream ID form: <ts>-<seq>.",
+        )
+
+
+def create_engines_router(
+    *, token: str, page_size: int, max_limit: int, settle: float
+) -> APIRouter:
+    """
+    Router of the engine change feed.
+
+    Engines are returned in version order, read by keyset pagination over the
+    version columns in pages of `page_size`, so a sync costs O(changes).
+    Engines purged after being DEAD leave the feed, see
+    `EngineService.purge_dead_engines`.
+
+    Versions are not committed in version order: a keyevent may be applied
+    after newer ones, e.g. once it is reclaimed. Only versions older than
+    `settle` seconds are served, so a cursor never passes a version which is
+    still to be committed; the feed lags behind by that much. The age is
+    measured by the database clock, once per request, so the clock of the
+    API host does not shift the window.
+    """
+    bearer = HTTPBearer()
+
+    def _authorize(credentials: HTTPAuthorizationCredentials = Depends(bearer)):
+        if not hmac.compare_digest(credentials.credentials, token):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+    router = APIRouter(prefix="/engines", dependencies=[Depends(_authorize)])
+
+    async def _iter_changes(
+        since: Version, limit: int | None
+    ) -> AsyncIterator[list[Engine]]:
+        until = await _get_settled_version(settle)
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            engines = await _get_changes(since, until=until, limit=size)
+            if engines:
+                yield engines
+            if len(engines) < size:
+                return
+
+            since = engines[-1].version
+            if remaining is not None:
+                remaining -= len(engines)
+
+    @router.get("/changes", response_model=EngineChangesDTO)
+    async def get_changes(
+        since: str = "0-0",
+        limit: int = Query(default=page_size, ge=1, le=max_limit),
+    ):
+        """Engines changed after `since`, at most `limit` of them."""
+        cursor = _parse_since(since)
+        changes: list[EngineChangeDTO] = []
+        async for engines in _iter_changes(cursor, limit):
+            changes.extend(EngineChangeDTO.from_engine(e) for e in engines)
+
+        return EngineChangesDTO(
+            changes=changes,
+            next=changes[-1].version if changes else cursor.to_stream_id(),
+        )
+
+    @router.get("/changes/stream")
+    async def stream_changes(
+        since: str = "0-0",
+        limit: int | None = Query(default=None, ge=1),
+    ):
+        """
+        Engines changed after `since` as NDJSON, until the feed is caught up
+        or `limit` engines are sent.
+        """
+        cursor = _parse_since(since)
+
+        async def _lines():
+            async for engines in _iter_changes(cursor, limit):
+                yield "".join(
+                    EngineChangeDTO.from_engine(e).model_dump_json() + "\n"
+                    for e in engines
+                )
+
+        return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+    return router
@@ -1,258 +1,597 @@
 import asyncio
-import json
 from contextlib import asynccontextmanager
+from functools import partial
 from logging import Logger
-from typing import cast
 from uuid import UUID
 
 from dependency_injector.wiring import Provide, inject
-from faststream.broker.message import AckStatus
-from faststream.exceptions import AckMessage
 from faststream.redis import RedisMessage, RedisRouter
-from faststream.redis.message import UnifyRedisMessage
-from pydantic import BaseModel, computed_field
 from redis.asyncio import Redis
 from sentry_sdk import start_transaction
 
 from app.container import Container
-from app.domains.engine import Version
+from app.infra.redis.consumers import (
+    HANDOFF_LUA,
+    JanitorProgress,
+    get_consumers,
+    handoff_consumer,
+)
+from app.infra.redis.digests import KeyspaceDigests
+from app.infra.redis.keyevents import UnsupportedKeyeventError, decode_keyevent
+from app.infra.redis.reclaim import (
+    RECLAIM_LUA,
+    ReclaimedEntry,
+    ReclaimProgress,
+    ReclaimResult,
+    reclaim_entries,
+)
 from app.infra.redis.streams import (
-    BATCH,
     CONSUMER,
+    DEAD_CONSUMER_MS,
     GROUP,
     IDLE_MS,
+    JANITOR_PAUSE,
+    MAX_BATCH,
+    MAX_PAUSE,
     MAX_RETRY,
-    PAUSE,
+    MIN_BATCH,
+    MIN_PAUSE,
     dlq_stream,
     engine_stream,
+    make_engine_batch_stream,
 )
+from app.infra.redis.trim import TrimProgress, get_watermark
+from app.infra.utils.executor import KeyedExecutor
 from app.infra.utils.retry import retry
-from app.schemas.engine import EngineCmd, EngineInfoDTO
+from app.infra.utils.stats import StatsRegistry
+from app.schemas.engine import EngineStateCmd
 from app.services.engine import EngineService
 from app.services.exceptions.engine import EngineNotExistError
 
 router = RedisRouter()
 
 
-class RedisKeyEvent(BaseModel):
-    event: str
-    key: str
-    payload: str | None = None
+def _decode(stream_id: bytes, fields: dict[bytes, bytes]) -> EngineStateCmd | None:
+    """
+    Decode a raw keyevent entry.
 
-    @computed_field
-    @property
-    def parsed_payload(self) -> dict | None:
-        if self.payload:
-            return json.loads(self.payload)
+    Returns `None` for entries that should be acked and skipped: foreign keys
+    and unknown events. Malformed entries raise, so they stay pending and
+    end up in the DLQ through the reclaimer.
+    """
+    try:
+        return decode_keyevent(stream_id, fields, stream=engine_stream.name)
+    except UnsupportedKeyeventError as e:
+        _get_logger().warning(f"Skipped event from engine stream: {e}")
         return None
 
 
-KEY_PREFIX = "xrayEngines:"
+def _event_name(cmd: EngineStateCmd) -> str:
+    return "expired" if cmd.engine is None else "hset"
 
 
-def _check_prefix(key: str, logger: Logger = Provide[Container.logger]):
-    if KEY_PREFIX not in key:
-        logger.warning(f"Received event from engine stream with invalid key: <{key}>.")
-        raise AckMessage()
+@inject
+def _get_logger(logger: Logger = Provide[Container.logger]):
+    return logger
+
 
+@router.subscriber(stream=engine_stream, no_ack=True)
+async def handle_keyevents(message: RedisMessage):
+    raw_message = message.raw_message
+    stream_id: bytes = raw_message["message_ids"][0]
 
-def _get_stream_id(message: RedisMessage) -> str:
-    raw_message = getattr(message, "raw_message")
-    return raw_message["message_ids"][0].decode()
+    try:
+        cmd = _decode(stream_id, raw_message["data"])
+    except Exception:
+        _get_logger().error(
+            f"Malformed keyevent [{stream_id.decode()}]:", exc_info=True
+        )
+        return
 
+    if cmd is None:
+        await ack_keyevents([stream_id])
+        return
 
-def _get_event_id(message: RedisMessage):
-    stream_name: str = message.raw_message["channel"]
-    message_id: str = _get_stream_id(message)
-    return "{0}:{1}".format(stream_name, message_id)
+    await dispatch_keyevent(cmd, stream_id)
 
 
 @inject
-def _get_logger(logger: Logger = Provide[Container.logger]):
-    return logger
+async def dispatch_keyevent(
+    cmd: EngineStateCmd,
+    stream_id: bytes,
+    executor: KeyedExecutor = Provide[Container.keyevents_executor],
+):
+    """
+    Hand the entry over to the lane of its engine.
 
+    Returns as soon as the entry is queued, so the subscriber keeps reading
+    while other engines are processed. The entry is acked by the lane once
+    it is processed; failed entries stay pending for the reclaimer.
+    """
+
+    async def _job():
+        if not await process_keyevent(cmd):
+            return
+
+        try:
+            await ack_keyevents([stream_id])
+        except Exception:
+            _get_logger().error(
+                f"Failed to ack event id [{stream_id.decode()}]:", exc_info=True
+            )
+
+    await executor.submit(str(cmd.id), _job)
 
-@router.subscriber(stream=engine_stream)
-async def handle_keyevents(
-    key_event: RedisKeyEvent,
-    message: RedisMessage,
-):
-    _check_prefix(key_event.key)
 
-    engine_key = key_event.key.removeprefix(KEY_PREFIX)
-    stream_id = _get_stream_id(message)
-    caused_by = _get_event_id(message)
-    version = Version.from_stream_id(stream_id)
+async def process_keyevent(cmd: EngineStateCmd) -> bool:
+    """
+    Process a single decoded keyevent.
 
+    Returns:
+        bool: `True` if the entry may be acked, `False` if it should be retried.
+    """
+    event = _event_name(cmd)
+    stream_id = cmd.version.to_stream_id()
     logger = _get_logger()
 
-    tr_name = f"{key_event.event.upper()} /engines/{'{engine_id}'}"
+    tr_name = f"{event.upper()} /engines/{'{engine_id}'}"
     with start_transaction(op="queue.task", name=tr_name) as tr:
-        tr.set_tag("engine_key", engine_key)
-        tr.set_tag("outbox_id", caused_by)
-        tr.set_tag("version", version.to_stream_id())
+        tr.set_tag("engine_key", str(cmd.id))
+        tr.set_tag("outbox_id", cmd.caused_by)
+        tr.set_tag("version", stream_id)
 
         try:
-            match key_event.event:
-                case "expired":
-                    await handle_engine_dead(
-                        engine_key=engine_key,
-                        outbox_id=caused_by,
-                        version=version,
-                    )
-                case "hset":
-                    await handle_engine_info_changed(
-                        engine_key=engine_key,
-                        outbox_id=caused_by,
-                        payload=cast(dict, key_event.parsed_payload),
-                        version=version,
-                    )
-                case _:
-                    logger.warning(f"Unknown event type: {key_event.event}")
+            await handle_engine_state(cmd)
         except Exception as e:
             logger.error(
-                f"Error processing event [{key_event.event}] for engine [{engine_key}]  id [{stream_id}]: {e}",
+                f"Error processing event [{event}] for engine [{cmd.id}]  id [{stream_id}]: {e}",
                 exc_info=True,
             )
-            await message.nack()
+            return False
         else:
             logger.info(
-                f"Processed event [{key_event.event}] for engine [{engine_key}] id [{stream_id}]",
+                f"Processed event [{event}] for engine [{cmd.id}] id [{stream_id}]",
                 extra=dict(channel=engine_stream.name),
             )
+            await track_keyspace([cmd])
+            return True
 
 
 @inject
-async def handle_engine_dead(
-    *,
-    engine_key: str,
-    outbox_id: str,
-    version: Version,
+async def handle_engine_state(
+    cmd: EngineStateCmd,
     engine_service: EngineService = Provide[Container.engine_service],
     logger: Logger = Provide[Container.logger],
 ):
+    if cmd.engine is not None:
+        await engine_service.upsert(
+            cmd.engine, caused_by=cmd.caused_by, version=cmd.version
+        )
+        return
+
     try:
         await engine_service.mark_dead(
-            UUID(engine_key), caused_by=outbox_id, version=version
+            cmd.id, caused_by=cmd.caused_by, version=cmd.version
         )
     except EngineNotExistError as e:
         logger.warning(str(e))
 
 
+def _coalesce(
+    fields: list[dict[bytes, bytes]], ids: list[bytes], logger: Logger
+) -> tuple[list[EngineStateCmd], list[bytes]]:
+    """
+    Collapse a batch of keyevents to the newest `Version` per engine.
+
+    Returns survivors and the ids that may be acked once the survivors are
+    applied: superseded entries, entries with foreign keys and unknown events.
+    Entries that fail to decode are left out of both so they stay pending
+    and end up in the DLQ through the reclaimer.
+    """
+    survivors: dict[UUID, EngineStateCmd] = {}
+    acks: list[bytes] = []
+
+    for entry, raw_id in zip(fields, ids):
+        try:
+            cmd = _decode(raw_id, entry)
+        except Exception:
+            logger.error(f"Malformed keyevent [{raw_id.decode()}]:", exc_info=True)
+            continue
+
+        acks.append(raw_id)
+        if cmd is None:
+            continue
+
+        current = survivors.get(cmd.id)
+        if current is None or current.version.is_newer(cmd.version):
+            survivors[cmd.id] = cmd
+
+    return list(survivors.values()), acks
+
+
+async def handle_keyevents_batch(message: RedisMessage):
+    raw_message = message.raw_message
+    ids: list[bytes] = raw_message["message_ids"]
+    logger = _get_logger()
+    cmds, acks = _coalesce(raw_message["data"], ids, logger)
+
+    with start_transaction(op="queue.task", name="BATCH /engines") as tr:
+        tr.set_tag("batch_size", len(ids))
+        tr.set_tag("survivors_count", len(cmds))
+
+        try:
+            if cmds:
+                await apply_engine_changes(cmds)
+        except Exception as e:
+            # Nothing is acked, the whole batch is retried by the reclaimer
+            logger.error(
+                f"Error processing batch of {len(ids)} events: {e}", exc_info=True
+            )
+            return
+
+        await track_keyspace(cmds)
+        if acks:
+            await ack_keyevents(acks)
+
+        logger.info(
+            f"Processed batch of {len(ids)} events, applied: {len(cmds)}",
+            extra=dict(channel=engine_stream.name),
+        )
+
+
 @inject
-async def handle_engine_info_changed(
-    *,
-    engine_key: str,
-    outbox_id: str,
-    payload: dict,
-    version: Version,
+async def apply_engine_changes(
+    cmds: list[EngineStateCmd],
     engine_service: EngineService = Provide[Container.engine_service],
 ):
-    payload["id"] = engine_key
-    engine = EngineInfoDTO.model_validate_strings(payload)
+    await engine_service.apply(cmds)
+
 
-    await engine_service.upsert(
-        EngineCmd.model_validate(engine), caused_by=outbox_id, version=version
+@inject
+async def track_keyspace(
+    cmds: list[EngineStateCmd],
+    digests: KeyspaceDigests = Provide[Container.keyspace_digests],
+    logger: Logger = Provide[Container.logger],
+):
+    """
+    Count the engines of processed keyevents into the keyspace digests.
+
+    Digests only steer the reconciler, which corrects them, so a failure is
+    logged instead of retrying the keyevents.
+    """
+    try:
+        await digests.track({cmd.id: cmd.engine is not None for cmd in cmds})
+    except Exception:
+        logger.warning("Failed to track keyspace digests:", exc_info=True)
+
+
+@inject
+async def ack_keyevents(ids: list[bytes], redis: Redis = Provide[Container.redis]):
+    await redis.xack(engine_stream.name, GROUP, *ids)
+
+
+def create_batch_router(max_records: int) -> RedisRouter:
+    """
+    Router consuming the engine stream in batches of `max_records`.
+
+    Entries are acked manually with a single `XACK` after the coalesced
+    batch is committed.
+    """
+    batch_router = RedisRouter()
+    batch_router.subscriber(stream=make_engine_batch_stream(max_records), no_ack=True)(
+        handle_keyevents_batch
     )
+    return batch_router
 
 
 @asynccontextmanager
-async def start_keyevents_reclaimer(redis: Redis, logger: Logger):
-    @retry()
-    async def _get_entries(cursor: str) -> tuple[str, list]:
-        cursor, entries = await redis.xautoclaim(
-            engine_stream.name,
-            groupname=GROUP,
-            consumername=CONSUMER,
-            min_idle_time=IDLE_MS,
-            start_id=cursor,
-            count=BATCH,
-        )
-        return cursor, entries
+async def start_keyevents_reclaimer(
+    redis: Redis, executor: KeyedExecutor, stats: StatsRegistry, logger: Logger
+):
+    reclaim_script = redis.register_script(RECLAIM_LUA)
+    progress = ReclaimProgress(claim_size=MIN_BATCH, pause=MIN_PAUSE)
+    stats.register("reclaimer", progress.as_dict)
 
     @retry()
-    async def _get_deliveries_map(
-        *, min: bytes, max: bytes, count: int
-    ) -> dict[bytes, int]:
-        pendings = await redis.xpending_range(
-            engine_stream.name,
-            groupname=GROUP,
-            min=min,
-            max=max,
+    async def _reclaim(cursor: str, count: int) -> ReclaimResult:
+        return await reclaim_entries(
+            reclaim_script,
+            stream=engine_stream.name,
+            dlq=dlq_stream.name,
+            group=GROUP,
+            consumer=CONSUMER,
+            min_idle_ms=IDLE_MS,
+            start_id=cursor,
             count=count,
-            consumername=CONSUMER,
+            max_retry=MAX_RETRY,
         )
-        deliveries_map: dict[bytes, int] = {
-            msg["message_id"]: msg["times_delivered"] for msg in pendings
-        }
-        return deliveries_map
 
     @retry()
-    async def _send_to_dlq(body: dict):
-        await redis.xadd(dlq_stream.name, body)
+    async def _get_pending_bounds() -> tuple[int, str | None, str | None]:
+        summary = await redis.xpending(engine_stream.name, GROUP)
+        first, last = summary["min"], summary["max"]
+        return (
+            summary["pending"],
+            first.decode() if first is not None else None,
+            last.decode() if last is not None else None,
+        )
 
     @retry()
     async def _xack_events(ids: list):
         await redis.xack(engine_stream.name, GROUP, *ids)
 
+    async def _process_group(
+        entries: list[tuple[bytes, EngineStateCmd]],
+    ) -> list[bytes]:
+        processed = []
+        for msg_id, cmd in entries:
+            if await process_keyevent(cmd):
+                processed.append(msg_id)
+        return processed
+
+    async def _handle(entries: list[ReclaimedEntry]):
+        groups: dict[str, list[tuple[bytes, EngineStateCmd]]] = {}
+        skipped: list[bytes] = []
+
+        for entry in entries:
+            try:
+                cmd = _decode(entry.id, entry.fields)
+            except Exception:
+                logger.error(
+                    f"Malformed keyevent [{entry.id.decode()}]:", exc_info=True
+                )
+                continue
+
+            if cmd is None:
+                skipped.append(entry.id)
+                continue
+
+            groups.setdefault(str(cmd.id), []).append((entry.id, cmd))
+
+        futures = [
+            await executor.submit(key, partial(_process_group, group))
+            for key, group in groups.items()
+        ]
+
+        xacks = skipped
+        for future in futures:
+            try:
+                xacks.extend(await future)
+            except Exception:  # Unhandled error
+                logger.error("Unhandled error in keyevents handler:", exc_info=True)
+
+        if len(xacks) != 0:
+            await _xack_events(xacks)
+
     async def _loop():
-        cursor = "0-0"
+        pass_claimed = 0
 
         while True:
-            cursor, entries = await _get_entries(cursor)
+            if progress.cursor == "0-0":
+                pending, first, last = await _get_pending_bounds()
+                progress.pending, progress.first_id, progress.last_id = (
+                    pending,
+                    first,
+                    last,
+                )
+                progress.passes += 1
+                pass_claimed = 0
+
+            result = await _reclaim(progress.cursor, progress.claim_size)
+            progress.cursor = result.cursor
 
-            if len(entries) == 0:
-                await asyncio.sleep(PAUSE)
+            claimed = len(result.entries) + result.dead_lettered
+            progress.claimed += len(result.entries)
+            progress.dead_lettered += result.dead_lettered
+            pass_claimed += claimed
+
+            if result.dead_lettered != 0:
+                logger.warning(
+                    f"Moved {result.dead_lettered} keyevents to DLQ",
+                    extra=dict(channel=dlq_stream.name),
+                )
+
+            if len(result.entries) != 0:
+                await _handle(result.entries)
+
+            if claimed >= progress.claim_size:
+                # Backlog: grow the claim and keep going without sleeping
+                progress.claim_size = min(progress.claim_size * 2, MAX_BATCH)
                 continue
 
-            ids: list[bytes] = [id for id, _ in entries]
-            ids_sorted = sorted(
-                ids, key=lambda x: (int(x.split(b"-")[0]), int(x.split(b"-")[1]))
-            )
+            progress.claim_size = max(progress.claim_size // 2, MIN_BATCH)
+
+            if progress.cursor != "0-0":
+                continue  # Pass is not finished yet
+
+            if pass_claimed == 0:
+                progress.pause = min(progress.pause * 2, MAX_PAUSE)
+            else:
+                progress.pause = MIN_PAUSE
 
-            deliveries_map = await _get_deliveries_map(
-                min=ids_sorted[0], max=ids_sorted[-1], count=len(ids_sorted)
+            await asyncio.sleep(progress.pause)
+
+    async def _wrap():
+        try:
+            await _loop()
+        except Exception:
+            logger.critical(
+                "Unhandled error occured in keyevents reclaimer:", exc_info=True
             )
 
-            xacks = []
+    task = asyncio.create_task(_wrap())
 
-            for msg_id, raw in entries:
-                deliveries = deliveries_map.get(msg_id, 1)
+    try:
+        yield
+    finally:
+        task.cancel()
 
-                if deliveries > MAX_RETRY:
-                    raw[b"original_id"] = msg_id
-                    await _send_to_dlq(raw)  # Send message to DLQ
-                    xacks.append(msg_id)
-                    continue
+        try:
+            await task  # Forward erros from task
+        except asyncio.CancelledError:
+            pass
 
-                payload = {k.decode(): v.decode() for k, v in raw.items()}
-                event = RedisKeyEvent(**payload)
-                msg = UnifyRedisMessage(
-                    raw_message=dict(
-                        type="message", channel=engine_stream.name, data=raw
-                    ),
-                    body=raw,
-                )
-                cast(dict, msg.raw_message)["message_ids"] = [msg_id]
 
-                try:
-                    await handle_keyevents(event, msg)
-                except Exception:  # Unhandled error
-                    logger.error("Unhandled error in keyevents handler:", exc_info=True)
+@asynccontextmanager
+async def start_consumers_janitor(redis: Redis, stats: StatsRegistry, logger: Logger):
+    """
+    Keep the engine stream consumer group free of dead consumers.
+
+    Consumers idle for longer than `DEAD_CONSUMER_MS` hand their pending
+    entries off to this worker, where the reclaimer processes them, and are
+    deleted from the group. Retiring a consumer that is merely quiet is
+    harmless: Redis recreates it on its next read.
+    """
+    handoff_script = redis.register_script(HANDOFF_LUA)
+    progress = JanitorProgress()
+    stats.register("consumers", progress.as_dict)
+
+    @retry()
+    async def _handoff(consumer: str) -> tuple[int, bool]:
+        return await handoff_consumer(
+            handoff_script,
+            stream=engine_stream.name,
+            group=GROUP,
+            consumer=consumer,
+            target=CONSUMER,
+            idle_ms=IDLE_MS,
+            count=MAX_BATCH,
+        )
+
+    @retry()
+    async def _get_consumers():
+        return await get_consumers(redis, stream=engine_stream.name, group=GROUP)
+
+    async def _retire(consumer: str):
+        moved, deleted = 0, False
+        while not deleted:
+            chunk, deleted = await _handoff(consumer)
+            moved += chunk
+
+        progress.handed_off += moved
+        progress.retired += 1
+        logger.warning(
+            f"Retired consumer [{consumer}], handed off {moved} pending keyevents",
+            extra=dict(channel=engine_stream.name),
+        )
+
+    async def _loop():
+        while True:
+            consumers = await _get_consumers()
+            progress.passes += 1
+            progress.pel = {c.name: c.pending for c in consumers}
+
+            for consumer in consumers:
+                if consumer.name == CONSUMER or consumer.idle_ms < DEAD_CONSUMER_MS:
                     continue
 
-                if msg.committed != AckStatus.nacked:
-                    xacks.append(msg_id)
+                await _retire(consumer.name)
+                progress.pel.pop(consumer.name, None)
 
-            if len(xacks) != 0:
-                await _xack_events(xacks)
+            await asyncio.sleep(JANITOR_PAUSE)
 
     async def _wrap():
         try:
             await _loop()
         except Exception:
             logger.critical(
-                "Unhandled error occured in keyevents reclaimer:", exc_info=True
+                "Unhandled error occured in consumers janitor:", exc_info=True
+            )
+
+    task = asyncio.create_task(_wrap())
+
+    try:
+        yield
+    finally:
+        task.cancel()
+
+        try:
+            await task  # Forward erros from task
+        except asyncio.CancelledError:
+            pass
+
+
+@asynccontextmanager
+async def start_streams_trimmer(
+    redis: Redis,
+    stats: StatsRegistry,
+    logger: Logger,
+    *,
+    interval: int,
+    margin: int,
+    dlq_maxlen: int,
+    dlq_max_age: int,
+):
+    """
+    Keep the engine stream and the DLQ bounded.
+
+    The engine stream is trimmed with `XTRIM MINID` up to the lowest id still
+    needed by any consumer group, minus `margin` seconds of history. The DLQ
+    is capped by `dlq_maxlen` entries and `dlq_max_age` seconds. Trimming is
+    approximate, so Redis only drops whole stream nodes.
+    """
+    progress = TrimProgress()
+    stats.register("trimmer", progress.as_dict)
+
+    @retry()
+    async def _trim_engine_stream():
+        watermark = await get_watermark(redis, engine_stream.name)
+        progress.watermark = watermark
+        if watermark is None:
+            return
+
+        ts = int(watermark.split("-", 1)[0]) - margin * 1000
+        if ts <= 0:
+            return
+
+        progress.min_id = f"{ts}-0"
+        progress.trimmed += await redis.xtrim(
+            engine_stream.name, minid=progress.min_id, approximate=True
+        )
+
+    @retry()
+    async def _trim_dlq():
+        if dlq_maxlen > 0:
+            progress.dlq_trimmed += await redis.xtrim(
+                dlq_stream.name, maxlen=dlq_maxlen, approximate=True
+            )
+
+        if dlq_max_age > 0:
+            now, _ = await redis.time()
+            min_id = f"{(now - dlq_max_age) * 1000}-0"
+            progress.dlq_trimmed += await redis.xtrim(
+                dlq_stream.name, minid=min_id, approximate=True
+            )
+
+    @retry()
+    async def _measure():
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.xlen(engine_stream.name)
+            pipe.memory_usage(engine_stream.name)
+            pipe.xlen(dlq_stream.name)
+            pipe.memory_usage(dlq_stream.name)
+            (
+                progress.length,
+                progress.memory,
+                progress.dlq_length,
+                progress.dlq_memory,
+            ) = await pipe.execute()
+
+    async def _loop():
+        while True:
+            await _trim_engine_stream()
+            await _trim_dlq()
+            await _measure()
+            progress.passes += 1
+
+            await asyncio.sleep(interval)
+
+    async def _wrap():
+        try:
+            await _loop()
+        except Exception:
+            logger.critical(
+                "Unhandled error occured in streams trimmer:", exc_info=True
             )
 
     task = asyncio.create_task(_wrap())
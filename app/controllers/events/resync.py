@@ -0,0 +1,322 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from logging import Logger
+from uuid import UUID
+
+from dependency_injector.wiring import Provide, inject
+from redis.asyncio import Redis
+
+from app.container import Container
+from app.domains.engine import Version
+from app.infra.redis.digests import KeyspaceDigests
+from app.infra.redis.keyevents import (
+    KEY_PREFIX,
+    SYNTHETIC_SEQ,
+    decode_engine_hash,
+    get_synthetic_ts,
+    scan_engine_keys,
+)
+from app.infra.utils.digest import Digest, add_to_digest, digest_key
+from app.infra.utils.stats import StatsRegistry
+from app.schemas.engine import EngineCmd, EngineStateCmd
+from app.services.engine import EngineService
+
+SCAN_COUNT = 1000
+CHUNK_SIZE = 2000
+
+
+async def _fetch_engines(
+    redis: Redis, keys: list[bytes], logger: Logger
+) -> list[EngineCmd]:
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hgetall(key)
+        hashes = await pipe.execute()
+
+    engines = []
+    for key, fields in zip(keys, hashes):
+        if not fields:
+            continue  # Expired between SCAN and HGETALL
+
+        try:
+            engines.append(decode_engine_hash(key, fields))
+        except Exception:
+            logger.error(f"Malformed engine hash [{key}]:", exc_info=True)
+    return engines
+
+
+async def resync_engines(
+    redis: Redis, engine_service: EngineService, logger: Logger
+) -> int:
+    """
+    Bootstrap engine state from the `xrayEngines:*` keyspace.
+
+    Hashes are fetched page by page with `SCAN` and pipelined `HGETALL` and
+    applied through `EngineService.apply` in transactions of `CHUNK_SIZE`,
+    with synthetic versions (see `get_synthetic_ts`).
+
+    Engines missing from the keyspace are left as is.
+
+    Returns:
+        Number of engines whose persistent state changed.
+    """
+    ts = await get_synthetic_ts(redis)
+    caused_by = f"resync:{ts}"
+
+    seen: set[UUID] = set()
+    cmds: list[EngineStateCmd] = []
+    changed = 0
+
+    logger.info("Resyncing engines from keyspace...")
+    async for keys in scan_engine_keys(redis, count=SCAN_COUNT):
+        for engine in await _fetch_engines(redis, keys, logger):
+            if engine.id in seen:
+                continue  # SCAN may return a key more than once
+            seen.add(engine.id)
+
+            version = Version(ts, SYNTHETIC_SEQ + len(seen))
+            cmds.append(
+                EngineStateCmd.model_construct(
+                    id=engine.id, version=version, caused_by=caused_by, engine=engine
+                )
+            )
+
+        while len(cmds) >= CHUNK_SIZE:
+            changed += await engine_service.apply(cmds[:CHUNK_SIZE])
+            del cmds[:CHUNK_SIZE]
+
+    if cmds:
+        changed += await engine_service.apply(cmds)
+
+    logger.info(f"Resynced {len(seen)} engines, changed: {changed}.")
+    return changed
+
+
+@inject
+async def _get_live_digests(
+    buckets: int, engine_service: EngineService = Provide[Container.engine_service]
+) -> dict[int, Digest]:
+    return await engine_service.get_live_digests(buckets)
+
+
+@inject
+async def _get_live_ids(
+    buckets: int,
+    selected: list[int],
+    engine_service: EngineService = Provide[Container.engine_service],
+) -> set[UUID]:
+    return await engine_service.get_live_ids(buckets, selected)
+
+
+@inject
+async def _apply(
+    cmds: list[EngineStateCmd],
+    engine_service: EngineService = Provide[Container.engine_service],
+) -> int:
+    return await engine_service.apply(cmds)
+
+
+@dataclass
+class ReconcileProgress:
+    passes: int = 0
+    full_passes: int = 0
+    compared_buckets: int = 0
+    mismatched_buckets: int = 0
+    marked_dead: int = 0
+    upserted: int = 0
+
+    def as_dict(self) -> dict:
+        return dict(
+            passes=self.passes,
+            full_passes=self.full_passes,
+            compared_buckets=self.compared_buckets,
+            mismatched_buckets=self.mismatched_buckets,
+            marked_dead=self.marked_dead,
+            upserted=self.upserted,
+        )
+
+
+async def _scan_keyspace(redis: Redis, buckets: int) -> dict[int, dict[UUID, bytes]]:
+    """Keys of the `xrayEngines:*` keyspace by engine id, per bucket."""
+    keyspace: dict[int, dict[UUID, bytes]] = {b: {} for b in range(buckets)}
+    async for keys in scan_engine_keys(redis, count=SCAN_COUNT):
+        for key in keys:
+            try:
+                id = UUID(key[len(KEY_PREFIX) :].decode())
+            except ValueError:
+                continue
+
+            bucket, _ = digest_key(id, buckets)
+            keyspace[bucket][id] = key  # SCAN may return a key more than once
+    return keyspace
+
+
+async def _find_keys(redis: Redis, ids: set[UUID]) -> dict[UUID, bytes]:
+    """Keys of the engines of `ids` which exist in the keyspace."""
+    keys = {id: KEY_PREFIX + str(id).encode() for id in ids}
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys.values():
+            pipe.exists(key)
+        found = await pipe.execute()
+
+    return {id: key for (id, key), exists in zip(keys.items(), found) if exists}
+
+
+@asynccontextmanager
+async def start_engines_reconciler(
+    redis: Redis,
+    digests: KeyspaceDigests,
+    stats: StatsRegistry,
+    logger: Logger,
+    *,
+    interval: int,
+    full_interval: int,
+):
+    """
+    Periodically converge the `engines` table to the `xrayEngines:*` keyspace.
+
+    Live engine ids on both sides are hashed into `digests.buckets` digests,
+    maintained incrementally: in Redis by the processed keyevents (see
+    `KeyspaceDigests`) and in Postgres by triggers on `engines`. A cycle
+    reads both sets of digests, one value per bucket, and compares only the
+    buckets which changed on either side since the previous cycle or did
+    not match then. Only ids of mismatched buckets are read: from Postgres,
+    and from the bucket members in Redis, checked against the keyspace with
+    `EXISTS`, so the per-engine work of a cycle scales with the drift.
+
+    Keyevents which are never processed leave the Redis digests behind the
+    keyspace, so every `full_interval` seconds they are rebuilt from a
+    keys-only `SCAN` and every bucket is compared.
+
+    Engines live in Postgres but absent from Redis are marked dead, engines
+    absent from Postgres are upserted, both through `EngineService` with
+    synthetic versions, so any keyevent newer than the snapshot wins.
+    """
+    buckets = digests.buckets
+    progress = ReconcileProgress()
+    stats.register("reconciler", progress.as_dict)
+
+    scanned_at = -math.inf
+    seen_keyspace: dict[int, Digest] = {}
+    seen_table: dict[int, Digest] = {}
+    suspects: set[int] = set()
+
+    async def _reconcile():
+        nonlocal scanned_at, seen_keyspace, seen_table, suspects
+
+        ts = await get_synthetic_ts(redis)
+        caused_by = f"reconcile:{ts}"
+
+        keyspace_digests = None
+        if time.monotonic() - scanned_at < full_interval:
+            keyspace_digests = await digests.get()
+
+        keyspace: dict[int, dict[UUID, bytes]] | None = None
+        if keyspace_digests is None:
+            scanned_at = time.monotonic()
+            keyspace = await _scan_keyspace(redis, buckets)
+            await digests.replace(
+                {b: set(keys) for b, keys in keyspace.items()}, init=True
+            )
+
+            keyspace_digests = {}
+            for bucket_keys in keyspace.values():
+                for id in bucket_keys:
+                    add_to_digest(keyspace_digests, *digest_key(id, buckets))
+            progress.full_passes += 1
+
+        table_digests = await _get_live_digests(buckets)
+
+        if keyspace is not None:
+            compared = set(range(buckets))
+        else:
+            compared = set(suspects)
+            for side, seen in (
+                (keyspace_digests, seen_keyspace),
+                (table_digests, seen_table),
+            ):
+                compared.update(
+                    b for b in side.keys() | seen.keys() if side.get(b) != seen.get(b)
+                )
+        seen_keyspace, seen_table = keyspace_digests, table_digests
+
+        mismatched = sorted(
+            b for b in compared if keyspace_digests.get(b) != table_digests.get(b)
+        )
+        suspects = set(mismatched)  # Compared again after the repair
+        progress.passes += 1
+        progress.compared_buckets = len(compared)
+        progress.mismatched_buckets = len(mismatched)
+        if not mismatched:
+            return
+
+        stored = await _get_live_ids(buckets, mismatched)
+
+        live: dict[UUID, bytes] = {}
+        if keyspace is not None:
+            for bucket in mismatched:
+                live.update(keyspace[bucket])
+        else:
+            members = await digests.get_members(mismatched)
+            live = await _find_keys(redis, stored.union(*members.values()))
+
+            corrected: dict[int, set[UUID]] = {b: set() for b in mismatched}
+            for id in live:
+                corrected[digest_key(id, buckets)[0]].add(id)
+            await digests.replace(corrected)
+
+        cmds: list[EngineStateCmd] = []
+        for id in sorted(stored - live.keys()):
+            version = Version(ts, SYNTHETIC_SEQ + len(cmds) + 1)
+            cmds.append(
+                EngineStateCmd.model_construct(
+                    id=id, version=version, caused_by=caused_by, engine=None
+                )
+            )
+        dead_count = len(cmds)
+
+        missing = [live[id] for id in sorted(live.keys() - stored)]
+        for engine in await _fetch_engines(redis, missing, logger):
+            version = Version(ts, SYNTHETIC_SEQ + len(cmds) + 1)
+            cmds.append(
+                EngineStateCmd.model_construct(
+                    id=engine.id, version=version, caused_by=caused_by, engine=engine
+                )
+            )
+
+        if not cmds:
+            return  # Only the keyspace digests drifted
+
+        logger.warning(
+            f"Engines drifted from keyspace in {len(mismatched)} buckets: "
+            f"{dead_count} to mark dead, {len(cmds) - dead_count} to upsert."
+        )
+        for start in range(0, len(cmds), CHUNK_SIZE):
+            await _apply(cmds[start : start + CHUNK_SIZE])
+
+        progress.marked_dead += dead_count
+        progress.upserted += len(cmds) - dead_count
+
+    async def _loop():
+        while True:
+            try:
+                await _reconcile()
+            except Exception:
+                logger.error("Failed to reconcile engines:", exc_info=True)
+
+            await asyncio.sleep(interval)
+
+    task = asyncio.create_task(_loop())
+
+    try:
+        yield
+    finally:
+        task.cancel()
+
+        try:
+            await task  # Forward erros from task
+        except asyncio.CancelledError:
+            pass
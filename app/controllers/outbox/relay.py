@@ -1,13 +1,23 @@
 import asyncio
 import traceback
 from contextlib import AsyncExitStack, asynccontextmanager
+from logging import Logger
 
 from dependency_injector.wiring import Provide, inject
 from sentry_sdk import start_transaction
 
 from app.container import Container
+from app.infra.database.notifications import (
+    DELIVERY_TASKS_CHANNEL,
+    OUTBOX_CHANNEL,
+    SUBSCRIPTIONS_CHANNEL,
+    PgNotifications,
+)
+from app.infra.database.ownership import PgPartitionOwnership
 from app.services.delivery import BotDeliveryTaskService
 from app.services.outbox import OutboxService
+from app.services.retention import OutboxRetentionService
+from app.services.routing import SubscriptionRoutingIndex
 
 
 @inject
@@ -46,22 +56,36 @@ def _relay(func):
 
 @_relay
 @inject
-async def _handle_outbox_batch(svc: OutboxService = Provide[Container.outbox_service]):
+async def _handle_outbox_batch(
+    svc: OutboxService = Provide[Container.outbox_service],
+    notifications: PgNotifications = Provide[Container.pg_notifications],
+    ownership: PgPartitionOwnership = Provide[Container.outbox_partitions],
+    poll_interval: float = Provide[Container.config.outbox.poll_interval],
+):
     while True:
+        # Only between batches, so no claimed record changes its owner
+        partitions = await ownership.rebalance()
+
         with start_transaction(
             op="worker", name="WORK /outbox/process-outbox-batch"
         ) as tx:
-            result = await svc.process_outbox_batch()
+            tx.set_tag("partitions_count", len(partitions.owned))
+            result = await svc.process_outbox_batch(partitions)
             if result == 0:
                 tx.set_tag("empty_batch", "1")
 
-        await asyncio.sleep(200 / 1000)
+        if result >= svc.batch_size:
+            continue  # More records are likely ready
+
+        await notifications.wait(OUTBOX_CHANNEL, timeout=poll_interval)
 
 
 @_relay
 @inject
 async def _handle_delivery_tasks_batch(
     svc: BotDeliveryTaskService = Provide[Container.delivery_task_service],
+    notifications: PgNotifications = Provide[Container.pg_notifications],
+    poll_interval: float = Provide[Container.config.outbox.poll_interval],
 ):
     while True:
         with start_transaction(
@@ -71,12 +95,53 @@ async def _handle_delivery_tasks_batch(
             if result == 0:
                 tx.set_tag("empty_batch", "1")
 
-        await asyncio.sleep(200 / 1000)
+        if result >= svc.batch_size:
+            continue  # More tasks are likely ready
+
+        await notifications.wait(DELIVERY_TASKS_CHANNEL, timeout=poll_interval)
+
+
+@_relay
+@inject
+async def _maintain_partitions(
+    svc: OutboxRetentionService = Provide[Container.outbox_retention_service],
+    interval: int = Provide[Container.config.outbox.partitions_interval],
+    premake: int = Provide[Container.config.outbox.partitions_premake],
+    retention_days: int = Provide[Container.config.outbox.retention_days],
+    retention_mode: str = Provide[Container.config.outbox.retention_mode],
+    logger: Logger = Provide[Container.logger],
+):
+    while True:
+        with start_transaction(op="worker", name="WORK /outbox/maintain-partitions"):
+            try:
+                created, removed = await svc.maintain_partitions(
+                    premake=premake,
+                    retention_days=retention_days,
+                    drop=retention_mode == "drop",
+                )
+                logger.info(
+                    f"Maintained outbox partitions, created: {created}, removed: {removed}."
+                )
+            except Exception:
+                logger.error("Failed to maintain outbox partitions:", exc_info=True)
+
+        await asyncio.sleep(interval)
+
+
+@inject
+async def _route_subscriptions(
+    routes: SubscriptionRoutingIndex = Provide[Container.subscription_routes],
+    notifications: PgNotifications = Provide[Container.pg_notifications],
+):
+    notifications.add_listener(SUBSCRIPTIONS_CHANNEL, routes.invalidate)
 
 
 @asynccontextmanager
 async def start_outbox_relay():
+    await _route_subscriptions()  # Before any lookup, so no change is missed
+
     async with AsyncExitStack() as stack:
         await stack.enter_async_context(_handle_outbox_batch())
         await stack.enter_async_context(_handle_delivery_tasks_batch())
+        await stack.enter_async_context(_maintain_partitions())
         yield
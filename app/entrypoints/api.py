@@ -6,8 +6,11 @@ from sentry_sdk.tracing import TransactionSource
 from sentry_sdk.types import Event
 
 from app.container import ApiResource, Container
+from app.controllers.admin import purge as purge_controller
 from app.controllers.admin import register_admin
+from app.controllers.api import create_engines_router
 from app.infra.config import settings
+from app.infra.redis.streams import IDLE_MS
 from app.infra.sentry import init_sentry
 
 
@@ -45,8 +48,17 @@ def create_lifespan(container: Container):
     @asynccontextmanager
     async def lifespan(_: FastAPI):
         await _maybe_future(container.init_resources(ApiResource))
-        yield
+
+        async with purge_controller.start_dead_engines_purger(
+            container.dead_engines_purge(),
+            container.logger(),
+            min_age=settings.engines.purge_min_dead_age,
+            chunk_size=settings.engines.purge_chunk_size,
+            max_cascade=settings.engines.purge_max_cascade,
+        ):
+            yield
         await _maybe_future(container.shutdown_resources(ApiResource))
+        await _maybe_future(container.snapshot_redis.shutdown())
 
     return lifespan
 
@@ -58,6 +70,8 @@ def create_app() -> FastAPI:
         modules=[
             "app.controllers.admin.main",
             "app.controllers.admin.views",
+            "app.controllers.admin.purge",
+            "app.controllers.api.engines",
         ]
     )
 
@@ -75,6 +89,17 @@ def create_app() -> FastAPI:
         secret=settings.admin.secret,
     )
 
+    if settings.api.token:
+        app.include_router(
+            create_engines_router(
+                token=settings.api.token,
+                page_size=settings.api.changes_page_size,
+                max_limit=settings.api.changes_max_limit,
+                # Versions are committed out of order until reclaimed keyevents are
+                settle=IDLE_MS / 1000 + settings.api.changes_settle_margin,
+            )
+        )
+
     return app
 
 
@@ -1,4 +1,6 @@
+import json
 from contextlib import asynccontextmanager
+from inspect import isawaitable
 
 from faststream.asgi import make_ping_asgi, AsgiFastStream, AsgiResponse, get
 from faststream import FastStream
@@ -8,7 +10,7 @@ from app.infra.sentry import init_sentry
 from app.infra.logging import logger
 from app.container import Container, EventsResource
 
-from app.controllers.events import engine
+from app.controllers.events import engine, resync
 
 
 def create_lifespan(container: Container, app: AsgiFastStream):
@@ -19,7 +21,12 @@ def create_lifespan(container: Container, app: AsgiFastStream):
     @asynccontextmanager
     async def lifespan():
         engine_broker = await container.redis_broker()
-        engine_broker.include_router(engine.router)
+        if settings.events.batch_size > 1:
+            engine_broker.include_router(
+                engine.create_batch_router(settings.events.batch_size)
+            )
+        else:
+            engine_broker.include_router(engine.router)
 
         app.mount("/readyz", make_ping_asgi(engine_broker, timeout=5.0))
 
@@ -33,9 +40,48 @@ def create_lifespan(container: Container, app: AsgiFastStream):
         redis = await container.redis()
 
         await _maybe_future(container.init_resources(EventsResource))
-        async with engine.start_keyevents_reclaimer(redis, logger):
+        executor = await container.keyevents_executor()
+        stats = container.stats()
+        stats.register("executor", lambda: dict(in_flight=executor.in_flight))
+        stats.register("version_cache", container.engine_versions().stats)
+        snapshots = container.engine_snapshots()
+        if isawaitable(snapshots):
+            snapshots = await snapshots
+        stats.register("snapshot_cache", snapshots.stats)
+
+        @get
+        async def statz(_):
+            body = json.dumps(stats.collect()).encode()
+            return AsgiResponse(
+                body, status_code=200, headers={"content-type": "application/json"}
+            )
+
+        app.mount("/statz", statz)
+
+        async with (
+            engine.start_keyevents_reclaimer(redis, executor, stats, logger),
+            engine.start_consumers_janitor(redis, stats, logger),
+            engine.start_streams_trimmer(
+                redis,
+                stats,
+                logger,
+                interval=settings.events.trim_interval,
+                margin=settings.events.trim_margin,
+                dlq_maxlen=settings.events.dlq_maxlen,
+                dlq_max_age=settings.events.dlq_max_age,
+            ),
+            resync.start_engines_reconciler(
+                redis,
+                await container.keyspace_digests(),
+                stats,
+                logger,
+                interval=settings.events.reconcile_interval,
+                full_interval=settings.events.reconcile_full_interval,
+            ),
+        ):
             yield
         await _maybe_future(container.shutdown_resources(EventsResource))
+        await _maybe_future(container.snapshot_redis.shutdown())
 
     return lifespan
 
@@ -46,6 +92,7 @@ def create_app():
     container.wire(
         modules=[
             "app.controllers.events.engine",
+            "app.controllers.events.resync",
         ]
     )
 
@@ -0,0 +1,32 @@
+"""
+One-shot bootstrap of the `engines` table from the Redis keyspace.
+
+Usage: `python -m app.entrypoints.resync`
+"""
+
+import asyncio
+
+from app.container import Container
+from app.controllers.events.resync import resync_engines
+from app.infra.config import settings
+from app.infra.logging import logger
+from app.infra.sentry import init_sentry
+
+
+async def main():
+    container = Container()
+    container.config.from_pydantic(settings)
+
+    init_sentry()
+
+    await container.redis_broker.init()  # type: ignore
+    try:
+        redis = await container.redis()
+        engine_service = await container.engine_service()
+        await resync_engines(redis, engine_service, logger)
+    finally:
+        await container.shutdown_resources()  # type: ignore
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,20 +2,60 @@ import asyncio
 import traceback
 from collections import Counter
 from logging import Logger
+from uuid import UUID
 
 from sentry_sdk import start_span
 
 from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from app.domains.event import DomainEvent
 from app.infra.aiogram import text
-from app.schemas.outbox import PublishBotDeliveryTask
+from app.infra.aiogram.limits import TelegramRateLimiter
+from app.infra.utils.lru import LRUCache
+from app.schemas.outbox import PublishBotDeliveryResult, PublishBotDeliveryTask
+
+MAX_RETRY_AFTERS = 3  # Flood control responses honoured per message
 
 
 class AiogramEventPublisher:
-    def __init__(self, bot: Bot, *, logger: Logger):
+    """
+    Sends delivery tasks through the bot within the limits of `limiter`.
+
+    A flood control response pauses the sends of the bot and the message is
+    sent again once the pause is over, instead of failing; a message which
+    cannot be sent within the limiter's `max_wait` is postponed until the
+    limits allow it, which is not a failed attempt of its task.
+
+    Messages are rendered once per event while they stay in `texts`, however
+    many subscribers the event is delivered to.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        logger: Logger,
+        limiter: TelegramRateLimiter,
+        texts: LRUCache[UUID, str] | None = None,
+    ):
         self._bot = bot
         self._logger = logger
+        self._limiter = limiter
+        self._texts = texts
+
+    def _render(self, event: DomainEvent) -> str:
+        if self._texts is None:
+            return text.from_event(event)
 
-    async def publish_batch(self, tasks: list[PublishBotDeliveryTask]) -> list[bool]:
+        rendered = self._texts.get(event.id)
+        if rendered is None:
+            rendered = text.from_event(event)
+            self._texts.put(event.id, rendered)
+        return rendered
+
+    async def publish_batch(
+        self, tasks: list[PublishBotDeliveryTask]
+    ) -> list[PublishBotDeliveryResult]:
         with start_span(op="task", name="publish_events_batch") as span:
             span.set_tag("tasks_count", len(tasks))
             atasks = []
@@ -24,16 +64,34 @@ class AiogramEventPublisher:
                 atasks.append(asyncio.create_task(self._publish(task)))
 
             results = await asyncio.gather(*atasks)
-            span.set_tag("success_count", Counter(results).get(True, 0))
+            span.set_tag("success_count", Counter(r.success for r in results)[True])
 
             return results
 
-    async def _publish(self, task: PublishBotDeliveryTask) -> bool:
-        try:
-            await self._bot.send_message(
-                chat_id=task.telegram_id, text=text.from_event(task.event)
-            )
-            return True
-        except Exception:
-            self._logger.error(f"Failed to publish event: {traceback.format_exc()}")
-            return False
+    async def _publish(self, task: PublishBotDeliveryTask) -> PublishBotDeliveryResult:
+        message = self._render(task.event)
+        for _ in range(MAX_RETRY_AFTERS + 1):
+            if not await self._limiter.acquire(task.telegram_id):
+                self._logger.warning(
+                    f"Send limit of chat {task.telegram_id} is exhausted, postponing event"
+                )
+                return self._postponed(task)
+
+            try:
+                await self._bot.send_message(chat_id=task.telegram_id, text=message)
+                return PublishBotDeliveryResult(success=True)
+            except TelegramRetryAfter as e:
+                self._logger.warning(
+                    f"Flood control for chat {task.telegram_id}, retry after {e.retry_after}s"
+                )
+                self._limiter.pause(task.telegram_id, e.retry_after)
+            except Exception:
+                self._logger.error(f"Failed to publish event: {traceback.format_exc()}")
+                return PublishBotDeliveryResult(success=False)
+
+        return self._postponed(task)
+
+    def _postponed(self, task: PublishBotDeliveryTask) -> PublishBotDeliveryResult:
+        return PublishBotDeliveryResult(
+            success=False, postponed_for=self._limiter.available_in(task.telegram_id)
+        )
@@ -0,0 +1,136 @@
+import asyncio
+import math
+import time
+
+from app.infra.utils.lru import LRUCache
+
+
+class TokenBucket:
+    """
+    Token bucket of `rate` sends per second with bursts of up to `burst`,
+    kept as the theoretical arrival time of the next send (GCRA).
+
+    Slots are booked ahead with `take`, so concurrent senders are served in
+    call order without a lock. `pause` stops the bucket for a while, e.g. on
+    a `retry_after` from Telegram; the bucket then restarts empty instead of
+    with a burst.
+    """
+
+    def __init__(self, *, rate: float, burst: int = 1):
+        self._interval = 1 / rate
+        self._tolerance = (max(burst, 1) - 1) * self._interval
+        self._tat = 0.0
+        self.paused_until = 0.0
+
+    def available_at(self, now: float) -> float:
+        """Earliest time of a send booked at `now`."""
+        return max(self._tat - self._tolerance, self.paused_until, now)
+
+    def take(self, at: float):
+        """Book the slot at `at`, no earlier than `available_at`."""
+        self._tat = max(self._tat, at) + self._interval
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self._tat = max(self._tat, self.paused_until + self._tolerance)
+
+
+class SlotCalendar:
+    """
+    Sends of at most `rate` per second, booked into slots of `1 / rate`
+    seconds in any order, so a send booked far ahead does not delay the
+    sends due earlier. `pause` leaves the slots of a while unbooked.
+    """
+
+    def __init__(self, *, rate: float):
+        self._rate = rate
+        self._booked: set[int] = set()
+        self.paused_until = 0.0
+
+    def available_at(self, at: float) -> float:
+        """Start of the first free slot from `at` on."""
+        slot = math.ceil(max(at, self.paused_until) * self._rate)
+        while slot in self._booked:
+            slot += 1
+        return slot / self._rate
+
+    def take(self, at: float):
+        """Book the slot starting at `at`, a result of `available_at`."""
+        self._booked.add(round(at * self._rate))
+
+        if len(self._booked) > 1024:
+            past = math.floor(time.monotonic() * self._rate)
+            self._booked = {slot for slot in self._booked if slot >= past}
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class TelegramRateLimiter:
+    """
+    Global and per-chat send limits of a bot.
+
+    A send books the same moment in its chat bucket and in the global
+    calendar, the earliest one free in both, so neither limit delays a send
+    booked by the other. Chat buckets are kept for the `max_chats` most
+    recently used chats.
+    """
+
+    def __init__(
+        self,
+        *,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: int = 1,
+        max_wait: float = 30.0,
+        max_chats: int = 10_000,
+    ):
+        self._global = SlotCalendar(rate=global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._max_wait = max_wait
+        self._chats: LRUCache[str, TokenBucket] = LRUCache(max_chats)
+
+    def _chat(self, chat_id: str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(rate=self._chat_rate, burst=self._chat_burst)
+            self._chats.put(chat_id, bucket)
+        return bucket
+
+    def available_in(self, chat_id: str) -> float:
+        """Seconds until the limits allow a send to `chat_id`."""
+        now = time.monotonic()
+        return self._global.available_at(self._chat(chat_id).available_at(now)) - now
+
+    async def acquire(self, chat_id: str) -> bool:
+        """
+        Wait until a message may be sent to `chat_id`.
+
+        Returns:
+            bool: False, without booking a slot, if the limits are booked out
+            for longer than `max_wait` seconds.
+        """
+        chat = self._chat(chat_id)
+        while True:
+            now = time.monotonic()
+            at = self._global.available_at(chat.available_at(now))
+            if at - now > self._max_wait:
+                return False
+
+            chat.take(at)
+            self._global.take(at)
+            await asyncio.sleep(at - now)
+
+            if time.monotonic() >= max(chat.paused_until, self._global.paused_until):
+                return True
+            # Paused meanwhile; the slot is gone, queue up behind the pause
+
+    def pause(self, chat_id: str, seconds: float):
+        """
+        Hold back the sends for `seconds` after a flood control response to
+        `chat_id`. Telegram does not tell whether the limit of the chat or of
+        the bot was hit, so the sends to every chat are held back.
+        """
+        self._chat(chat_id).pause(seconds)
+        self._global.pause(seconds)
@@ -1,6 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class AiogramSettings(BaseModel):
     token: str
     secret: str
+    global_rate: float = Field(default=30.0)  # Messages per second of the bot
+    chat_rate: float = Field(default=1.0)  # Messages per second to one chat
+    chat_burst: int = Field(default=1)  # Messages sent to one chat back to back
+    max_wait: float = Field(default=30.0)  # Seconds a message waits for its limits
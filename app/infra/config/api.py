@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class ApiSettings(BaseModel):
+    token: str | None = Field(default=None)  # Bearer token; unset disables the API
+    changes_page_size: int = Field(default=1000)  # Engines read per feed query
+    changes_max_limit: int = Field(default=10_000)  # Engines per feed response
+    changes_settle_margin: int = Field(default=30)  # Seconds beyond reclaim idle time
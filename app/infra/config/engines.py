@@ -0,0 +1,14 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class EnginesSettings(BaseModel):
+    snapshot_backend: Literal["local", "redis"] = Field(default="redis")
+    snapshot_cache_size: int = Field(default=10_000)  # Snapshots kept in process
+    snapshot_ttl: float = Field(default=5.0)  # Seconds an in-process snapshot lives
+    snapshot_redis_ttl: int = Field(default=600)  # Seconds a Redis snapshot lives
+    purge_interval: int = Field(default=3600)  # Seconds between dead engine purges
+    purge_min_dead_age: int = Field(default=86400)  # Seconds an engine stays DEAD
+    purge_chunk_size: int = Field(default=500)  # Engines deleted per transaction
+    purge_max_cascade: int = Field(default=5000)  # Dependent rows per transaction
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+
+
+class EventsSettings(BaseModel):
+    batch_size: int = Field(default=1)  # Entries per XREADGROUP; 1 disables batching
+    lanes: int = Field(default=16)  # Parallel lanes of the keyed executor
+    lane_queue_size: int = Field(default=64)  # Pending jobs per lane before blocking
+    version_cache_size: int = Field(default=100_000)  # Engines with cached versions
+    trim_interval: int = Field(default=60)  # Seconds between stream trims
+    trim_margin: int = Field(default=300)  # Seconds of history kept below watermark
+    dlq_maxlen: int = Field(default=100_000)  # Entries kept in the DLQ; 0 disables
+    dlq_max_age: int = Field(default=7 * 24 * 3600)  # DLQ seconds kept; 0 disables
+    reconcile_interval: int = Field(default=300)  # Seconds between reconciliations
+    reconcile_buckets: int = Field(default=1024)  # Digest buckets of engine ids
+    reconcile_full_interval: int = Field(default=6 * 3600)  # Seconds between SCANs
+    fast_transitions: bool = Field(default=False)  # Single-statement engine upserts
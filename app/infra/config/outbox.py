@@ -0,0 +1,18 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class OutboxSettings(BaseModel):
+    poll_interval: float = Field(default=5.0)  # Seconds between claims without NOTIFY
+    delivery_lease: float = Field(default=60.0)  # Seconds a claimed task batch is kept
+    delivery_max_postpone: float = Field(
+        default=3600.0
+    )  # Seconds after its event a task is postponed
+    render_cache_size: int = Field(default=10_000)  # Events decoded/rendered once
+    fanout_mode: Literal["auto", "sql", "python"] = Field(default="auto")
+    relay_partitions: int = Field(default=16, ge=1)  # Aggregate partitions of relays
+    partitions_interval: int = Field(default=3600)  # Seconds between maintenances
+    partitions_premake: int = Field(default=7)  # Daily partitions created ahead
+    retention_days: int = Field(default=14)  # Days kept before a partition is removed
+    retention_mode: Literal["drop", "detach"] = Field(default="drop")
@@ -6,6 +6,10 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from app.infra.config.admin import AdminSettings
 from app.infra.config.aiogram import AiogramSettings
+from app.infra.config.api import ApiSettings
+from app.infra.config.engines import EnginesSettings
+from app.infra.config.events import EventsSettings
+from app.infra.config.outbox import OutboxSettings
 from app.infra.config.postgres import PostgreSQLSettings
 from app.infra.config.rabbitmq import RabbitMQSettings
 from app.infra.config.redis import RedisSettings
@@ -21,6 +25,10 @@ class Settings(BaseSettings):
     ssl: SSLSettings = Field(default_factory=SSLSettings)
     sentry: SentrySettings
     aiogram: AiogramSettings
+    events: EventsSettings = Field(default_factory=EventsSettings)
+    engines: EnginesSettings = Field(default_factory=EnginesSettings)
+    api: ApiSettings = Field(default_factory=ApiSettings)
+    outbox: OutboxSettings = Field(default_factory=OutboxSettings)
 
     rabbit_scope_vhost: str = Field()
     rabbit_proxy_vhost: str = Field()
@@ -3,6 +3,7 @@ from sqlalchemy import UniqueConstraint
 bot_delivery_task_unique = UniqueConstraint(
     "outbox_id",
     "subscription_id",
+    "created_at",  # Partition key; equal for all tasks of one outbox record
     name="uq_bot_delivery_task",
 )
 
@@ -0,0 +1,56 @@
+"""Add engine purge indexes
+
+Revision ID: 5c1f0e7a9b42
+Revises: eb691ba21ad8
+Create Date: 2026-10-17 10:12:31.408215
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1f0e7a9b42"
+down_revision: Union[str, Sequence[str], None] = "eb691ba21ad8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_engines_dead",
+        "engines",
+        ["id"],
+        unique=False,
+        postgresql_where=sa.text("status = 'DEAD'"),
+    )
+    op.create_index(
+        op.f("ix_engine_subscriptions_engine_id"),
+        "engine_subscriptions",
+        ["engine_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_delivery_tasks_subscription_id"),
+        "delivery_tasks",
+        ["subscription_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_delivery_tasks_subscription_id"), table_name="delivery_tasks"
+    )
+    op.drop_index(
+        op.f("ix_engine_subscriptions_engine_id"), table_name="engine_subscriptions"
+    )
+    op.drop_index(
+        "ix_engines_dead",
+        table_name="engines",
+        postgresql_where=sa.text("status = 'DEAD'"),
+    )
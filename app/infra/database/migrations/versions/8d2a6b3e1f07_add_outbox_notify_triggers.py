@@ -0,0 +1,59 @@
+"""Add outbox notify triggers
+
+Revision ID: 8d2a6b3e1f07
+Revises: 5c1f0e7a9b42
+Create Date: 2026-10-17 11:03:52.114902
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d2a6b3e1f07"
+down_revision: Union[str, Sequence[str], None] = "5c1f0e7a9b42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Statement level, so a multi-row insert notifies once; Postgres also
+    # folds equal notifications of one transaction and sends them on commit.
+    op.execute(
+        """
+        CREATE FUNCTION notify_inserted() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM inserted) THEN
+                PERFORM pg_notify(TG_ARGV[0], '');
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER outbox_notify_inserted
+        AFTER INSERT ON outbox
+        REFERENCING NEW TABLE AS inserted
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inserted('proxy_outbox')
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER delivery_tasks_notify_inserted
+        AFTER INSERT ON delivery_tasks
+        REFERENCING NEW TABLE AS inserted
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inserted('proxy_delivery_tasks')
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER delivery_tasks_notify_inserted ON delivery_tasks")
+    op.execute("DROP TRIGGER outbox_notify_inserted ON outbox")
+    op.execute("DROP FUNCTION notify_inserted()")
@@ -0,0 +1,100 @@
+"""Add subscription notify triggers
+
+Revision ID: a93e6f1b2c84
+Revises: f2a7d5c8e316
+Create Date: 2026-10-17 15:21:07.640913
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a93e6f1b2c84"
+down_revision: Union[str, Sequence[str], None] = "f2a7d5c8e316"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANNEL = "proxy_subscriptions"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The payload lists the engines of the changed subscriptions; an empty
+    # payload asks listeners to reload everything, which is sent for updates
+    # and for changes touching too many engines to fit into a notification.
+    op.execute(
+        """
+        CREATE FUNCTION notify_subscriptions_changed() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            engines_count integer;
+            engines text;
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                PERFORM pg_notify(TG_ARGV[0], '');
+                RETURN NULL;
+            END IF;
+
+            SELECT count(DISTINCT engine_id), string_agg(DISTINCT engine_id::text, ',')
+            INTO engines_count, engines
+            FROM changed;
+
+            IF engines_count > 100 THEN
+                PERFORM pg_notify(TG_ARGV[0], '');
+            ELSIF engines_count > 0 THEN
+                PERFORM pg_notify(TG_ARGV[0], engines);
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER engine_subscriptions_notify_inserted
+        AFTER INSERT ON engine_subscriptions
+        REFERENCING NEW TABLE AS changed
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_subscriptions_changed('{CHANNEL}')
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER engine_subscriptions_notify_deleted
+        AFTER DELETE ON engine_subscriptions
+        REFERENCING OLD TABLE AS changed
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_subscriptions_changed('{CHANNEL}')
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER engine_subscriptions_notify_updated
+        AFTER UPDATE ON engine_subscriptions
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_subscriptions_changed('{CHANNEL}')
+        """
+    )
+    # Telegram ids are part of the routes; deleted users cascade to their
+    # subscriptions and are covered above.
+    op.execute(
+        f"""
+        CREATE TRIGGER users_notify_updated
+        AFTER UPDATE OF telegram_id ON users
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_subscriptions_changed('{CHANNEL}')
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER users_notify_updated ON users")
+    op.execute(
+        "DROP TRIGGER engine_subscriptions_notify_updated ON engine_subscriptions"
+    )
+    op.execute(
+        "DROP TRIGGER engine_subscriptions_notify_deleted ON engine_subscriptions"
+    )
+    op.execute(
+        "DROP TRIGGER engine_subscriptions_notify_inserted ON engine_subscriptions"
+    )
+    op.execute("DROP FUNCTION notify_subscriptions_changed()")
@@ -0,0 +1,30 @@
+"""Backfill outbox aggregate id
+
+Revision ID: b7e3f9a1c605
+Revises: d6b1c7e9f452
+Create Date: 2026-10-17 18:40:13.502871
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3f9a1c605"
+down_revision: Union[str, Sequence[str], None] = "d6b1c7e9f452"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Pending records stored by the single-statement engine transitions
+    op.execute(
+        "UPDATE outbox SET aggregate_id = (body ->> 'aggregate_id')::uuid "
+        "WHERE fanned_out IS false AND aggregate_id IS NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
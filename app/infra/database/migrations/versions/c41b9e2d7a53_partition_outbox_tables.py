@@ -0,0 +1,289 @@
+"""Partition outbox tables
+
+Revision ID: c41b9e2d7a53
+Revises: 8d2a6b3e1f07
+Create Date: 2026-10-17 12:40:18.530671
+
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c41b9e2d7a53"
+down_revision: Union[str, Sequence[str], None] = "8d2a6b3e1f07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PREMAKE_DAYS = 7
+
+
+def _cutoff() -> datetime:
+    # Rows written by the old release while the migration runs must still
+    # fit into the legacy partitions.
+    today = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return today + timedelta(days=2)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    cutoff = _cutoff()
+
+    # The existing tables become the partitions of everything before `cutoff`.
+    # Their new keys and range checks are built without blocking writes, so
+    # the swap below only holds its locks for catalog changes.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS outbox_legacy_pkey "
+            "ON outbox (id, created_at)"
+        )
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS delivery_tasks_legacy_pkey "
+            "ON delivery_tasks (id, created_at)"
+        )
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_bot_delivery_task_legacy "
+            "ON delivery_tasks (outbox_id, subscription_id, created_at)"
+        )
+        for table in ("outbox", "delivery_tasks"):
+            op.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_legacy_range "
+                f"CHECK (created_at < '{cutoff.isoformat()}') NOT VALID"
+            )
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_legacy_range")
+
+    op.execute("SET LOCAL lock_timeout = '10s'")
+    op.execute("LOCK TABLE outbox, delivery_tasks IN ACCESS EXCLUSIVE MODE")
+
+    # Outbox
+    op.execute("DROP TRIGGER outbox_notify_inserted ON outbox")
+    op.execute(
+        "ALTER TABLE delivery_tasks DROP CONSTRAINT delivery_tasks_outbox_id_fkey"
+    )
+    op.execute("ALTER TABLE outbox DROP CONSTRAINT outbox_pkey")
+    op.execute(
+        "ALTER TABLE outbox ADD CONSTRAINT outbox_legacy_pkey "
+        "PRIMARY KEY USING INDEX outbox_legacy_pkey"
+    )
+    op.execute("ALTER INDEX ix_outbox_caused_by RENAME TO ix_outbox_legacy_caused_by")
+    op.execute("ALTER INDEX ix_outbox_pending RENAME TO ix_outbox_legacy_pending")
+    op.execute("ALTER TABLE outbox RENAME TO outbox_legacy")
+
+    op.execute(
+        """
+        CREATE TABLE outbox (
+            caused_by VARCHAR NOT NULL,
+            body JSONB NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            id UUID NOT NULL,
+            attempts INTEGER NOT NULL,
+            fanned_out BOOLEAN NOT NULL,
+            fanned_out_at TIMESTAMP WITH TIME ZONE,
+            next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            CONSTRAINT outbox_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("CREATE INDEX ix_outbox_caused_by ON outbox (caused_by)")
+    op.execute(
+        "CREATE INDEX ix_outbox_pending ON outbox (next_attempt_at) "
+        "WHERE fanned_out IS false"
+    )
+
+    # Delivery tasks
+    op.execute("DROP TRIGGER delivery_tasks_notify_inserted ON delivery_tasks")
+    op.execute("ALTER TABLE delivery_tasks DROP CONSTRAINT uq_bot_delivery_task")
+    op.execute(
+        "ALTER TABLE delivery_tasks ADD CONSTRAINT uq_bot_delivery_task_legacy "
+        "UNIQUE USING INDEX uq_bot_delivery_task_legacy"
+    )
+    op.execute("ALTER TABLE delivery_tasks DROP CONSTRAINT delivery_tasks_pkey")
+    op.execute(
+        "ALTER TABLE delivery_tasks ADD CONSTRAINT delivery_tasks_legacy_pkey "
+        "PRIMARY KEY USING INDEX delivery_tasks_legacy_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_delivery_task_pending RENAME TO ix_delivery_task_legacy_pending"
+    )
+    op.execute(
+        "ALTER INDEX ix_delivery_tasks_subscription_id "
+        "RENAME TO ix_delivery_tasks_legacy_subscription_id"
+    )
+    op.execute("ALTER TABLE delivery_tasks RENAME TO delivery_tasks_legacy")
+
+    op.execute(
+        """
+        CREATE TABLE delivery_tasks (
+            outbox_id UUID NOT NULL,
+            subscription_id UUID NOT NULL,
+            published BOOLEAN NOT NULL,
+            attempts INTEGER NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            published_at TIMESTAMP WITH TIME ZONE,
+            next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            id UUID NOT NULL,
+            CONSTRAINT delivery_tasks_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT uq_bot_delivery_task
+                UNIQUE (outbox_id, subscription_id, created_at),
+            CONSTRAINT delivery_tasks_subscription_id_fkey
+                FOREIGN KEY (subscription_id) REFERENCES engine_subscriptions (id)
+                ON DELETE CASCADE
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute(
+        "CREATE INDEX ix_delivery_task_pending ON delivery_tasks (next_attempt_at) "
+        "WHERE published IS false"
+    )
+    op.execute(
+        "CREATE INDEX ix_delivery_tasks_subscription_id "
+        "ON delivery_tasks (subscription_id)"
+    )
+
+    # Matching indexes and constraints of the legacy tables are attached as
+    # they are, and their range checks spare the attach a table scan.
+    for table in ("outbox", "delivery_tasks"):
+        op.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {table}_legacy "
+            f"FOR VALUES FROM (MINVALUE) TO ('{cutoff.isoformat()}')"
+        )
+        op.execute(f"ALTER TABLE {table}_legacy DROP CONSTRAINT {table}_legacy_range")
+
+        for offset in range(PREMAKE_DAYS):
+            lower = cutoff + timedelta(days=offset)
+            upper = lower + timedelta(days=1)
+            op.execute(
+                f"CREATE TABLE {table}_p{lower:%Y%m%d} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    op.execute(
+        """
+        CREATE TRIGGER outbox_notify_inserted
+        AFTER INSERT ON outbox
+        REFERENCING NEW TABLE AS inserted
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inserted('proxy_outbox')
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER delivery_tasks_notify_inserted
+        AFTER INSERT ON delivery_tasks
+        REFERENCING NEW TABLE AS inserted
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inserted('proxy_delivery_tasks')
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Copies every row back into plain tables; writers must be stopped.
+    op.execute("ALTER TABLE outbox RENAME TO outbox_partitioned")
+    op.execute("ALTER TABLE delivery_tasks RENAME TO delivery_tasks_partitioned")
+    op.execute("ALTER INDEX ix_outbox_caused_by RENAME TO ix_outbox_old_caused_by")
+    op.execute("ALTER INDEX ix_outbox_pending RENAME TO ix_outbox_old_pending")
+    op.execute(
+        "ALTER INDEX ix_delivery_task_pending RENAME TO ix_delivery_task_old_pending"
+    )
+    op.execute(
+        "ALTER INDEX ix_delivery_tasks_subscription_id "
+        "RENAME TO ix_delivery_tasks_old_subscription_id"
+    )
+    op.execute(
+        "ALTER TABLE outbox_partitioned RENAME CONSTRAINT outbox_pkey TO outbox_old_pkey"
+    )
+    op.execute(
+        "ALTER TABLE delivery_tasks_partitioned "
+        "RENAME CONSTRAINT delivery_tasks_pkey TO delivery_tasks_old_pkey"
+    )
+    op.execute(
+        "ALTER TABLE delivery_tasks_partitioned "
+        "RENAME CONSTRAINT uq_bot_delivery_task TO uq_bot_delivery_task_old"
+    )
+
+    op.execute(
+        """
+        CREATE TABLE outbox (
+            caused_by VARCHAR NOT NULL,
+            body JSONB NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            id UUID NOT NULL,
+            attempts INTEGER NOT NULL,
+            fanned_out BOOLEAN NOT NULL,
+            fanned_out_at TIMESTAMP WITH TIME ZONE,
+            next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            CONSTRAINT outbox_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO outbox SELECT * FROM outbox_partitioned ON CONFLICT DO NOTHING"
+    )
+    op.execute("CREATE INDEX ix_outbox_caused_by ON outbox (caused_by)")
+    op.execute(
+        "CREATE INDEX ix_outbox_pending ON outbox (next_attempt_at) "
+        "WHERE fanned_out IS false"
+    )
+
+    op.execute(
+        """
+        CREATE TABLE delivery_tasks (
+            outbox_id UUID NOT NULL,
+            subscription_id UUID NOT NULL,
+            published BOOLEAN NOT NULL,
+            attempts INTEGER NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            published_at TIMESTAMP WITH TIME ZONE,
+            next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            id UUID NOT NULL,
+            CONSTRAINT delivery_tasks_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_bot_delivery_task UNIQUE (outbox_id, subscription_id),
+            CONSTRAINT delivery_tasks_outbox_id_fkey
+                FOREIGN KEY (outbox_id) REFERENCES outbox (id) ON DELETE CASCADE,
+            CONSTRAINT delivery_tasks_subscription_id_fkey
+                FOREIGN KEY (subscription_id) REFERENCES engine_subscriptions (id)
+                ON DELETE CASCADE
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO delivery_tasks
+        SELECT t.* FROM delivery_tasks_partitioned t
+        WHERE EXISTS (SELECT 1 FROM outbox o WHERE o.id = t.outbox_id)
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.execute(
+        "CREATE INDEX ix_delivery_task_pending ON delivery_tasks (next_attempt_at) "
+        "WHERE published IS false"
+    )
+    op.execute(
+        "CREATE INDEX ix_delivery_tasks_subscription_id "
+        "ON delivery_tasks (subscription_id)"
+    )
+
+    op.execute("DROP TABLE delivery_tasks_partitioned")
+    op.execute("DROP TABLE outbox_partitioned")
+
+    op.execute(
+        """
+        CREATE TRIGGER outbox_notify_inserted
+        AFTER INSERT ON outbox
+        REFERENCING NEW TABLE AS inserted
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inserted('proxy_outbox')
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER delivery_tasks_notify_inserted
+        AFTER INSERT ON delivery_tasks
+        REFERENCING NEW TABLE AS inserted
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inserted('proxy_delivery_tasks')
+        """
+    )
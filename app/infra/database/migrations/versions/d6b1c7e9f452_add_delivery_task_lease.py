@@ -0,0 +1,31 @@
+"""Add delivery task lease
+
+Revision ID: d6b1c7e9f452
+Revises: a93e6f1b2c84
+Create Date: 2026-10-17 16:12:45.918224
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d6b1c7e9f452"
+down_revision: Union[str, Sequence[str], None] = "a93e6f1b2c84"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "delivery_tasks",
+        sa.Column("leased_until", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("delivery_tasks", "leased_until")
@@ -0,0 +1,135 @@
+"""Add engine digests
+
+Revision ID: e58c2a4d9b17
+Revises: b7e3f9a1c605
+Create Date: 2026-10-17 19:26:41.730158
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e58c2a4d9b17"
+down_revision: Union[str, Sequence[str], None] = "b7e3f9a1c605"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "engine_digest_sizes",
+        sa.Column("buckets", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("buckets"),
+    )
+    op.create_table(
+        "engine_digests",
+        sa.Column("buckets", sa.Integer(), nullable=False),
+        sa.Column("bucket", sa.Integer(), nullable=False),
+        sa.Column("count", sa.BIGINT(), nullable=False),
+        sa.Column("total", sa.Numeric(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["buckets"], ["engine_digest_sizes.buckets"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("buckets", "bucket"),
+    )
+    # SQL counterparts of `app.infra.utils.digest.digest_key`
+    op.execute(
+        """
+        CREATE FUNCTION engine_digest_bucket(id uuid, buckets integer)
+        RETURNS integer LANGUAGE sql IMMUTABLE AS $$
+            SELECT (('x' || lpad(substr(md5(id::text), 1, 8), 16, '0'))::bit(64)::bigint
+                % buckets)::integer
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION engine_digest_weight(id uuid)
+        RETURNS bigint LANGUAGE sql IMMUTABLE AS $$
+            SELECT ('x' || lpad(substr(md5(id::text), 9, 12), 16, '0'))::bit(64)::bigint
+        $$
+        """
+    )
+    # Statement level, so a multi-row save touches every digest row once, in
+    # bucket order; updates which keep an engine live or DEAD touch none.
+    op.execute(
+        """
+        CREATE FUNCTION track_engine_digests() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            ids uuid[];
+            signs integer[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT array_agg(id), array_agg(1) INTO ids, signs
+                FROM added WHERE status <> 'DEAD';
+            ELSIF TG_OP = 'DELETE' THEN
+                SELECT array_agg(id), array_agg(-1) INTO ids, signs
+                FROM removed WHERE status <> 'DEAD';
+            ELSE
+                SELECT array_agg(a.id), array_agg(CASE WHEN a.status <> 'DEAD' THEN 1 ELSE -1 END)
+                INTO ids, signs
+                FROM added a JOIN removed r ON r.id = a.id
+                WHERE (a.status = 'DEAD') <> (r.status = 'DEAD');
+            END IF;
+
+            IF ids IS NULL THEN
+                RETURN NULL;
+            END IF;
+
+            INSERT INTO engine_digests AS d (buckets, bucket, count, total)
+            SELECT s.buckets,
+                   engine_digest_bucket(c.id, s.buckets),
+                   sum(c.sign),
+                   sum(c.sign * engine_digest_weight(c.id))
+            FROM unnest(ids, signs) AS c(id, sign)
+            CROSS JOIN engine_digest_sizes s
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            ON CONFLICT (buckets, bucket) DO UPDATE
+            SET count = d.count + excluded.count, total = d.total + excluded.total;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER engines_digests_inserted
+        AFTER INSERT ON engines
+        REFERENCING NEW TABLE AS added
+        FOR EACH STATEMENT EXECUTE FUNCTION track_engine_digests()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER engines_digests_updated
+        AFTER UPDATE ON engines
+        REFERENCING OLD TABLE AS removed NEW TABLE AS added
+        FOR EACH STATEMENT EXECUTE FUNCTION track_engine_digests()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER engines_digests_deleted
+        AFTER DELETE ON engines
+        REFERENCING OLD TABLE AS removed
+        FOR EACH STATEMENT EXECUTE FUNCTION track_engine_digests()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER engines_digests_deleted ON engines")
+    op.execute("DROP TRIGGER engines_digests_updated ON engines")
+    op.execute("DROP TRIGGER engines_digests_inserted ON engines")
+    op.execute("DROP FUNCTION track_engine_digests()")
+    op.execute("DROP FUNCTION engine_digest_weight(uuid)")
+    op.execute("DROP FUNCTION engine_digest_bucket(uuid, integer)")
+    op.drop_table("engine_digests")
+    op.drop_table("engine_digest_sizes")
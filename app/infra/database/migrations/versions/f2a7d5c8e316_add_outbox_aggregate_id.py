@@ -0,0 +1,33 @@
+"""Add outbox aggregate id
+
+Revision ID: f2a7d5c8e316
+Revises: c41b9e2d7a53
+Create Date: 2026-10-17 14:05:52.117340
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a7d5c8e316"
+down_revision: Union[str, Sequence[str], None] = "c41b9e2d7a53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("outbox", sa.Column("aggregate_id", sa.Uuid(), nullable=True))
+    # Only pending records are ever claimed again
+    op.execute(
+        "UPDATE outbox SET aggregate_id = (body ->> 'aggregate_id')::uuid "
+        "WHERE fanned_out IS false"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("outbox", "aggregate_id")
@@ -1,4 +1,5 @@
 from datetime import datetime
+from decimal import Decimal
 from typing import Annotated
 from uuid import UUID, uuid4
 
@@ -9,6 +10,7 @@ from sqlalchemy import (
     Enum,
     ForeignKey,
     Index,
+    Numeric,
 )
 from sqlalchemy.dialects.postgresql import BIGINT, JSONB
 from sqlalchemy.dialects.postgresql import UUID as SQLUUID
@@ -64,12 +66,56 @@ class Engine(BaseWithPK):
         back_populates="engine"
     )
 
-    __table_args__ = (constraints.engine_version_unique,)
+    __table_args__ = (
+        constraints.engine_version_unique,
+        # Keyset scan of DEAD engines for the purge job
+        Index(
+            "ix_engines_dead",
+            "id",
+            postgresql_where=(
+                Column("status", Enum(EngineStatus)) == EngineStatus.DEAD
+            ),  # Partial index
+        ),
+    )
 
     def __str__(self) -> str:
         return f"{self.id}_{self.addr}_{self.status}"
 
 
+class EngineDigestSize(Base):
+    """Bucket count the `EngineDigest` rows are maintained for."""
+
+    __tablename__ = "engine_digest_sizes"
+
+    buckets: Mapped[int] = mapped_column(primary_key=True)
+
+
+class EngineDigest(Base):
+    """
+    Digest of the ids of the engines that are not DEAD, per bucket.
+
+    Maintained by statement-level triggers on `engines` for every bucket
+    count in `EngineDigestSize`, with buckets and weights matching
+    `app.infra.utils.digest.digest_key`.
+
+    Attributes:
+        buckets: Bucket count of the digest.
+        bucket: Bucket of the engine ids.
+        count: Number of engines in the bucket.
+        total: Sum of the weights of the engines in the bucket.
+    """
+
+    __tablename__ = "engine_digests"
+
+    buckets: Mapped[int] = mapped_column(
+        ForeignKey("engine_digest_sizes.buckets", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    bucket: Mapped[int] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    total: Mapped[Decimal] = mapped_column(Numeric, nullable=False)
+
+
 class Outbox(BaseWithPK):
     """
     Canonical transactional-outbox event.
@@ -78,10 +124,13 @@ class Outbox(BaseWithPK):
         id: Stable identifier (e.g. incoming event id or UUID5).
         caused_by: Correlation token such as HTTP request id or stream id.
             This is meta information used for tracing.
+        aggregate_id: Aggregate of the event, selects the relay partition.
+            NULL for records stored before it was introduced.
         body: Serialized payload describing what should be delivered.
         fanned_out: Flag flipped to TRUE after the fan-out worker
             successfully materialises all delivery tasks for this record.
-        created_at: Timestamp when the outbox record was inserted.
+        created_at: Time of the event version; part of the key, so a record
+            stored again is deduplicated like by `id`.
         fanned_out_at: Timestamp when fan-out finished, else None.
         attempts: Number of fan-out attempts performed so far.
         next_attempt_at: When the next fan-out attempt is allowed.
@@ -91,6 +140,17 @@ class Outbox(BaseWithPK):
     - `caused_by` b-tree for auditing and deduplication checks.
     - Partial index `ix_outbox_pending` on `fanned_out = FALSE` ordered by
       `next_attempt_at` to feed the fan-out worker efficiently.
+
+    Relay partitions
+    ----------------
+    Records are claimed per logical partition `hashtext(aggregate_id) % N`,
+    each owned by one relay replica, so the events of an aggregate are
+    fanned out in order. See `PgPartitionOwnership`.
+
+    Partitioning
+    ------------
+    Range partitioned by `created_at` into daily partitions, so the primary
+    key includes `created_at`. See `OutboxRetentionService`.
     """
 
     __tablename__ = "outbox"
@@ -99,6 +159,9 @@ class Outbox(BaseWithPK):
         nullable=False,
         index=True,  # Look-ups by correlation key
     )
+    aggregate_id: Mapped[UUID | None] = mapped_column(
+        nullable=True,
+    )
 
     body: Mapped[dict] = mapped_column(
         JSONB,
@@ -116,7 +179,7 @@ class Outbox(BaseWithPK):
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        nullable=False,
+        primary_key=True,  # Partition key
         default=now_utc,
     )
     fanned_out_at: Mapped[datetime | None] = mapped_column(
@@ -138,6 +201,7 @@ class Outbox(BaseWithPK):
                 Column("fanned_out", Boolean).is_(False)
             ),  # Partial index
         ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
@@ -169,7 +233,9 @@ class EngineSubscription(BaseWithPK):
         foreign_keys=[user_id], back_populates="subscriptions"
     )
     engine_id: Mapped[UUID] = mapped_column(
-        ForeignKey("engines.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("engines.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,  # Cascading deletes of engines
     )
     engine: Mapped[Engine] = relationship(
         foreign_keys=[engine_id], back_populates="subscriptions"
@@ -187,15 +253,23 @@ class BotDeliveryTask(BaseWithPK):
 
     Each row ties an `Outbox` record to a subscriber (via engine subscription),
     stores the rendered message, and tracks whether the bot has published it.
+
+    Range partitioned like `Outbox`; a task takes `created_at` of its outbox
+    record, so it lives in the partition with the same bounds and is removed
+    together with it instead of through a foreign key.
+
+    A claimed task is leased to its worker until `leased_until` instead of
+    being locked while it is sent; it is claimable again once the lease
+    expires without an acknowledgement.
     """
 
     __tablename__ = "delivery_tasks"
 
-    outbox_id: Mapped[UUID] = mapped_column(
-        ForeignKey("outbox.id", ondelete="CASCADE"), nullable=False
-    )
+    outbox_id: Mapped[UUID] = mapped_column(nullable=False)
     subscription_id: Mapped[UUID] = mapped_column(
-        ForeignKey("engine_subscriptions.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("engine_subscriptions.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,  # Cascading deletes of subscriptions
     )
 
     published: Mapped[bool] = mapped_column(nullable=False, default=False)
@@ -206,8 +280,7 @@ class BotDeliveryTask(BaseWithPK):
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        nullable=False,
-        default=now_utc,
+        primary_key=True,  # Partition key, `created_at` of the outbox record
     )
     published_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True),
@@ -218,6 +291,10 @@ class BotDeliveryTask(BaseWithPK):
         nullable=False,
         default=now_utc,
     )
+    leased_until: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
 
     __table_args__ = (
         # Fast batch pick-up for relay workers
@@ -227,4 +304,5 @@ class BotDeliveryTask(BaseWithPK):
             postgresql_where=(Column("published", Boolean).is_(False)),  # Partial index
         ),
         constraints.bot_delivery_task_unique,
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
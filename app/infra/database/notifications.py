@@ -0,0 +1,135 @@
+import asyncio
+from logging import Logger
+from typing import AsyncIterator, Callable
+
+import asyncpg
+
+# Channels notified by the `notify_inserted` triggers
+OUTBOX_CHANNEL = "proxy_outbox"
+DELIVERY_TASKS_CHANNEL = "proxy_delivery_tasks"
+# Channel notified by the `notify_subscriptions_changed` triggers
+SUBSCRIPTIONS_CHANNEL = "proxy_subscriptions"
+
+Listener = Callable[[str | None], None]
+
+
+class PgNotifications:
+    """
+    Wake-ups from Postgres `NOTIFY` channels.
+
+    A dedicated connection `LISTEN`s on every channel and each notification
+    sets the event of its channel. Postgres delivers notifications on commit,
+    so a woken consumer always sees the committed rows. When the connection
+    is lost it is re-established and every channel is woken, since the
+    notifications sent meanwhile are gone.
+
+    Listeners added with `add_listener` also get the payloads; they get `None`
+    once connected, meaning any notification may have been missed.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        channels: list[str],
+        logger: Logger,
+        reconnect_delay: float = 1.0,
+    ):
+        self._dsn = dsn
+        self._events = {channel: asyncio.Event() for channel in channels}
+        self._listeners: dict[str, list[Listener]] = {
+            channel: [] for channel in channels
+        }
+        self._logger = logger
+        self._reconnect_delay = reconnect_delay
+
+        self._conn: asyncpg.Connection | None = None
+        self._lost = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def _on_notification(self, _conn, _pid: int, channel: str, payload: str):
+        self._events[channel].set()
+        for listener in self._listeners[channel]:
+            listener(payload)
+
+    def _on_termination(self, _conn):
+        self._lost.set()
+
+    async def _connect(self):
+        conn = await asyncpg.connect(self._dsn)
+        conn.add_termination_listener(self._on_termination)
+        for channel in self._events:
+            await conn.add_listener(channel, self._on_notification)
+
+        self._conn = conn
+        for event in self._events.values():
+            event.set()
+        for listeners in self._listeners.values():
+            for listener in listeners:
+                listener(None)
+
+    async def _keep_connected(self):
+        while True:
+            await self._lost.wait()
+            self._lost.clear()
+            self._logger.warning("Postgres LISTEN connection lost, reconnecting...")
+
+            lost, self._conn = self._conn, None
+            try:
+                await self._connect()
+            except Exception:
+                self._logger.error(
+                    "Failed to reconnect LISTEN connection:", exc_info=True
+                )
+                await asyncio.sleep(self._reconnect_delay)
+                self._lost.set()
+            finally:
+                if lost is not None and not lost.is_closed():
+                    lost.terminate()
+
+    def add_listener(self, channel: str, listener: Listener):
+        """Call `listener` with the payload of every notification on `channel`."""
+        self._listeners[channel].append(listener)
+
+    async def start(self):
+        await self._connect()
+        self._task = asyncio.create_task(self._keep_connected())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+
+    async def wait(self, channel: str, *, timeout: float):
+        """
+        Wait for a notification on `channel`, at most `timeout` seconds.
+
+        Notifications received since the previous call return at once, so
+        none is lost while the caller is busy.
+        """
+        event = self._events[channel]
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except TimeoutError:
+            pass
+        event.clear()
+
+
+async def create_pg_notifications(
+    dsn: str, *, channels: list[str], logger: Logger
+) -> AsyncIterator[PgNotifications]:
+    notifications = PgNotifications(
+        dsn.replace("+asyncpg", "", 1), channels=channels, logger=logger
+    )
+    await notifications.start()
+
+    try:
+        yield notifications
+    finally:
+        await notifications.close()
@@ -0,0 +1,145 @@
+import math
+import random
+import time
+from dataclasses import dataclass
+from logging import Logger
+from typing import AsyncIterator
+
+import asyncpg
+
+# Advisory lock namespace of the outbox relay partitions
+OUTBOX_RELAY_KEY = "proxy_outbox_relay"
+
+
+@dataclass(frozen=True, slots=True)
+class OwnedPartitions:
+    """Logical partitions `owned` by this replica, out of `count`."""
+
+    owned: frozenset[int]
+    count: int
+
+
+class PgPartitionOwnership:
+    """
+    Ownership of `count` logical partitions shared by the relay replicas.
+
+    A dedicated connection holds one session-level advisory lock per owned
+    partition, so a partition has at most one owner and is released as soon
+    as its owner's connection is gone. The replicas are the connections with
+    the same `application_name`; every replica keeps a fair share of the
+    partitions, releasing extra ones when replicas join and taking free ones
+    when they leave.
+
+    `rebalance` must be called between batches, never while rows of an owned
+    partition are being processed.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        key: str,
+        count: int,
+        logger: Logger,
+        rebalance_interval: float = 10.0,
+        application_name: str = "proxy-outbox-relay",
+    ):
+        self._dsn = dsn
+        self._key = key
+        self._count = count
+        self._logger = logger
+        self._rebalance_interval = rebalance_interval
+        self._application_name = application_name
+
+        self._conn: asyncpg.Connection | None = None
+        self._owned: set[int] = set()
+        self._rebalanced_at = -math.inf
+
+    @property
+    def current(self) -> OwnedPartitions:
+        return OwnedPartitions(owned=frozenset(self._owned), count=self._count)
+
+    def _on_termination(self, _conn):
+        # Locks are released by the server together with the session
+        self._owned.clear()
+        self._rebalanced_at = -math.inf
+
+    async def _connect(self):
+        conn = await asyncpg.connect(
+            self._dsn, server_settings={"application_name": self._application_name}
+        )
+        conn.add_termination_listener(self._on_termination)
+        self._conn = conn
+
+    async def _count_replicas(self, conn: asyncpg.Connection) -> int:
+        replicas = await conn.fetchval(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE application_name = $1 AND datname = current_database()",
+            self._application_name,
+        )
+        return max(int(replicas), 1)
+
+    async def _release(self, conn: asyncpg.Connection, partitions: list[int]):
+        for partition in partitions:
+            await conn.fetchval(
+                "SELECT pg_advisory_unlock(hashtext($1), $2)", self._key, partition
+            )
+            self._owned.discard(partition)
+
+    async def _acquire(self, conn: asyncpg.Connection, wanted: int):
+        free = [p for p in range(self._count) if p not in self._owned]
+        random.shuffle(free)  # Replicas do not race for the same partitions
+
+        for partition in free:
+            if len(self._owned) >= wanted:
+                return
+            if await conn.fetchval(
+                "SELECT pg_try_advisory_lock(hashtext($1), $2)", self._key, partition
+            ):
+                self._owned.add(partition)
+
+    async def rebalance(self) -> OwnedPartitions:
+        """
+        Adjust the owned partitions to the fair share of this replica, at most
+        once per `rebalance_interval`.
+
+        Returns:
+            OwnedPartitions: Partitions this replica may claim from; none while
+            the connection is lost.
+        """
+        if time.monotonic() - self._rebalanced_at < self._rebalance_interval:
+            return self.current
+        self._rebalanced_at = time.monotonic()
+
+        try:
+            if self._conn is None or self._conn.is_closed():
+                self._owned.clear()
+                await self._connect()
+            assert self._conn is not None
+
+            share = math.ceil(self._count / await self._count_replicas(self._conn))
+            if len(self._owned) > share:
+                await self._release(self._conn, sorted(self._owned)[share:])
+            elif len(self._owned) < share:
+                await self._acquire(self._conn, share)
+        except Exception:
+            self._logger.error("Failed to rebalance relay partitions:", exc_info=True)
+
+        return self.current
+
+    async def close(self):
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+
+
+async def create_pg_partition_ownership(
+    dsn: str, *, key: str, count: int, logger: Logger
+) -> AsyncIterator[PgPartitionOwnership]:
+    ownership = PgPartitionOwnership(
+        dsn.replace("+asyncpg", "", 1), key=key, count=count, logger=logger
+    )
+
+    try:
+        yield ownership
+    finally:
+        await ownership.close()
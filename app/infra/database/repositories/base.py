@@ -1,4 +1,36 @@
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import ColumnElement, func, literal
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.selectable import TableValuedAlias
+from sqlalchemy.types import TypeEngine
+
+
+def unnest_values(**columns: tuple[list[Any], TypeEngine]) -> TableValuedAlias:
+    """
+    `unnest(...) AS v(<columns>)` of equally long per-row value lists.
+
+    Lets one `UPDATE ... FROM` apply different values to every row, with a
+    single array bind parameter per column.
+    """
+    arrays = [literal(values, ARRAY(type_)) for values, type_ in columns.values()]
+    return func.unnest(*arrays).table_valued(*columns.keys()).render_derived(name="v")
+
+
+def created_within(
+    column: ColumnElement[datetime], created_at: Iterable[datetime]
+) -> ColumnElement[bool]:
+    """
+    `column BETWEEN` the first and the last of `created_at`.
+
+    Bounds the partition key of the `created_at` range partitioned tables, so
+    the planner skips the partitions without rows of a batch; a join on the
+    keys alone scans every partition.
+    """
+    created_at = list(created_at)
+    return column.between(min(created_at), max(created_at))
 
 
 class PostgresRepository:
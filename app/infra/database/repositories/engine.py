@@ -1,12 +1,98 @@
 from uuid import UUID
 
 from sentry_sdk import start_span
-from sqlalchemy import delete, literal_column, select, tuple_
+from sqlalchemy import (
+    BIGINT,
+    String,
+    cast,
+    delete,
+    exists,
+    false,
+    func,
+    literal,
+    literal_column,
+    select,
+    text,
+    true,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import BIT, JSONB
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from app.domains.engine import Engine, EngineStatus, Version
+from app.domains.engine import (
+    Engine,
+    EngineDead,
+    EngineRestored,
+    EngineStatus,
+    EngineUpdated,
+    Version,
+)
+from app.domains.event import DomainEvent
+from app.infra.database.models import (
+    BotDeliveryTask,
+    EngineDigest,
+    EngineDigestSize,
+    EngineSubscription,
+    Outbox,
+)
 from app.infra.database.models import Engine as EngineModel
 from app.infra.database.repositories.base import PostgresRepository
+from app.infra.database.repositories.outbox import outbox_row
+from app.infra.utils.time import now_utc
+from app.infra.utils.digest import BUCKET_HEX, WEIGHT_HEX, Digest
+
+
+def _md5_hex_as_bigint(hex_digits: slice):
+    """SQL counterpart of `int(md5(str(id)).hexdigest()[hex_digits], 16)`."""
+    start, stop = hex_digits.start, hex_digits.stop
+    digits = func.substr(
+        func.md5(cast(EngineModel.id, String)), start + 1, stop - start
+    )
+    return cast(cast(literal("x") + func.lpad(digits, 16, "0"), BIT(64)), BIGINT)
+
+
+# Rows per multi-row statement, keeps bind parameters far below asyncpg limit
+SAVE_CHUNK = 1000
+
+
+def _to_engine(row: EngineModel) -> Engine:
+    return Engine(
+        id=row.id,
+        uuid=row.uuid,
+        status=row.status,
+        created=row.created,
+        addr=row.addr,
+        version=Version(ts=row.version_timestamp, seq=row.version_seq),
+    )
+
+
+def _select_outbox_row(ev: DomainEvent, *, caused_by: str):
+    """`SELECT` of the literal outbox record of `ev`, to be filtered by the caller."""
+    row = outbox_row(ev, caused_by=caused_by)
+    return select(
+        literal(row["id"], Outbox.id.type),
+        literal(row["caused_by"]),
+        literal(row["aggregate_id"], Outbox.aggregate_id.type),
+        literal(row["body"], JSONB),
+        false(),
+        literal(0),
+        literal(row["created_at"], Outbox.created_at.type),
+        literal(now_utc(), Outbox.next_attempt_at.type),
+    )
+
+
+_OUTBOX_COLUMNS = [
+    Outbox.id,
+    Outbox.caused_by,
+    Outbox.aggregate_id,
+    Outbox.body,
+    Outbox.fanned_out,
+    Outbox.attempts,
+    Outbox.created_at,
+    Outbox.next_attempt_at,
+]
 
 
 class PgEngineRepository(PostgresRepository):
@@ -62,6 +148,54 @@ class PgEngineRepository(PostgresRepository):
 
             return bool(row)
 
+    async def save_many(self, engines: list[Engine]) -> set[UUID]:
+        """
+        Multi-row counterpart of `save` with the same version-guarded
+        *upsert* semantics, in one statement per `SAVE_CHUNK` engines.
+
+        Engine ids **MUST** be unique within the call.
+
+        Returns:
+            set[UUID]: IDs of engines whose persistent representation changed.
+        """
+        with start_span(op="db", name="save_engines") as span:
+            span.set_tag("engines_count", len(engines))
+
+            changed: set[UUID] = set()
+            for start in range(0, len(engines), SAVE_CHUNK):
+                stmt = pg_insert(EngineModel).values(
+                    [
+                        dict(
+                            id=engine.id,
+                            created=engine.created,
+                            addr=engine.addr,
+                            uuid=engine.uuid,
+                            status=engine.status,
+                            version_timestamp=engine.version.ts,
+                            version_seq=engine.version.seq,
+                        )
+                        for engine in engines[start : start + SAVE_CHUNK]
+                    ]
+                )
+                excluded = stmt.excluded
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=(EngineModel.id,),
+                    set_=dict(
+                        uuid=excluded.uuid,
+                        status=excluded.status,
+                        version_timestamp=excluded.version_timestamp,
+                        version_seq=excluded.version_seq,
+                    ),
+                    where=tuple_(EngineModel.version_timestamp, EngineModel.version_seq)
+                    < tuple_(excluded.version_timestamp, excluded.version_seq),
+                ).returning(EngineModel.id)
+
+                rows = await self._session.scalars(stmt)
+                changed.update(rows.all())
+
+            span.set_tag("changed_count", len(changed))
+            return changed
+
     async def get(self, engine_id: UUID) -> Engine | None:
         with start_span(op="db", name="get_engine") as span:
             span.set_tag("engine_id", str(engine_id))
@@ -71,30 +205,375 @@ class PgEngineRepository(PostgresRepository):
             if row is None:
                 return None
 
-            return Engine(
-                id=engine_id,
-                uuid=row.uuid,
-                status=row.status,
-                created=row.created,
-                addr=row.addr,
-                version=Version(ts=row.version_timestamp, seq=row.version_seq),
+            return _to_engine(row)
+
+    async def get_changes(
+        self, since: Version, *, until: Version, limit: int
+    ) -> list[Engine]:
+        """
+        Engines whose version is newer than `since` and older than `until`,
+        oldest version first.
+
+        Served by the unique index on the version columns, so a page costs
+        `limit` index entries regardless of the table size.
+        """
+        with start_span(op="db", name="get_engine_changes") as span:
+            span.set_tag("since", since.to_stream_id())
+            span.set_tag("until", until.to_stream_id())
+            span.set_tag("limit", limit)
+
+            version = tuple_(EngineModel.version_timestamp, EngineModel.version_seq)
+            stmt = (
+                select(EngineModel)
+                .where(version > (since.ts, since.seq), version < (until.ts, until.seq))
+                .order_by(EngineModel.version_timestamp, EngineModel.version_seq)
+                .limit(limit)
             )
+            rows = await self._session.scalars(stmt)
+
+            return [_to_engine(row) for row in rows]
+
+    async def get_settled_version(self, settle: float) -> Version:
+        """First version not older than `settle` seconds by the database clock."""
+        with start_span(op="db", name="get_settled_engine_version"):
+            now_ms = cast(func.floor(func.extract("epoch", func.now()) * 1000), BIGINT)
+            ts = await self._session.scalar(select(now_ms - int(settle * 1000)))
+            return Version(ts, 0)
+
+    async def get_live_digests(self, buckets: int) -> dict[int, Digest] | None:
+        """
+        Digest of the ids of engines that are not DEAD, per bucket.
+
+        Read from the trigger-maintained `engine_digests`, so it costs one row
+        per bucket regardless of the table size. Buckets and weights match
+        `app.infra.utils.digest.digest_key`.
+
+        Returns:
+            dict[int, Digest] | None: Digests of non-empty buckets, `None` if
+            they are not maintained for `buckets` (see `track_live_digests`).
+        """
+        with start_span(op="db", name="get_live_engine_digests") as span:
+            span.set_tag("buckets", buckets)
 
-    async def remove_dead(self) -> int:
-        with start_span(op="db", name="remove_dead_engines") as span:
             stmt = (
-                delete(EngineModel)
-                .where(EngineModel.status == EngineStatus.DEAD)
-                .returning(1)
+                select(EngineDigest.bucket, EngineDigest.count, EngineDigest.total)
+                .select_from(EngineDigestSize)
+                .outerjoin(
+                    EngineDigest, EngineDigest.buckets == EngineDigestSize.buckets
+                )
+                .where(EngineDigestSize.buckets == buckets)
+            )
+            rows = (await self._session.execute(stmt)).all()
+            if not rows:
+                return None
+
+            return {
+                b: (count, int(total))
+                for b, count, total in rows
+                if b is not None and count
+            }
+
+    async def get_live_ids(self, buckets: int, selected: list[int]) -> set[UUID]:
+        """Ids of engines that are not DEAD and fall into `selected` buckets."""
+        with start_span(op="db", name="get_live_engine_ids") as span:
+            span.set_tag("selected_count", len(selected))
+
+            stmt = select(EngineModel.id).where(
+                EngineModel.status != EngineStatus.DEAD,
+                (_md5_hex_as_bigint(BUCKET_HEX) % buckets).in_(selected),
             )
             rows = await self._session.scalars(stmt)
-            deleted = len(rows.all())
 
-            span.set_tag("deleted_count", deleted)
-            return deleted
+            return set(rows.all())
 
 
 class PgEngineTxRepository(PgEngineRepository):
+    async def transit_upsert(
+        self,
+        new: Engine,
+        *,
+        status: EngineStatus,
+        restored: EngineRestored,
+        updated: EngineUpdated,
+        caused_by: str,
+    ) -> Engine | None:
+        """
+        Server-side counterpart of the `Engine` upsert transition.
+
+        A stored engine with an older version gets `new.uuid`, `status` and
+        `new.version` in one statement, and the outbox receives `restored` if
+        it was DEAD, or `updated` if its uuid or status changed. Both events
+        are precomputed by the caller and only the one matching the locked old
+        row is inserted. Otherwise `new` is inserted without events, as the
+        aggregate does on creation.
+
+        Returns:
+            Engine | None: Stored engine if the row was inserted or updated.
+        """
+        with start_span(op="db", name="transit_upsert_engine") as span:
+            span.set_tag("engine_id", str(new.id))
+
+            transit = dict(
+                status=status, restored=restored, updated=updated, caused_by=caused_by
+            )
+            found, engine = await self._transit_update(new, **transit)
+            if engine is not None or found:
+                return engine
+
+            stmt = (
+                pg_insert(EngineModel)
+                .values(
+                    id=new.id,
+                    created=new.created,
+                    addr=new.addr,
+                    uuid=new.uuid,
+                    status=new.status,
+                    version_timestamp=new.version.ts,
+                    version_seq=new.version.seq,
+                )
+                .on_conflict_do_nothing(index_elements=(EngineModel.id,))
+                .returning(*EngineModel.__table__.c)
+            )
+            row = (await self._session.execute(stmt)).one_or_none()
+            if row is not None:
+                return _to_engine(row)
+
+            # Inserted by a concurrent transaction meanwhile
+            _, engine = await self._transit_update(new, **transit)
+            return engine
+
+    async def _transit_update(
+        self,
+        new: Engine,
+        *,
+        status: EngineStatus,
+        restored: EngineRestored,
+        updated: EngineUpdated,
+        caused_by: str,
+    ) -> tuple[bool, Engine | None]:
+        """
+        Update half of `transit_upsert`, in one statement.
+
+        The old row is locked and read by the `UPDATE` itself, so the events
+        are picked from the very row version that was updated.
+
+        Returns:
+            tuple[bool, Engine | None]: Whether the engine exists, and the
+            stored engine if the row changed.
+        """
+        old = select(EngineModel.id).where(EngineModel.id == new.id).cte("old")
+        locked = (
+            select(EngineModel.id, EngineModel.status, EngineModel.uuid)
+            .where(EngineModel.id == new.id)
+            .with_for_update()
+            .subquery("locked")
+        )
+        upserted = (
+            update(EngineModel)
+            .where(
+                EngineModel.id == locked.c.id,
+                tuple_(EngineModel.version_timestamp, EngineModel.version_seq)
+                < (new.version.ts, new.version.seq),
+            )
+            .values(
+                uuid=new.uuid,
+                status=status,
+                version_timestamp=new.version.ts,
+                version_seq=new.version.seq,
+            )
+            .returning(
+                *EngineModel.__table__.c,
+                locked.c.status.label("old_status"),
+                locked.c.uuid.label("old_uuid"),
+            )
+            .cte("upserted")
+        )
+
+        events = union_all(
+            _select_outbox_row(restored, caused_by=caused_by).where(
+                exists(
+                    select(upserted.c.id).where(
+                        upserted.c.old_status == EngineStatus.DEAD
+                    )
+                )
+            ),
+            _select_outbox_row(updated, caused_by=caused_by).where(
+                exists(
+                    select(upserted.c.id).where(
+                        upserted.c.old_status != EngineStatus.DEAD,
+                        (upserted.c.old_status != status)
+                        | upserted.c.old_uuid.is_distinct_from(new.uuid),
+                    )
+                )
+            ),
+        )
+        stored = (
+            pg_insert(Outbox)
+            .from_select(_OUTBOX_COLUMNS, events)
+            .on_conflict_do_nothing(index_elements=["id", "created_at"])
+            .returning(Outbox.id)
+            .cte("stored")
+        )
+
+        columns = [upserted.c[c.name] for c in EngineModel.__table__.c]
+        stmt = select(
+            exists(select(old.c.id)),
+            select(func.count()).select_from(stored).scalar_subquery(),
+            *columns,
+        ).select_from(select(True).subquery().outerjoin(upserted, true()))
+        row = (await self._session.execute(stmt)).one()
+
+        return row[0], _to_engine(row) if row.id is not None else None
+
+    async def transit_dead(
+        self, id: UUID, *, version: Version, dead: EngineDead, caused_by: str
+    ) -> tuple[bool, Engine | None]:
+        """
+        Server-side counterpart of `Engine.mark_dead`, in one statement.
+
+        A stored engine with an older version becomes DEAD at `version` and
+        the precomputed `dead` event goes to the outbox.
+
+        Returns:
+            tuple[bool, Engine | None]: Whether the engine exists, and the
+            stored engine if the row changed.
+        """
+        with start_span(op="db", name="transit_dead_engine") as span:
+            span.set_tag("engine_id", str(id))
+
+            old = select(EngineModel.id).where(EngineModel.id == id).cte("old")
+            updated = (
+                update(EngineModel)
+                .where(
+                    EngineModel.id == id,
+                    tuple_(EngineModel.version_timestamp, EngineModel.version_seq)
+                    < (version.ts, version.seq),
+                )
+                .values(
+                    status=EngineStatus.DEAD,
+                    version_timestamp=version.ts,
+                    version_seq=version.seq,
+                )
+                .returning(*EngineModel.__table__.c)
+                .cte("updated")
+            )
+            is_changed = exists(select(updated.c.id))
+            stored = (
+                pg_insert(Outbox)
+                .from_select(
+                    _OUTBOX_COLUMNS,
+                    _select_outbox_row(dead, caused_by=caused_by).where(is_changed),
+                )
+                .on_conflict_do_nothing(index_elements=["id", "created_at"])
+                .returning(Outbox.id)
+                .cte("stored")
+            )
+
+            stmt = select(
+                exists(select(old.c.id)),
+                select(func.count()).select_from(stored).scalar_subquery(),
+                updated,
+            ).select_from(select(True).subquery().outerjoin(updated, true()))
+            row = (await self._session.execute(stmt)).one()
+
+            span.set_tag("events_count", row[1])
+            return row[0], _to_engine(row) if row.id is not None else None
+
+    async def track_live_digests(self, buckets: int) -> dict[int, Digest]:
+        """
+        Start maintaining the digests over `buckets` buckets.
+
+        The digests are computed from the table once; writes to `engines`
+        wait for it, so none of them is missed or counted twice.
+
+        Returns:
+            dict[int, Digest]: Digests of non-empty buckets.
+        """
+        with start_span(op="db", name="track_live_engine_digests") as span:
+            span.set_tag("buckets", buckets)
+
+            await self._session.execute(text("LOCK TABLE engines IN SHARE MODE"))
+            registered = await self._session.scalar(
+                pg_insert(EngineDigestSize)
+                .values(buckets=buckets)
+                .on_conflict_do_nothing()
+                .returning(EngineDigestSize.buckets)
+            )
+            if registered is not None:
+                bucket = (_md5_hex_as_bigint(BUCKET_HEX) % buckets).label("bucket")
+                stmt = pg_insert(EngineDigest).from_select(
+                    ["buckets", "bucket", "count", "total"],
+                    select(
+                        literal(buckets),
+                        bucket,
+                        func.count(),
+                        func.sum(_md5_hex_as_bigint(WEIGHT_HEX)),
+                    )
+                    .where(EngineModel.status != EngineStatus.DEAD)
+                    .group_by(bucket),
+                )
+                await self._session.execute(stmt)
+
+            return await self.get_live_digests(buckets) or {}
+
+    async def remove_dead_chunk(
+        self, *, dead_before: int, after: UUID | None, limit: int
+    ) -> tuple[list[UUID], int]:
+        """
+        Delete up to `limit` DEAD engines with IDs above `after`.
+
+        Only engines which became DEAD before the `dead_before` version
+        timestamp are deleted. Engines locked by a concurrent transition are
+        skipped. Delivery tasks and subscriptions of the engines are deleted
+        explicitly, so the cascade cost of the chunk is known.
+
+        Returns:
+            tuple[list[UUID], int]: Deleted IDs in order, empty when nothing
+            is left, and number of deleted dependent rows.
+        """
+        with start_span(op="db", name="remove_dead_engines_chunk") as span:
+            span.set_tag("limit", limit)
+
+            stmt = (
+                select(EngineModel.id)
+                .where(
+                    EngineModel.status == EngineStatus.DEAD,
+                    EngineModel.version_timestamp < dead_before,
+                )
+                .order_by(EngineModel.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            if after is not None:
+                stmt = stmt.where(EngineModel.id > after)
+            ids = list((await self._session.scalars(stmt)).all())
+            if not ids:
+                return [], 0
+
+            subscriptions = select(EngineSubscription.id).where(
+                EngineSubscription.engine_id.in_(ids)
+            )
+            tasks_stmt = (
+                delete(BotDeliveryTask)
+                .where(BotDeliveryTask.subscription_id.in_(subscriptions))
+                .returning(1)
+            )
+            tasks = len((await self._session.scalars(tasks_stmt)).all())
+
+            subscriptions_stmt = (
+                delete(EngineSubscription)
+                .where(EngineSubscription.engine_id.in_(ids))
+                .returning(1)
+            )
+            subs = len((await self._session.scalars(subscriptions_stmt)).all())
+
+            engines_stmt = delete(EngineModel).where(EngineModel.id.in_(ids))
+            await self._session.execute(engines_stmt)
+
+            span.set_tag("deleted_count", len(ids))
+            span.set_tag("cascade_count", tasks + subs)
+            return ids, tasks + subs
+
     async def get_for_update(self, engine_id: UUID) -> Engine | None:
         """
         Retrieve the **current persistent snapshot** of an `Engine` aggregate
@@ -111,11 +590,24 @@ class PgEngineTxRepository(PgEngineRepository):
             if row is None:
                 return None
 
-            return Engine(
-                id=engine_id,
-                uuid=row.uuid,
-                status=row.status,
-                created=row.created,
-                addr=row.addr,
-                version=Version(ts=row.version_timestamp, seq=row.version_seq),
+            return _to_engine(row)
+
+    async def get_many_for_update(self, engine_ids: list[UUID]) -> dict[UUID, Engine]:
+        """
+        Bulk counterpart of `get_for_update`.
+
+        Rows are locked in ID order, so concurrent batches never deadlock on
+        each other. Missing engines are absent from the result.
+        """
+        with start_span(op="db", name="get_engines_for_update") as span:
+            span.set_tag("engines_count", len(engine_ids))
+
+            stmt = (
+                select(EngineModel)
+                .where(EngineModel.id.in_(engine_ids))
+                .order_by(EngineModel.id)
+                .with_for_update()
             )
+            rows = await self._session.scalars(stmt)
+
+            return {row.id: _to_engine(row) for row in rows}
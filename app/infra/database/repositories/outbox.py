@@ -1,58 +1,125 @@
-import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Any
 from uuid import NAMESPACE_URL, UUID, uuid5
 
 from sentry_sdk import start_span
-from sqlalchemy import and_, select, update
+from sqlalchemy import BigInteger, Text, and_, cast, func, select, tuple_, update
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
+from app.domains.engine import Version
 from app.domains.event import DomainEvent
 from app.infra.database.models import Outbox
-from app.infra.database.repositories.base import PostgresRepository
+from app.infra.database.ownership import OwnedPartitions
+from app.infra.database.repositories.base import (
+    PostgresRepository,
+    created_within,
+    unnest_values,
+)
 from app.infra.utils.time import now_utc
 from app.schemas.outbox import OutboxDTO
 
 
+STORE_CHUNK = 1000  # Rows per multi-row INSERT, bounded by bind parameters
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _to_json(value: Any) -> Any:
+    """JSON-native copy of `value`; anything but containers and scalars as `str`."""
+    if isinstance(value, str):
+        return str(value)  # Plain `str` of `StrEnum` members
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    return str(value)
+
+
+def outbox_created_at(ev: DomainEvent) -> datetime:
+    """
+    `created_at` of the outbox record carrying `ev`: the time of its version.
+
+    The primary key includes the partition key, so it is derived from the
+    event like the id is; a record stored again gets the same key and is
+    skipped.
+    """
+    ts = Version.from_stream_id(ev.version).ts
+    return EPOCH + timedelta(milliseconds=ts)
+
+
+def outbox_row(ev: DomainEvent, *, caused_by: str) -> dict:
+    """Column values of the outbox record carrying `ev`."""
+    oid = uuid5(NAMESPACE_URL, f"{caused_by}:{ev.id}")
+    return dict(
+        id=oid,
+        caused_by=caused_by if caused_by is not None else str(oid),
+        aggregate_id=ev.aggregate_id,
+        body=_to_json(ev.to_dict()),
+        created_at=outbox_created_at(ev),
+    )
+
+
 class PgOutboxRepository(PostgresRepository):
-    async def store(self, events: list[DomainEvent], *, caused_by: str) -> None:
+    async def store(
+        self, events: list[DomainEvent], *, caused_by: str | list[str]
+    ) -> None:
         """
         Persist a **batch** of `DomainEvent` inside the **current transaction.
 
+        Events are inserted in one statement per `STORE_CHUNK` events; events
+        already stored for their `caused_by` are skipped.
+
         Args:
             events:
                 A list of domain events collected during the use-case execution.
             caused_by:
                 Deduplication key (e.g. Redis ``stream_id`` of the
-                upstream message).
+                upstream message), shared by all events or one per event.
         """
         with start_span(op="db", name="store_outbox_events") as span:
-            span.set_tag("caused_by", caused_by)
+            if isinstance(caused_by, str):
+                span.set_tag("caused_by", caused_by)
+                caused_by = [caused_by] * len(events)
+            elif len(caused_by) != len(events):
+                raise ValueError("Every event must have its own caused_by.")
             span.set_tag("events_count", len(events))
 
-            for ev in events:
-                oid = uuid5(NAMESPACE_URL, f"{caused_by}:{ev.id}")
-
-                caused_by = caused_by if caused_by is not None else str(oid)
-
+            rows = [
+                outbox_row(ev, caused_by=cause) for ev, cause in zip(events, caused_by)
+            ]
+            for start in range(0, len(rows), STORE_CHUNK):
                 stmt = (
                     pg_insert(Outbox)
-                    .values(
-                        id=oid,
-                        caused_by=caused_by,
-                        body=json.loads(json.dumps(ev.to_dict(), default=str)),
-                    )
-                    .on_conflict_do_nothing(index_elements=["id"])
+                    .values(rows[start : start + STORE_CHUNK])
+                    .on_conflict_do_nothing(index_elements=["id", "created_at"])
                 )
                 await self._session.execute(stmt)
 
-    async def mark_fanned_out(self, outbox_id: UUID) -> None:
-        """Updates the `fanned_out` status to True."""
+    async def mark_fanned_out_many(self, records: list[OutboxDTO]) -> None:
+        """Updates the `fanned_out` status to True for every record in one statement."""
         with start_span(op="db", name="mark_outbox_fanned_out") as span:
-            span.set_tag("outbox.id", str(outbox_id))
+            span.set_tag("records_count", len(records))
+            if not records:
+                return
 
+            keys = unnest_values(
+                id=([rec.id for rec in records], Outbox.id.type),
+                created_at=(
+                    [rec.created_at for rec in records],
+                    Outbox.created_at.type,
+                ),
+            )
             stmt = (
                 update(Outbox)
-                .where(Outbox.id == outbox_id)
+                .where(
+                    Outbox.id == keys.c.id,
+                    Outbox.created_at == keys.c.created_at,
+                    created_within(
+                        Outbox.created_at, (rec.created_at for rec in records)
+                    ),
+                )
                 .values(
                     fanned_out=True,
                     fanned_out_at=now_utc(),
@@ -61,38 +128,97 @@ class PgOutboxRepository(PostgresRepository):
             )
             await self._session.execute(stmt)
 
-    async def mark_failed(self, next_attempt_at: datetime, *, outbox_id: UUID) -> None:
+    async def mark_failed_many(
+        self, records: list[OutboxDTO], *, next_attempts: dict[UUID, datetime]
+    ) -> None:
         """
-        Marks the specified outbox record as failed.
-        Increments the `attempts` counter for the outbox record identified by `outbox_id`.
+        Marks the outbox records as failed in one statement.
+        Increments the `attempts` counter of every record and sets its own
+        `next_attempt_at` from `next_attempts`.
         """
         with start_span(op="db", name="mark_outbox_failed") as span:
-            span.set_tag("outbox.id", str(outbox_id))
+            span.set_tag("records_count", len(records))
+            if not records:
+                return
 
+            values = unnest_values(
+                id=([rec.id for rec in records], Outbox.id.type),
+                created_at=(
+                    [rec.created_at for rec in records],
+                    Outbox.created_at.type,
+                ),
+                next_attempt_at=(
+                    [next_attempts[rec.id] for rec in records],
+                    Outbox.next_attempt_at.type,
+                ),
+            )
             stmt = (
                 update(Outbox)
-                .where(Outbox.id == outbox_id)
-                .values(attempts=Outbox.attempts + 1, next_attempt_at=next_attempt_at)
+                .where(
+                    Outbox.id == values.c.id,
+                    Outbox.created_at == values.c.created_at,
+                    created_within(
+                        Outbox.created_at, (rec.created_at for rec in records)
+                    ),
+                )
+                .values(
+                    attempts=Outbox.attempts + 1,
+                    next_attempt_at=values.c.next_attempt_at,
+                )
             )
             await self._session.execute(stmt)
 
-    async def extract_events(self, outbox_ids: list[UUID]) -> dict[UUID, DomainEvent]:
+    async def extract_events(
+        self, outbox_ids: dict[UUID, datetime]
+    ) -> dict[UUID, DomainEvent]:
+        """Events of the outbox records, given with their `created_at`."""
         with start_span(op="db", name="extract_outbox_events"):
-            stmt = select(Outbox.id, Outbox.body).where(Outbox.id.in_(outbox_ids))
+            if not outbox_ids:
+                return {}
+
+            keys = unnest_values(
+                id=(list(outbox_ids.keys()), Outbox.id.type),
+                created_at=(list(outbox_ids.values()), Outbox.created_at.type),
+            )
+            stmt = (
+                select(Outbox.id, Outbox.body)
+                .select_from(keys)
+                .join(
+                    Outbox,
+                    (Outbox.id == keys.c.id) & (Outbox.created_at == keys.c.created_at),
+                )
+                .where(created_within(Outbox.created_at, outbox_ids.values()))
+            )
             rows = (await self._session.execute(stmt)).all()
 
             return {id: DomainEvent.from_dict(body) for id, body in rows}
 
 
+def relay_partition(aggregate_id, count: int):
+    """Relay partition of `aggregate_id`: `hashtext(aggregate_id) % count`."""
+    hashed = cast(func.hashtext(cast(aggregate_id, Text)), BigInteger)
+    return hashed.op("&")(0x7FFFFFFF) % count  # Non-negative, even for INT_MIN
+
+
 class PgOutboxTxRepository(PgOutboxRepository):
-    async def claim_batch(self, batch: int, *, max_attempts: int) -> list[OutboxDTO]:
+    async def claim_batch(
+        self, batch: int, *, max_attempts: int, partitions: OwnedPartitions
+    ) -> list[OutboxDTO]:
         """
-        Claim a batch of unprocessed outbox records.
+        Claim a batch of unprocessed outbox records of the owned relay partitions.
 
-        This method selects up to `batch` unpublished outbox records from the database,
-        locking them for update and skipping any that are already locked by other transactions.
+        Records are claimed in `next_attempt_at`, `created_at` order, skipping
+        the rows locked by another relay, e.g. by the previous owner of a
+        partition while ownership moves. So that no record overtakes an earlier
+        one of its aggregate, records are left out of the batch while an
+        earlier record of their aggregate is pending but not claimed with them;
+        their locks are released with the transaction.
         """
         with start_span(op="db", name="claim_outbox_batch") as span:
+            span.set_tag("partitions_count", len(partitions.owned))
+            if not partitions.owned:
+                return []
+
             stmt = (
                 select(Outbox)
                 .where(
@@ -100,13 +226,23 @@ class PgOutboxTxRepository(PgOutboxRepository):
                         Outbox.fanned_out.is_(False),
                         Outbox.attempts < max_attempts,
                         Outbox.next_attempt_at <= now_utc(),
+                        relay_partition(
+                            # Records stored by a previous release have no aggregate
+                            func.coalesce(Outbox.aggregate_id, Outbox.id),
+                            partitions.count,
+                        ).in_(sorted(partitions.owned)),
                     )
                 )
+                .order_by(Outbox.next_attempt_at, Outbox.created_at)
                 .with_for_update(skip_locked=True)
                 .limit(batch)
             )
 
-            rows = await self._session.scalars(stmt)
+            rows = list(await self._session.scalars(stmt))
+            held = await self._get_overtaking(rows, max_attempts=max_attempts)
+            if held:
+                rows = [row for row in rows if row.aggregate_id not in held]
+                span.set_tag("held_count", len(held))
 
             result = [
                 OutboxDTO(
@@ -114,6 +250,7 @@ class PgOutboxTxRepository(PgOutboxRepository):
                     caused_by=row.caused_by,
                     id=row.id,
                     attempts=row.attempts,
+                    created_at=row.created_at,
                 )
                 for row in rows
             ]
@@ -121,3 +258,47 @@ class PgOutboxTxRepository(PgOutboxRepository):
             span.set_tag("claimed_count", len(result))
 
             return result
+
+    async def _get_overtaking(
+        self, rows: list[Outbox], *, max_attempts: int
+    ) -> set[UUID]:
+        """
+        Aggregates of `rows` with an earlier pending record which is not one
+        of `rows`: locked by another relay, or not due yet.
+
+        Records are ordered by the version of their event; `created_at` is
+        its timestamp, the sequence breaks ties within a millisecond.
+        """
+        rows = [row for row in rows if row.aggregate_id is not None]
+        if not rows:
+            return set()
+
+        claimed = unnest_values(
+            aggregate_id=([row.aggregate_id for row in rows], Outbox.aggregate_id.type),
+            created_at=([row.created_at for row in rows], Outbox.created_at.type),
+            seq=(
+                [Version.from_stream_id(row.body["version"]).seq for row in rows],
+                BigInteger(),
+            ),
+        )
+        seq = cast(func.split_part(Outbox.body["version"].astext, "-", 2), BigInteger)
+        stmt = (
+            select(claimed.c.aggregate_id)
+            .distinct()
+            .select_from(claimed)
+            .join(
+                Outbox,
+                (Outbox.aggregate_id == claimed.c.aggregate_id)
+                & (
+                    tuple_(Outbox.created_at, seq)
+                    < tuple_(claimed.c.created_at, claimed.c.seq)
+                ),
+            )
+            .where(
+                Outbox.fanned_out.is_(False),
+                Outbox.attempts < max_attempts,
+                Outbox.created_at <= max(row.created_at for row in rows),
+                Outbox.id.not_in([row.id for row in rows]),
+            )
+        )
+        return set(await self._session.scalars(stmt))
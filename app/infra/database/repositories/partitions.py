@@ -0,0 +1,198 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+from sentry_sdk import start_span
+from sqlalchemy import func, select, text
+
+from app.infra.database.repositories.base import PostgresRepository
+
+# Rows which may still be processed, per partitioned table
+PENDING = {
+    "outbox": "fanned_out IS false AND attempts < :max_attempts",
+    "delivery_tasks": "published IS false AND attempts < :max_attempts",
+}
+
+PARTITION_NAME = re.compile(r"^(outbox|delivery_tasks)_(p\d{8}|legacy|default)$")
+
+_BOUND = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def _parse_bound(value: str) -> datetime | None:
+    return (
+        None
+        if value in ("MINVALUE", "MAXVALUE")
+        else datetime.fromisoformat(value.strip("'"))
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class Partition:
+    """Daily range partition; `None` bounds are open, both are `None` for DEFAULT."""
+
+    name: str
+    lower: datetime | None
+    upper: datetime | None
+
+    @property
+    def is_default(self) -> bool:
+        return self.lower is None and self.upper is None
+
+    def covers(self, lower: datetime, upper: datetime) -> bool:
+        return (
+            not self.is_default
+            and (self.lower is None or self.lower <= lower)
+            and (self.upper is None or upper <= self.upper)
+        )
+
+
+def partition_name(table: str, day: datetime) -> str:
+    return f"{table}_p{day:%Y%m%d}"
+
+
+class PgPartitionTxRepository(PostgresRepository):
+    """
+    DDL of the `created_at` range partitions of the outbox tables.
+
+    Table and partition names are never taken from user input, so they are
+    safe to interpolate into the statements.
+    """
+
+    async def try_lock(self, key: str, *, lock_timeout_ms: int) -> bool:
+        """
+        Take the transaction-level advisory lock of `key`, if it is free.
+
+        DDL of the transaction then waits at most `lock_timeout_ms` for the
+        table locks, so it never stalls writers for long.
+        """
+        with start_span(op="db", name="lock_partitions"):
+            locked = await self._session.scalar(
+                select(func.pg_try_advisory_xact_lock(func.hashtext(key)))
+            )
+            if locked:
+                await self._session.execute(
+                    text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}")
+                )
+            return bool(locked)
+
+    async def get_partitions(self, table: str) -> list[Partition]:
+        with start_span(op="db", name="get_partitions") as span:
+            span.set_tag("table", table)
+
+            stmt = text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:table)"
+            )
+            rows = await self._session.execute(stmt, dict(table=table))
+
+            partitions: list[Partition] = []
+            for name, bound in rows:
+                match = _BOUND.search(bound)
+                if match is None:
+                    partitions.append(Partition(name, None, None))  # DEFAULT
+                    continue
+
+                lower, upper = match.groups()
+                partitions.append(
+                    Partition(name, _parse_bound(lower), _parse_bound(upper))
+                )
+            return partitions
+
+    async def create_partition(
+        self,
+        table: str,
+        *,
+        lower: datetime,
+        upper: datetime,
+        default: str | None = None,
+    ) -> tuple[str, int]:
+        """
+        Create the partition of `table` from `lower` to `upper`.
+
+        A new partition must not overlap rows of the DEFAULT partition, so the
+        rows of the range which landed in `default` are moved into the new
+        table first, and the table is attached afterwards. `default` is
+        locked against writes first, so no row lands there meanwhile.
+
+        Must run under the lock of `try_lock`; a partition created by a
+        previous holder is left as it is.
+
+        Returns:
+            tuple[str, int]: Name of the partition and number of moved rows.
+        """
+        with start_span(op="db", name="create_partition") as span:
+            name = partition_name(table, lower)
+            span.set_tag("partition", name)
+
+            if default is not None:
+                await self._session.execute(
+                    text(f"LOCK TABLE {default} IN SHARE ROW EXCLUSIVE MODE")
+                )
+            if await self._session.scalar(
+                text("SELECT to_regclass(:name) IS NOT NULL"), dict(name=name)
+            ):
+                return name, 0
+
+            bounds = f"FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            in_range = (
+                f"created_at >= '{lower.isoformat()}' "
+                f"AND created_at < '{upper.isoformat()}'"
+            )
+
+            if default is None or not await self._session.scalar(
+                text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})")
+            ):
+                await self._session.execute(
+                    text(
+                        f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"
+                    )
+                )
+                return name, 0
+
+            # Moved between the partitions directly, so the triggers of the
+            # parent table do not fire for rows stored long ago
+            await self._session.execute(
+                text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+            )
+            result = await self._session.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM {default} WHERE {in_range} "
+                    f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+                )
+            )
+            await self._session.execute(
+                text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}")
+            )
+
+            span.set_tag("moved_count", result.rowcount)
+            return name, result.rowcount
+
+    async def has_pending(
+        self, table: str, partition: str, *, max_attempts: int
+    ) -> bool:
+        """
+        Whether `partition` of `table` has rows that are neither processed
+        nor out of attempts.
+        """
+        with start_span(op="db", name="check_partition_pending") as span:
+            span.set_tag("partition", partition)
+
+            stmt = text(
+                f"SELECT EXISTS (SELECT 1 FROM {partition} WHERE {PENDING[table]})"
+            )
+            return bool(
+                await self._session.scalar(stmt, dict(max_attempts=max_attempts))
+            )
+
+    async def remove_partition(self, table: str, partition: str, *, drop: bool):
+        """Detach `partition` from `table`, and drop it if `drop` is set."""
+        with start_span(op="db", name="remove_partition") as span:
+            span.set_tag("partition", partition)
+            span.set_tag("drop", drop)
+
+            await self._session.execute(
+                text(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+            )
+            if drop:
+                await self._session.execute(text(f"DROP TABLE {partition}"))
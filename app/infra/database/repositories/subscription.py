@@ -6,7 +6,11 @@ from sqlalchemy import delete, insert, select, tuple_
 from app.domains.event import DomainEvent
 from app.infra.database.models import EngineSubscription, User
 from app.infra.database.repositories.base import PostgresRepository
-from app.schemas.billing import CreateEngineSubscription, EngineSubscriptionDTO
+from app.schemas.billing import (
+    CreateEngineSubscription,
+    EngineSubscriptionDTO,
+    SubscriptionRouteDTO,
+)
 
 
 def _to_dto(row: EngineSubscription) -> EngineSubscriptionDTO:
@@ -57,6 +61,29 @@ class PgSubscriptionRepository(PostgresRepository):
             rows = (await self._session.execute(stmt)).all()
             return {id: telegram_id for id, telegram_id in rows}
 
+    async def get_routes(
+        self, engine_ids: list[UUID] | None = None
+    ) -> list[SubscriptionRouteDTO]:
+        """Subscriptions of `engine_ids` with their telegram ids, all if `None`."""
+        with start_span(op="db", name="get_engine_subscription_routes") as span:
+            stmt = select(
+                EngineSubscription.id,
+                EngineSubscription.engine_id,
+                EngineSubscription.event,
+                User.telegram_id,
+            ).join(User, EngineSubscription.user_id == User.id)
+            if engine_ids is not None:
+                span.set_tag("engines_count", len(engine_ids))
+                stmt = stmt.where(EngineSubscription.engine_id.in_(engine_ids))
+
+            rows = (await self._session.execute(stmt)).all()
+            return [
+                SubscriptionRouteDTO(
+                    id=id, engine_id=engine_id, event=event, telegram_id=telegram_id
+                )
+                for id, engine_id, event, telegram_id in rows
+            ]
+
     async def get_subscriptions_by_user_and_engine(
         self, user_id: UUID, engine_id: UUID
     ) -> list[EngineSubscriptionDTO]:
@@ -2,14 +2,20 @@ from datetime import datetime
 from uuid import UUID
 
 from sentry_sdk import start_span
-from sqlalchemy import select, update
+from sqlalchemy import Uuid, case, cast, false, func, literal, or_, select, update
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.infra.database import constraints
-from app.infra.database.models import BotDeliveryTask
-from app.infra.database.repositories.base import PostgresRepository
+from app.infra.database.models import BotDeliveryTask, EngineSubscription, Outbox
+from app.infra.database.repositories.base import (
+    PostgresRepository,
+    created_within,
+    unnest_values,
+)
 from app.infra.utils.time import now_utc
-from app.schemas.outbox import BotDeliveryTaskDTO, CreateBotDeliveryTask
+from app.schemas.outbox import BotDeliveryTaskDTO, CreateBotDeliveryTask, OutboxDTO
+
+STORE_CHUNK = 1000  # Rows per multi-row INSERT, bounded by bind parameters
 
 
 class PgBotDeliveryTaskRepository(PostgresRepository):
@@ -23,85 +29,244 @@ class PgBotDeliveryTaskRepository(PostgresRepository):
         with start_span(op="db", name="store_delivery_tasks") as span:
             span.set_tag("tasks_count", len(tasks))
 
-            for task in tasks:
+            rows = [
+                dict(
+                    outbox_id=task.outbox_id,
+                    subscription_id=task.subscription_id,
+                    created_at=task.created_at,
+                )
+                for task in tasks
+            ]
+            for start in range(0, len(rows), STORE_CHUNK):
                 stmt = (
                     pg_insert(BotDeliveryTask)
-                    .values(
-                        outbox_id=task.outbox_id,
-                        subscription_id=task.subscription_id,
-                    )
+                    .values(rows[start : start + STORE_CHUNK])
                     .on_conflict_do_nothing(
                         constraint=constraints.bot_delivery_task_unique
                     )
                 )
                 await self._session.execute(stmt)
 
-    async def mark_published(self, task_id: UUID) -> None:
-        with start_span(op="db", name="mark_bot_delivery_task_published") as span:
-            span.set_tag("task.id", str(task_id))
+    async def spawn_for_outbox(self, records: list[OutboxDTO]) -> int:
+        """
+        Create the tasks of every subscription matching the outbox `records`
+        with one `INSERT ... SELECT` inside the **current transaction.
+
+        Subscriptions are matched against the event type and aggregate id of
+        the stored event body, so no subscription leaves the database. Tasks
+        which already exist are skipped.
+
+        Returns:
+            int: Number of created tasks.
+        """
+        with start_span(op="db", name="spawn_delivery_tasks") as span:
+            span.set_tag("records_count", len(records))
+            if not records:
+                return 0
 
+            claimed = unnest_values(
+                id=([rec.id for rec in records], Outbox.id.type),
+                created_at=(
+                    [rec.created_at for rec in records],
+                    Outbox.created_at.type,
+                ),
+            )
+            aggregate_id = func.coalesce(
+                Outbox.aggregate_id, cast(Outbox.body["aggregate_id"].astext, Uuid)
+            )
+            subscriptions = (
+                select(
+                    func.gen_random_uuid(),
+                    Outbox.id,
+                    EngineSubscription.id,
+                    Outbox.created_at,  # Partition of the outbox record
+                    false(),
+                    literal(0),
+                    func.now(),
+                )
+                .select_from(claimed)
+                .join(
+                    Outbox,
+                    (Outbox.id == claimed.c.id)
+                    & (Outbox.created_at == claimed.c.created_at),
+                )
+                .join(
+                    EngineSubscription,
+                    (EngineSubscription.engine_id == aggregate_id)
+                    & (EngineSubscription.event == Outbox.body["event_type"].astext),
+                )
+                .where(
+                    created_within(
+                        Outbox.created_at, (rec.created_at for rec in records)
+                    )
+                )
+            )
             stmt = (
-                update(BotDeliveryTask)
-                .where(BotDeliveryTask.id == task_id)
-                .values(
-                    published=True,
-                    attempts=BotDeliveryTask.attempts + 1,
-                    published_at=now_utc(),
+                pg_insert(BotDeliveryTask)
+                .from_select(
+                    [
+                        BotDeliveryTask.id,
+                        BotDeliveryTask.outbox_id,
+                        BotDeliveryTask.subscription_id,
+                        BotDeliveryTask.created_at,
+                        BotDeliveryTask.published,
+                        BotDeliveryTask.attempts,
+                        BotDeliveryTask.next_attempt_at,
+                    ],
+                    subscriptions,
                 )
+                .on_conflict_do_nothing(constraint=constraints.bot_delivery_task_unique)
             )
-            await self._session.execute(stmt)
+            result = await self._session.execute(stmt)
+
+            span.set_tag("tasks_count", result.rowcount)
+            return result.rowcount
 
-    async def mark_failed(self, next_attempt_at: datetime, *, task_id: UUID) -> None:
+    async def acknowledge(
+        self,
+        *,
+        leased_until: datetime,
+        created_at: dict[UUID, datetime],
+        published: list[UUID],
+        failed: dict[UUID, datetime],
+        postponed: dict[UUID, datetime] | None = None,
+    ) -> int:
         """
-        Marks the specified task as failed.
-        Increments the `attempts` counter for the task identified by `task_id`.
+        Apply the results of a leased batch in one statement and release it.
+
+        Tasks in `published` are marked published; tasks in `failed` and
+        `postponed` are rescheduled to their own `next_attempt_at`, where a
+        postponed task gets back the attempt counted by its claim. Tasks are
+        looked up by their `created_at`, which selects their partition. Only tasks
+        still holding the lease `leased_until` are changed, so a task
+        reclaimed after its lease expired is left to its new holder.
+
+        Returns:
+            int: Number of acknowledged tasks.
         """
-        with start_span(op="db", name="mark_bot_delivery_task_failed") as span:
-            span.set_tag("task.id", str(task_id))
+        postponed = postponed or {}
+        with start_span(op="db", name="acknowledge_delivery_tasks") as span:
+            span.set_tag("published_count", len(published))
+            span.set_tag("failed_count", len(failed))
+            span.set_tag("postponed_count", len(postponed))
+            if not published and not failed and not postponed:
+                return 0
 
+            ids = [*published, *failed.keys(), *postponed.keys()]
+            values = unnest_values(
+                id=(ids, BotDeliveryTask.id.type),
+                created_at=(
+                    [created_at[id] for id in ids],
+                    BotDeliveryTask.created_at.type,
+                ),
+                published=(
+                    [True] * len(published) + [False] * (len(failed) + len(postponed)),
+                    BotDeliveryTask.published.type,
+                ),
+                attempted=(
+                    [True] * (len(published) + len(failed)) + [False] * len(postponed),
+                    BotDeliveryTask.published.type,
+                ),
+                next_attempt_at=(
+                    [None] * len(published)
+                    + list(failed.values())
+                    + list(postponed.values()),
+                    BotDeliveryTask.next_attempt_at.type,
+                ),
+            )
             stmt = (
                 update(BotDeliveryTask)
-                .where(BotDeliveryTask.id == task_id)
+                .where(
+                    BotDeliveryTask.id == values.c.id,
+                    BotDeliveryTask.created_at == values.c.created_at,
+                    created_within(
+                        BotDeliveryTask.created_at, (created_at[id] for id in ids)
+                    ),
+                    BotDeliveryTask.leased_until == leased_until,
+                )
                 .values(
-                    attempts=BotDeliveryTask.attempts + 1,
-                    next_attempt_at=next_attempt_at,
+                    published=values.c.published,
+                    published_at=case(
+                        (values.c.published, now_utc()),
+                        else_=BotDeliveryTask.published_at,
+                    ),
+                    attempts=case(
+                        (values.c.attempted, BotDeliveryTask.attempts),
+                        else_=BotDeliveryTask.attempts - 1,
+                    ),
+                    next_attempt_at=func.coalesce(
+                        values.c.next_attempt_at, BotDeliveryTask.next_attempt_at
+                    ),
+                    leased_until=None,
                 )
             )
-            await self._session.execute(stmt)
+            result = await self._session.execute(stmt)
+
+            span.set_tag("acknowledged_count", result.rowcount)
+            return result.rowcount
 
 
 class PgBotDeliveryTaskTxRepository(PgBotDeliveryTaskRepository):
     async def claim_batch(
-        self, batch: int, *, max_attempts: int
+        self, batch: int, *, max_attempts: int, leased_until: datetime
     ) -> list[BotDeliveryTaskDTO]:
         """
-        Claims a batch of unpublished delivery tasks.
+        Lease a batch of unpublished delivery tasks until `leased_until`.
 
-        This method selects up to `batch` unpublished tasks from the database,
-        locking them for update and skipping any that are already locked by other transactions.
+        Up to `batch` due tasks without a live lease are selected, skipping
+        the ones locked by other transactions, and leased with one `UPDATE`
+        which also counts the attempt. The row locks only last until the
+        transaction commits; the lease keeps other workers away meanwhile,
+        and an expired lease makes the task claimable again.
         """
         with start_span(op="db", name="claim_delivery_tasks") as span:
-            stmt = (
-                select(BotDeliveryTask)
+            now = now_utc()
+            claimed = (
+                select(BotDeliveryTask.id, BotDeliveryTask.created_at)
                 .where(
                     BotDeliveryTask.published.is_(False),
                     BotDeliveryTask.attempts < max_attempts,
-                    BotDeliveryTask.next_attempt_at <= now_utc(),
+                    BotDeliveryTask.next_attempt_at <= now,
+                    or_(
+                        BotDeliveryTask.leased_until.is_(None),
+                        BotDeliveryTask.leased_until <= now,
+                    ),
                 )
+                .order_by(BotDeliveryTask.next_attempt_at)
                 .with_for_update(skip_locked=True)
                 .limit(batch)
+                .cte("claimed")
+            )
+            stmt = (
+                update(BotDeliveryTask)
+                .where(
+                    BotDeliveryTask.id == claimed.c.id,
+                    BotDeliveryTask.created_at == claimed.c.created_at,
+                )
+                .values(
+                    leased_until=leased_until,
+                    attempts=BotDeliveryTask.attempts + 1,
+                )
+                .returning(
+                    BotDeliveryTask.id,
+                    BotDeliveryTask.outbox_id,
+                    BotDeliveryTask.subscription_id,
+                    BotDeliveryTask.attempts,
+                    BotDeliveryTask.created_at,
+                )
             )
 
-            rows = await self._session.scalars(stmt)
+            rows = await self._session.execute(stmt)
 
             result = [
                 BotDeliveryTaskDTO(
-                    id=row.id,
-                    outbox_id=row.outbox_id,
-                    subscription_id=row.subscription_id,
-                    attempts=row.attempts,
+                    id=id,
+                    outbox_id=outbox_id,
+                    subscription_id=subscription_id,
+                    attempts=attempts,
+                    created_at=created_at,
                 )
-                for row in rows
+                for id, outbox_id, subscription_id, attempts, created_at in rows
             ]
 
             span.set_tag("claimed_count", len(result))
@@ -28,6 +28,15 @@ class PgTxUOWContext(PgUOWContext):
         super().__init__(session=session)
         self._transaction = transaction
 
+    @asynccontextmanager
+    async def savepoint(self) -> AsyncIterator[None]:
+        """
+        Nested transaction; an error inside rolls back only its own changes,
+        so the outer transaction stays usable.
+        """
+        async with self._session.begin_nested():
+            yield
+
 
 PlainContextT = TypeVar(
     "PlainContextT", bound=PgUOWContext, covariant=True
@@ -4,6 +4,7 @@ from app.infra.database.repositories.outbox import (
     PgOutboxRepository,
     PgOutboxTxRepository,
 )
+from app.infra.database.repositories.partitions import PgPartitionTxRepository
 from app.infra.database.repositories.tasks import (
     PgBotDeliveryTaskRepository,
     PgBotDeliveryTaskTxRepository,
@@ -49,6 +50,7 @@ class PgFullOutboxTxUOWContext(PgTaskTxUOWContext, PgOutboxTxUOWContext):
         self, *, session: AsyncSession, transaction: AsyncSessionTransaction
     ) -> None:
         super().__init__(session=session, transaction=transaction)
+        self.partitions = PgPartitionTxRepository(session)
 
 
 class PgOutboxUnitOfWork(
@@ -1,6 +1,7 @@
 from logging import Logger
 
 from faststream.redis import RedisBroker
+from redis.asyncio import Redis
 
 
 async def get_redis_broker(dsn: str, *, db: int = 0, logger: Logger | None = None):
@@ -23,3 +24,11 @@ async def get_redis_broker(dsn: str, *, db: int = 0, logger: Logger | None = Non
 
 async def get_redis(broker: RedisBroker):
     return await broker.connect()
+
+
+async def create_redis(dsn: str, *, db: int = 0):
+    redis = Redis.from_url(dsn, db=db)
+    try:
+        yield redis
+    finally:
+        await redis.aclose()
@@ -0,0 +1,102 @@
+from dataclasses import dataclass, field
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+# KEYS: stream
+# ARGV: group, consumer, target, idle_ms, count
+#
+# Moves up to `count` pending entries of `consumer` to `target` and deletes
+# `consumer` once its pending entries list is empty. Entries keep their
+# delivery counter (JUSTID) and get `idle_ms` of idle time, so the reclaimer
+# of `target` picks them up on its next pass. The consumer is deleted in the
+# same atomic call that saw its list empty, so no pending entry is dropped.
+HANDOFF_LUA = """
+redis.replicate_commands()
+
+local stream = KEYS[1]
+local group, consumer, target = ARGV[1], ARGV[2], ARGV[3]
+local count = tonumber(ARGV[5])
+
+local pending = redis.call('XPENDING', stream, group, '-', '+', count, consumer)
+
+local args = {stream, group, target, 0}
+for _, entry in ipairs(pending) do
+    table.insert(args, entry[1])
+end
+local moved = #args - 4
+
+if moved > 0 then
+    table.insert(args, 'IDLE')
+    table.insert(args, ARGV[4])
+    table.insert(args, 'JUSTID')
+    redis.call('XCLAIM', unpack(args))
+end
+
+if moved < count then
+    redis.call('XGROUP', 'DELCONSUMER', stream, group, consumer)
+    return {moved, 1}
+end
+
+return {moved, 0}
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class ConsumerInfo:
+    name: str
+    pending: int
+    idle_ms: int
+
+
+async def get_consumers(redis: Redis, *, stream: str, group: str) -> list[ConsumerInfo]:
+    consumers = await redis.xinfo_consumers(stream, group)
+    return [
+        ConsumerInfo(
+            name=c["name"].decode() if isinstance(c["name"], bytes) else c["name"],
+            pending=int(c["pending"]),
+            idle_ms=int(c["idle"]),
+        )
+        for c in consumers
+    ]
+
+
+async def handoff_consumer(
+    script: AsyncScript,
+    *,
+    stream: str,
+    group: str,
+    consumer: str,
+    target: str,
+    idle_ms: int,
+    count: int,
+) -> tuple[int, bool]:
+    """
+    Move a chunk of pending entries of `consumer` to `target`.
+
+    Returns:
+        tuple[int, bool]: Number of moved entries and whether `consumer`
+        was deleted from the group.
+    """
+    moved, deleted = await script(
+        keys=[stream], args=[group, consumer, target, idle_ms, count]
+    )
+    return int(moved), bool(deleted)
+
+
+@dataclass
+class JanitorProgress:
+    """Consumer group hygiene counters of the janitor."""
+
+    passes: int = 0
+    handed_off: int = 0
+    retired: int = 0
+    pel: dict[str, int] = field(default_factory=dict)  # Pending entries per consumer
+
+    def as_dict(self) -> dict:
+        return dict(
+            passes=self.passes,
+            handed_off=self.handed_off,
+            retired=self.retired,
+            pel=dict(self.pel),
+        )
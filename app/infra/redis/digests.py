@@ -0,0 +1,172 @@
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from app.infra.utils.digest import Digest, digest_key
+
+DIGESTS_KEY = "proxy:keyspace_digests"
+MEMBERS_KEY_PREFIX = "proxy:keyspace_bucket:"
+
+REPLACE_CHUNK = 10_000  # Members per replace script call
+
+# KEYS: digests hash, then the members set of every engine in ARGV
+# ARGV: buckets, then id, bucket, weight, live repeated per engine
+#
+# Counts an engine into its bucket when it goes live and out of it when it
+# goes dead; the members make repeated events no-ops. Nothing is tracked
+# until the digests over `buckets` buckets are built.
+TRACK_LUA = """
+if redis.call('HGET', KEYS[1], 'buckets') ~= ARGV[1] then
+    return -1
+end
+
+local changed = 0
+for i = 2, #ARGV, 4 do
+    local id, bucket, weight = ARGV[i], ARGV[i + 1], ARGV[i + 2]
+    local members = KEYS[(i - 2) / 4 + 2]
+
+    if ARGV[i + 3] == '1' then
+        if redis.call('SADD', members, id) == 1 then
+            redis.call('HINCRBY', KEYS[1], bucket .. ':count', 1)
+            redis.call('HINCRBY', KEYS[1], bucket .. ':total', weight)
+            changed = changed + 1
+        end
+    elseif redis.call('SREM', members, id) == 1 then
+        redis.call('HINCRBY', KEYS[1], bucket .. ':count', -1)
+        redis.call('HINCRBY', KEYS[1], bucket .. ':total', '-' .. weight)
+        changed = changed + 1
+    end
+end
+
+return changed
+"""
+
+# KEYS: digests hash, then the members set of every bucket in ARGV
+# ARGV: buckets, init, then bucket, count, total, n, n member ids repeated
+#
+# Replaces the members and the digest of every given bucket. `init` starts a
+# build over `buckets` buckets, dropping digests over another bucket count.
+REPLACE_LUA = """
+if ARGV[2] == '1' and redis.call('HGET', KEYS[1], 'buckets') ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('HSET', KEYS[1], 'buckets', ARGV[1])
+end
+
+local i, k = 3, 2
+while i <= #ARGV do
+    local bucket, count, total = ARGV[i], ARGV[i + 1], ARGV[i + 2]
+    local last = i + 3 + tonumber(ARGV[i + 3])
+
+    redis.call('DEL', KEYS[k])
+    for j = i + 4, last, 1000 do
+        redis.call('SADD', KEYS[k], unpack(ARGV, j, math.min(j + 999, last)))
+    end
+    redis.call('HSET', KEYS[1], bucket .. ':count', count, bucket .. ':total', total)
+
+    i, k = last + 1, k + 1
+end
+
+return k - 2
+"""
+
+
+def _members_key(bucket: int) -> str:
+    return f"{MEMBERS_KEY_PREFIX}{bucket}"
+
+
+class KeyspaceDigests:
+    """
+    Digests of the live `xrayEngines:*` keys per bucket, kept in Redis
+    together with the ids of the engines of every bucket.
+
+    They are updated with `track` as keyevents are processed, so reading
+    them costs one hash of `buckets` digests instead of a keyspace `SCAN`.
+    A keyevent which is never processed leaves them behind the keyspace;
+    `replace` resets buckets from the keyspace itself.
+    """
+
+    def __init__(self, redis: Redis, *, buckets: int):
+        self._redis = redis
+        self._buckets = buckets
+        self._track = redis.register_script(TRACK_LUA)
+        self._replace = redis.register_script(REPLACE_LUA)
+
+    @property
+    def buckets(self) -> int:
+        return self._buckets
+
+    async def track(self, changes: dict[UUID, bool]) -> bool:
+        """
+        Count engines which went live (`True`) or dead (`False`).
+
+        Returns:
+            bool: False if the digests are not built yet.
+        """
+        if not changes:
+            return True
+
+        keys = [DIGESTS_KEY]
+        args: list = [self._buckets]
+        for id, live in changes.items():
+            bucket, weight = digest_key(id, self._buckets)
+            keys.append(_members_key(bucket))
+            args.extend((str(id), bucket, weight, int(live)))
+
+        return await self._track(keys=keys, args=args) >= 0
+
+    async def get(self) -> dict[int, Digest] | None:
+        """
+        Digests of non-empty buckets, `None` if they are not built over
+        `buckets` buckets.
+        """
+        fields: dict[bytes, bytes] = await self._redis.hgetall(DIGESTS_KEY)
+        if fields.get(b"buckets") != str(self._buckets).encode():
+            return None
+
+        counts: dict[int, int] = {}
+        totals: dict[int, int] = {}
+        for field, value in fields.items():
+            bucket, _, part = field.decode().partition(":")
+            if part == "count":
+                counts[int(bucket)] = int(value)
+            elif part == "total":
+                totals[int(bucket)] = int(value)
+
+        return {
+            bucket: (count, totals.get(bucket, 0))
+            for bucket, count in counts.items()
+            if count and bucket < self._buckets
+        }
+
+    async def get_members(self, buckets: list[int]) -> dict[int, set[UUID]]:
+        """Ids of the engines counted into `buckets`."""
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for bucket in buckets:
+                pipe.smembers(_members_key(bucket))
+            members = await pipe.execute()
+
+        return {
+            bucket: {UUID(id.decode()) for id in ids}
+            for bucket, ids in zip(buckets, members)
+        }
+
+    async def replace(self, members: dict[int, set[UUID]], *, init: bool = False):
+        """
+        Set the engines of every bucket in `members`, e.g. as read from the
+        keyspace. With `init` the digests are (re)built, so `members` must
+        cover every bucket.
+        """
+        keys: list[str] = [DIGESTS_KEY]
+        args: list = [self._buckets, int(init)]
+
+        for bucket, ids in members.items():
+            total = sum(digest_key(id, self._buckets)[1] for id in ids)
+            keys.append(_members_key(bucket))
+            args.extend((bucket, len(ids), total, len(ids), *map(str, ids)))
+
+            if len(args) >= REPLACE_CHUNK:
+                await self._replace(keys=keys, args=args)
+                keys, args = [DIGESTS_KEY], [self._buckets, 0]
+
+        if len(keys) > 1 or init:
+            await self._replace(keys=keys, args=args)
@@ -0,0 +1,103 @@
+import json
+from typing import AsyncIterator
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from app.domains.engine import Version
+from app.schemas.engine import EngineCmd, EngineStateCmd
+
+KEY_PREFIX = b"xrayEngines:"
+
+
+class UnsupportedKeyeventError(ValueError):
+    """Entry is well-formed but does not describe an engine change."""
+
+
+def decode_keyevent(
+    stream_id: bytes, fields: dict[bytes, bytes], *, stream: str
+) -> EngineStateCmd:
+    """
+    Decode a raw `xrayEngines:` keyevent stream entry into an engine command.
+
+    The stream id is parsed into a `Version` once, the payload is JSON-decoded
+    once and validated straight into `EngineCmd`; the resulting command is
+    assembled without validating the already validated parts again.
+
+    Raises:
+        UnsupportedKeyeventError
+            If the key is foreign or the event type is unknown.
+        ValueError
+            If the entry is malformed.
+    """
+    key = fields[b"key"]
+    event = fields[b"event"]
+
+    if not key.startswith(KEY_PREFIX):
+        raise UnsupportedKeyeventError(f"Invalid key: <{key.decode()}>.")
+
+    engine_key = key[len(KEY_PREFIX) :].decode()
+    sid = stream_id.decode()
+    version = Version.from_stream_id(sid)
+    caused_by = f"{stream}:{sid}"
+
+    if event == b"expired":
+        return EngineStateCmd.model_construct(
+            id=UUID(engine_key), version=version, caused_by=caused_by, engine=None
+        )
+
+    if event == b"hset":
+        payload = json.loads(fields[b"payload"])
+        payload["id"] = engine_key
+        engine = EngineCmd.model_validate_strings(payload)
+        return EngineStateCmd.model_construct(
+            id=engine.id, version=version, caused_by=caused_by, engine=engine
+        )
+
+    raise UnsupportedKeyeventError(f"Unknown event type: {event.decode()}")
+
+
+def decode_engine_hash(key: bytes, fields: dict[bytes, bytes]) -> EngineCmd:
+    """
+    Decode a raw `xrayEngines:` hash, as returned by `HGETALL`, into an engine.
+
+    Raises:
+        UnsupportedKeyeventError
+            If the key is foreign.
+        ValueError
+            If the hash is malformed.
+    """
+    if not key.startswith(KEY_PREFIX):
+        raise UnsupportedKeyeventError(f"Invalid key: <{key.decode()}>.")
+
+    payload = {k.decode(): v.decode() for k, v in fields.items()}
+    payload["id"] = key[len(KEY_PREFIX) :].decode()
+    return EngineCmd.model_validate_strings(payload)
+
+
+# Stream ids never get anywhere near this sequence number
+SYNTHETIC_SEQ = 2**30
+
+
+async def get_synthetic_ts(redis: Redis) -> int:
+    """
+    Timestamp for synthetic versions of a keyspace snapshot taken from now on.
+
+    It is one millisecond behind the Redis clock, so a synthetic version
+    beats every keyevent written before the snapshot, while every keyevent
+    written after it still supersedes the snapshot. Sequence numbers of
+    synthetic versions start at `SYNTHETIC_SEQ`.
+    """
+    seconds, micros = await redis.time()
+    return seconds * 1000 + micros // 1000 - 1
+
+
+async def scan_engine_keys(redis: Redis, *, count: int) -> AsyncIterator[list[bytes]]:
+    """Yield `xrayEngines:*` keys page by page."""
+    cursor = 0
+    while True:
+        cursor, keys = await redis.scan(cursor, match=KEY_PREFIX + b"*", count=count)
+        if keys:
+            yield keys
+        if cursor == 0:
+            return
@@ -0,0 +1,153 @@
+from dataclasses import dataclass
+
+from redis.commands.core import AsyncScript
+
+# KEYS: stream, dlq
+# ARGV: group, consumer, min_idle_ms, start_id, count, max_retry
+#
+# Claims idle entries, moves the ones delivered more than `max_retry` times to
+# the DLQ and acks them. Everything runs inside one atomic script call, so an
+# entry is never copied to the DLQ without being acked.
+RECLAIM_LUA = """
+redis.replicate_commands()
+
+local stream, dlq = KEYS[1], KEYS[2]
+local group, consumer = ARGV[1], ARGV[2]
+local max_retry = tonumber(ARGV[6])
+
+local claimed = redis.call(
+    'XAUTOCLAIM', stream, group, consumer, ARGV[3], ARGV[4], 'COUNT', ARGV[5]
+)
+
+local survivors = {}
+local dead = 0
+
+for _, entry in ipairs(claimed[2]) do
+    local id, fields = entry[1], entry[2]
+
+    if not fields then
+        -- Entry was deleted from the stream (Redis < 7 keeps it pending)
+        redis.call('XACK', stream, group, id)
+    else
+        local pending = redis.call('XPENDING', stream, group, id, id, 1)
+        local deliveries = 1
+        if pending[1] then
+            deliveries = pending[1][4]
+        end
+
+        if deliveries > max_retry then
+            table.insert(fields, 'original_id')
+            table.insert(fields, id)
+            redis.call('XADD', dlq, '*', unpack(fields))
+            redis.call('XACK', stream, group, id)
+            dead = dead + 1
+        else
+            table.insert(survivors, {id, fields, deliveries})
+        end
+    end
+end
+
+return {claimed[1], survivors, dead}
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class ReclaimedEntry:
+    id: bytes
+    fields: dict[bytes, bytes]
+    deliveries: int
+
+
+@dataclass(frozen=True, slots=True)
+class ReclaimResult:
+    cursor: str
+    entries: list[ReclaimedEntry]
+    dead_lettered: int
+
+
+async def reclaim_entries(
+    script: AsyncScript,
+    *,
+    stream: str,
+    dlq: str,
+    group: str,
+    consumer: str,
+    min_idle_ms: int,
+    start_id: str,
+    count: int,
+    max_retry: int,
+) -> ReclaimResult:
+    """
+    Claim idle pending entries of `stream` in a single round trip.
+
+    Entries delivered more than `max_retry` times are moved to `dlq` and acked
+    server-side; only the remaining entries are returned to the caller.
+    """
+    cursor, raw_entries, dead = await script(
+        keys=[stream, dlq],
+        args=[group, consumer, min_idle_ms, start_id, count, max_retry],
+    )
+
+    entries = [
+        ReclaimedEntry(
+            id=id,
+            fields=dict(zip(fields[::2], fields[1::2])),
+            deliveries=int(deliveries),
+        )
+        for id, fields, deliveries in raw_entries
+    ]
+    return ReclaimResult(
+        cursor=cursor.decode() if isinstance(cursor, bytes) else cursor,
+        entries=entries,
+        dead_lettered=int(dead),
+    )
+
+
+def _stream_ts(stream_id: str) -> int:
+    return int(stream_id.split("-", 1)[0])
+
+
+@dataclass
+class ReclaimProgress:
+    """
+    Catch-up progress of a reclaimer through the pending entries list.
+
+    A *pass* is one sweep of the cursor from `0-0` until it wraps around.
+    `first_id`/`last_id` bound the pending entries seen at the start of the
+    current pass, so the cursor position between them tells how far
+    catch-up has got.
+    """
+
+    claim_size: int
+    pause: float
+    cursor: str = "0-0"
+    passes: int = 0
+    pending: int = 0
+    first_id: str | None = None
+    last_id: str | None = None
+    claimed: int = 0
+    dead_lettered: int = 0
+
+    @property
+    def ratio(self) -> float:
+        if self.first_id is None or self.last_id is None or self.cursor == "0-0":
+            return 0.0
+
+        first, last = _stream_ts(self.first_id), _stream_ts(self.last_id)
+        if last <= first:
+            return 1.0
+        return min(1.0, max(0.0, (_stream_ts(self.cursor) - first) / (last - first)))
+
+    def as_dict(self) -> dict:
+        return dict(
+            cursor=self.cursor,
+            progress=round(self.ratio, 4),
+            passes=self.passes,
+            pending=self.pending,
+            first_id=self.first_id,
+            last_id=self.last_id,
+            claim_size=self.claim_size,
+            pause=self.pause,
+            claimed=self.claimed,
+            dead_lettered=self.dead_lettered,
+        )
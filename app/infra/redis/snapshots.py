@@ -0,0 +1,172 @@
+import json
+import time
+from dataclasses import dataclass
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from app.domains.engine import Engine, EngineStatus, Version
+from app.infra.utils.lru import LRUCache
+
+SNAPSHOT_KEY_PREFIX = "proxy:engine_snapshot:"
+
+# KEYS: the snapshot key of every snapshot in ARGV
+# ARGV: ttl, then ts, seq, value repeated per snapshot
+#
+# Stores every snapshot whose version is newer than the stored one, so a
+# delayed or read-through write can never replace a newer snapshot. Every
+# stored snapshot expires after `ttl` seconds.
+PUT_LUA = """
+local ttl = tonumber(ARGV[1])
+local stored = 0
+
+for k = 1, #KEYS do
+    local i = (k - 1) * 3 + 2
+    local ts, seq = tonumber(ARGV[i]), tonumber(ARGV[i + 1])
+    local current = redis.call('GET', KEYS[k])
+    local newer = true
+
+    if current then
+        local c = cjson.decode(current)
+        newer = c.ts < ts or (c.ts == ts and c.seq < seq)
+    end
+
+    if newer then
+        redis.call('SET', KEYS[k], ARGV[i + 2], 'EX', ttl)
+        stored = stored + 1
+    end
+end
+
+return stored
+"""
+
+
+def _snapshot_key(id: UUID) -> str:
+    return f"{SNAPSHOT_KEY_PREFIX}{id}"
+
+
+@dataclass(frozen=True, slots=True)
+class EngineSnapshot:
+    """Read model of an engine with the version it was observed at."""
+
+    id: UUID
+    uuid: UUID | None
+    status: EngineStatus
+    addr: str
+    version: Version
+
+    @classmethod
+    def from_engine(cls, engine: Engine) -> "EngineSnapshot":
+        return cls(
+            id=engine.id,
+            uuid=engine.uuid,
+            status=engine.status,
+            addr=engine.addr,
+            version=engine.version,
+        )
+
+    def dumps(self) -> str:
+        return json.dumps(
+            dict(
+                uuid=str(self.uuid) if self.uuid is not None else None,
+                status=self.status.value,
+                addr=self.addr,
+                ts=self.version.ts,
+                seq=self.version.seq,
+            )
+        )
+
+    @classmethod
+    def loads(cls, id: UUID, raw: bytes | str) -> "EngineSnapshot":
+        data = json.loads(raw)
+        return cls(
+            id=id,
+            uuid=UUID(data["uuid"]) if data["uuid"] is not None else None,
+            status=EngineStatus(data["status"]),
+            addr=data["addr"],
+            version=Version(data["ts"], data["seq"]),
+        )
+
+
+class EngineSnapshotCache:
+    """
+    Versioned engine snapshots, in process and optionally in Redis, one key
+    per engine.
+
+    A snapshot only ever replaces an older version of itself, both in process
+    and in Redis, so once a DEAD snapshot is stored no stale read can bring
+    the engine back. A snapshot which could not be refreshed after a commit
+    must be `discard`ed. In-process entries expire after `ttl` seconds, which
+    bounds how long a process may miss writes made by other processes; Redis
+    entries expire after `redis_ttl` seconds, which bounds how long a missed
+    refresh may be served.
+    """
+
+    def __init__(
+        self,
+        *,
+        maxsize: int,
+        ttl: float,
+        redis: Redis | None = None,
+        redis_ttl: int = 600,
+    ):
+        self._local: LRUCache[UUID, tuple[float, EngineSnapshot]] = LRUCache(maxsize)
+        self._ttl = ttl
+        self._redis = redis
+        self._redis_ttl = redis_ttl
+        self._put_script = redis.register_script(PUT_LUA) if redis else None
+
+    def _get_local(self, id: UUID) -> EngineSnapshot | None:
+        entry = self._local.get(id)
+        if entry is None:
+            return None
+
+        stored_at, snapshot = entry
+        if time.monotonic() - stored_at > self._ttl:
+            self._local.pop(id)
+            return None
+        return snapshot
+
+    def _put_local(self, snapshot: EngineSnapshot):
+        entry = self._local.peek(snapshot.id)
+        if entry is not None and snapshot.version.is_newer(entry[1].version):
+            return  # Older than the stored snapshot
+        self._local.put(snapshot.id, (time.monotonic(), snapshot))
+
+    async def get(self, id: UUID) -> EngineSnapshot | None:
+        snapshot = self._get_local(id)
+        if snapshot is not None or self._redis is None:
+            return snapshot
+
+        raw = await self._redis.get(_snapshot_key(id))
+        if raw is None:
+            return None
+
+        snapshot = EngineSnapshot.loads(id, raw)
+        self._put_local(snapshot)
+        return snapshot
+
+    async def put(self, snapshots: list[EngineSnapshot]):
+        for snapshot in snapshots:
+            self._put_local(snapshot)
+
+        if self._put_script is None or not snapshots:
+            return
+
+        keys: list[str] = []
+        args: list = [self._redis_ttl]
+        for snapshot in snapshots:
+            keys.append(_snapshot_key(snapshot.id))
+            args.extend((snapshot.version.ts, snapshot.version.seq, snapshot.dumps()))
+        await self._put_script(keys=keys, args=args)
+
+    async def discard(self, ids: list[UUID]):
+        """Drop the snapshots of `ids`, e.g. of engines which could not be refreshed."""
+        for id in ids:
+            self._local.pop(id)
+
+        if self._redis is not None and ids:
+            await self._redis.delete(*map(_snapshot_key, ids))
+
+    def stats(self) -> dict[str, int]:
+        return self._local.stats()
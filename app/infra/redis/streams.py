@@ -1,10 +1,11 @@
-from uuid import uuid4
+import os
 import socket
 
 from faststream.redis import StreamSub
 
 GROUP = "xray_engines"
-CONSUMER = f"{socket.gethostname()}-{uuid4()}"
+# Stable per pod, so a restarted worker picks up its own pending entries
+CONSUMER = os.environ.get("POD_NAME") or socket.gethostname()
 
 engine_stream = StreamSub(
     "xray_engines_keyevent_stream", group=GROUP, consumer=CONSUMER
@@ -12,6 +13,22 @@ engine_stream = StreamSub(
 dlq_stream = StreamSub("dlq_stream", group=GROUP, consumer=CONSUMER)
 
 IDLE_MS = 60_000
-BATCH = 100
-PAUSE = 5
+MIN_BATCH = 100
+MAX_BATCH = 1000
+MIN_PAUSE = 1
+MAX_PAUSE = 30
 MAX_RETRY = 2
+
+DEAD_CONSUMER_MS = 10 * 60_000
+JANITOR_PAUSE = 60
+
+
+def make_engine_batch_stream(max_records: int) -> StreamSub:
+    """Same stream and group as `engine_stream`, read `max_records` at a time."""
+    return StreamSub(
+        engine_stream.name,
+        group=GROUP,
+        consumer=CONSUMER,
+        batch=True,
+        max_records=max_records,
+    )
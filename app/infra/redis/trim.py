@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _parse_id(stream_id: str) -> tuple[int, int]:
+    ts, seq = stream_id.split("-", 1)
+    return int(ts), int(seq)
+
+
+async def get_watermark(redis: Redis, stream: str) -> str | None:
+    """
+    Lowest stream id that some consumer group of `stream` may still need.
+
+    Per group it is the oldest pending entry, or the last delivered id when
+    nothing is pending; the watermark is the minimum across all groups.
+    Every entry below it has been delivered to and acked by every group.
+
+    Returns:
+        str | None: Stream id, or `None` if the stream has no groups or a
+        group has not read anything yet.
+    """
+    groups = await redis.xinfo_groups(stream)
+    if not groups:
+        return None
+
+    watermark: tuple[int, int] | None = None
+    for group in groups:
+        candidate = _parse_id(_decode(group["last-delivered-id"]))
+
+        if group["pending"]:
+            summary = await redis.xpending(stream, group["name"])
+            if summary["min"] is not None:
+                candidate = min(candidate, _parse_id(_decode(summary["min"])))
+
+        if watermark is None or candidate < watermark:
+            watermark = candidate
+
+    if watermark is None or watermark == (0, 0):
+        return None
+    return "{0}-{1}".format(*watermark)
+
+
+@dataclass
+class TrimProgress:
+    """Trimming counters of the engine and DLQ streams."""
+
+    passes: int = 0
+    watermark: str | None = None
+    min_id: str | None = None
+    trimmed: int = 0
+    length: int = 0
+    memory: int | None = None
+    dlq_trimmed: int = 0
+    dlq_length: int = 0
+    dlq_memory: int | None = None
+
+    def as_dict(self) -> dict:
+        return dict(
+            passes=self.passes,
+            watermark=self.watermark,
+            min_id=self.min_id,
+            trimmed=self.trimmed,
+            length=self.length,
+            memory=self.memory,
+            dlq_trimmed=self.dlq_trimmed,
+            dlq_length=self.dlq_length,
+            dlq_memory=self.dlq_memory,
+        )
@@ -0,0 +1,20 @@
+from hashlib import md5
+from uuid import UUID
+
+# Hex digits of md5(str(id)) used for the bucket and the weight of an id.
+# `PgEngineRepository` computes the same values in SQL, keep them in sync.
+BUCKET_HEX = slice(0, 8)
+WEIGHT_HEX = slice(8, 20)
+
+Digest = tuple[int, int]  # (count, sum of weights)
+
+
+def digest_key(id: UUID, buckets: int) -> tuple[int, int]:
+    """Bucket and weight of `id` in a digest over `buckets` buckets."""
+    h = md5(str(id).encode()).hexdigest()
+    return int(h[BUCKET_HEX], 16) % buckets, int(h[WEIGHT_HEX], 16)
+
+
+def add_to_digest(digests: dict[int, Digest], bucket: int, weight: int) -> None:
+    count, total = digests.get(bucket, (0, 0))
+    digests[bucket] = (count + 1, total + weight)
@@ -0,0 +1,90 @@
+import asyncio
+import zlib
+from logging import Logger
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+Job = Callable[[], Awaitable[T]]
+
+
+class KeyedExecutor:
+    """
+    In-process worker pool that routes jobs to asyncio lanes by key.
+
+    Jobs with the same key always land on the same lane and run in FIFO order,
+    while different lanes run concurrently. Each lane queue is bounded by
+    `queue_size`, so `submit` blocks once a lane is full and the producer
+    gets backpressure instead of buffering unbounded work in memory.
+    """
+
+    def __init__(self, *, lanes: int, queue_size: int, logger: Logger) -> None:
+        self._queues: list[asyncio.Queue[tuple[Job, asyncio.Future]]] = [
+            asyncio.Queue(maxsize=queue_size) for _ in range(lanes)
+        ]
+        self._workers: list[asyncio.Task] = []
+        self._logger = logger
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of submitted jobs that are not finished yet."""
+        return self._in_flight
+
+    def _lane(self, key: str) -> asyncio.Queue[tuple[Job, asyncio.Future]]:
+        return self._queues[zlib.crc32(key.encode()) % len(self._queues)]
+
+    async def submit(self, key: str, job: Job[T]) -> asyncio.Future[T]:
+        """
+        Enqueue `job` on the lane owning `key`.
+
+        Returns a future resolved with the job result once the job has run;
+        callers that only need ordering may ignore it.
+        """
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        await self._lane(key).put((job, future))
+        self._in_flight += 1
+        return future
+
+    async def _work(self, queue: asyncio.Queue[tuple[Job, asyncio.Future]]):
+        while True:
+            job, future = await queue.get()
+            try:
+                result = await job()
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+                else:
+                    self._logger.error("Unhandled error in keyed job:", exc_info=True)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self._in_flight -= 1
+                queue.task_done()
+
+    def start(self):
+        self._workers = [
+            asyncio.create_task(self._work(queue)) for queue in self._queues
+        ]
+
+    async def close(self):
+        """Wait for already submitted jobs, then stop the lanes."""
+        await asyncio.gather(*(queue.join() for queue in self._queues))
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+
+async def create_keyed_executor(
+    *, lanes: int, queue_size: int, logger: Logger
+) -> AsyncIterator[KeyedExecutor]:
+    executor = KeyedExecutor(lanes=lanes, queue_size=queue_size, logger=logger)
+    executor.start()
+
+    try:
+        yield executor
+    finally:
+        await executor.close()
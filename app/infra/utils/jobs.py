@@ -0,0 +1,26 @@
+import asyncio
+
+
+class PeriodicJob:
+    """
+    Schedule of a background job that runs every `interval` seconds or as
+    soon as it is triggered.
+
+    Triggers received while the job is running coalesce into a single
+    follow-up run.
+    """
+
+    def __init__(self, *, interval: float):
+        self._interval = interval
+        self._requested = asyncio.Event()
+
+    def trigger(self):
+        self._requested.set()
+
+    async def wait(self):
+        """Wait for a trigger or for the next scheduled run."""
+        try:
+            await asyncio.wait_for(self._requested.wait(), self._interval)
+        except TimeoutError:
+            pass
+        self._requested.clear()
@@ -0,0 +1,21 @@
+from typing import Any, Callable
+
+StatsSource = Callable[[], dict[str, Any]]
+
+
+class StatsRegistry:
+    """
+    Named in-process counters of a worker.
+
+    Components register a callable returning a snapshot of their counters;
+    the entrypoint exposes all snapshots together.
+    """
+
+    def __init__(self) -> None:
+        self._sources: dict[str, StatsSource] = {}
+
+    def register(self, name: str, source: StatsSource) -> None:
+        self._sources[name] = source
+
+    def collect(self) -> dict[str, dict[str, Any]]:
+        return {name: source() for name, source in self._sources.items()}
@@ -16,3 +16,11 @@ class CreateEngineSubscription(BaseModel):
     user_id: UUID
 
     event: str
+
+
+class SubscriptionRouteDTO(BaseModel):
+    id: UUID
+    engine_id: UUID
+    event: str
+
+    telegram_id: str
@@ -1,6 +1,7 @@
 from datetime import datetime
 from uuid import UUID
 
+from app.domains.engine import Engine, EngineStatus, Version
 from app.schemas import BaseSchema
 
 
@@ -14,3 +15,45 @@ class EngineInfoDTO(BaseSchema):
 
 class EngineCmd(EngineInfoDTO):
     pass
+
+
+class EngineStateCmd(BaseSchema):
+    """
+    Engine state observed at `version`.
+
+    `engine` carries the reported engine info; `None` means the engine is dead.
+    """
+
+    id: UUID
+    version: Version
+    caused_by: str
+    engine: EngineCmd | None = None
+
+
+class EngineChangeDTO(BaseSchema):
+    """Engine state of the change feed; `version` is a cursor for `since`."""
+
+    id: UUID
+    uuid: UUID | None
+    status: EngineStatus
+    created: datetime
+    addr: str
+    version: str
+
+    @classmethod
+    def from_engine(cls, engine: Engine) -> "EngineChangeDTO":
+        return cls(
+            id=engine.id,
+            uuid=engine.uuid,
+            status=engine.status,
+            created=engine.created,
+            addr=engine.addr,
+            version=engine.version.to_stream_id(),
+        )
+
+
+class EngineChangesDTO(BaseSchema):
+    """Page of the change feed; pass `next` as `since` to get the next page."""
+
+    changes: list[EngineChangeDTO]
+    next: str
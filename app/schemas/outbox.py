@@ -1,3 +1,4 @@
+from datetime import datetime
 from uuid import UUID
 
 from app.domains.event import DomainEvent
@@ -9,6 +10,7 @@ class OutboxDTO(BaseSchema):
     caused_by: str
     event: DomainEvent
     attempts: int
+    created_at: datetime
 
 
 class OutboxPublishResult(BaseSchema):
@@ -24,16 +26,23 @@ class OutboxProcessingResult(OutboxPublishResult):
 class CreateBotDeliveryTask(BaseSchema):
     outbox_id: UUID
     subscription_id: UUID
+    created_at: datetime  # Of the outbox record, selects the partition
 
 
 class BotDeliveryTaskDTO(BaseSchema):
     id: UUID
     outbox_id: UUID
     subscription_id: UUID
-    attempts: int
+    attempts: int  # Including the claimed attempt
+    created_at: datetime  # Of the outbox record, selects the partition
 
 
 class PublishBotDeliveryTask(BaseSchema):
     event: DomainEvent
 
     telegram_id: str
+
+
+class PublishBotDeliveryResult(BaseSchema):
+    success: bool
+    postponed_for: float | None = None  # Seconds until the send limits allow it
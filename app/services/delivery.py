@@ -1,83 +1,162 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 from logging import Logger
 from uuid import UUID
 
+from app.domains.event import DomainEvent
 from app.infra.aiogram.event import AiogramEventPublisher
 from app.infra.database.uows import (
     PgFullOutboxTxUOWContext,
     PgFullOutboxUOWContext,
     PgUnitOfWork,
 )
+from app.infra.utils.lru import LRUCache
 from app.infra.utils.time import now_utc
 from app.schemas.outbox import (
     PublishBotDeliveryTask,
 )
-from app.services.billing import BillingService
+from app.services.routing import SubscriptionRoutingIndex
 
 
 class BotDeliveryTaskService:
     def __init__(
         self,
         uow: PgUnitOfWork[PgFullOutboxUOWContext, PgFullOutboxTxUOWContext],
-        billing_service: BillingService,
+        routes: SubscriptionRoutingIndex,
         event_publisher: AiogramEventPublisher,
         *,
         logger: Logger,
         batch=200,
         max_publish_attempts=5,
+        lease=60.0,
+        max_postpone=3600.0,
+        events: LRUCache[UUID, DomainEvent] | None = None,
     ) -> None:
         self._uow = uow
         self._publisher = event_publisher
-        self._billing = billing_service
+        self._routes = routes
         self._batch = batch
         self._max_attempts = max_publish_attempts
+        self._lease = timedelta(seconds=lease)
+        self._max_postpone = timedelta(seconds=max_postpone)
+        self._events = events
         self._logger = logger
 
+    @property
+    def batch_size(self) -> int:
+        return self._batch
+
+    async def _get_events(
+        self, outbox_ids: dict[UUID, datetime]
+    ) -> dict[UUID, DomainEvent]:
+        """
+        Events of the outbox records, given with their `created_at`; each body
+        is decoded once while its event stays in the `events` cache, since
+        outbox records never change.
+        """
+        events: dict[UUID, DomainEvent] = {}
+        if self._events is not None:
+            for id in outbox_ids:
+                event = self._events.get(id)
+                if event is not None:
+                    events[id] = event
+
+        missing = {
+            id: created_at for id, created_at in outbox_ids.items() if id not in events
+        }
+        if not missing:
+            return events
+
+        async with self._uow.begin(with_tx=False) as uow:
+            extracted = await uow.outbox.extract_events(missing)
+        if self._events is not None:
+            for id, event in extracted.items():
+                self._events.put(id, event)
+
+        return events | extracted
+
     async def process_engine_delivery_tasks(self) -> int:
+        """
+        Lease a batch of delivery tasks, send them, then acknowledge the
+        results.
+
+        Claiming and acknowledging are two short transactions; no connection
+        is held while messages are sent. The lease must outlast sending a
+        batch, or tasks are reclaimed and sent twice.
+        """
+        leased_until = now_utc() + self._lease
         async with self._uow.begin(with_tx=True) as uow:
             tasks = await uow.tasks.claim_batch(
-                self._batch, max_attempts=self._max_attempts
+                self._batch, max_attempts=self._max_attempts, leased_until=leased_until
             )
-            if not tasks:
-                return 0
+        if not tasks:
+            return 0
 
-            self._logger.info(f"Processing {len(tasks)} delivery tasks")
+        self._logger.info(f"Processing {len(tasks)} delivery tasks")
 
-            events = await uow.outbox.extract_events([task.outbox_id for task in tasks])
-            telegram_ids = await self._billing.get_telegram_ids_for_subscriptions(
-                [task.subscription_id for task in tasks]
-            )
+        # A task shares `created_at` with its outbox record
+        events = await self._get_events(
+            {task.outbox_id: task.created_at for task in tasks}
+        )
+        telegram_ids = await self._routes.get_telegram_ids_for_subscriptions(
+            [task.subscription_id for task in tasks]
+        )
 
-            for_sending: list[PublishBotDeliveryTask] = []
-            skipped: set[UUID] = set()
-            for task in tasks:
-                event = events.get(task.outbox_id)
-                telegram_id = telegram_ids.get(task.subscription_id)
-                if event is None or telegram_id is None:
-                    self._logger.warning(
-                        f"Missing data for delivery task {task.id}"
-                        f"(event={event is not None} telegram={telegram_id is not None})"
-                    )
-                    skipped.add(task.id)
-                    continue
-
-                for_sending.append(
-                    PublishBotDeliveryTask(event=event, telegram_id=telegram_id)
+        for_sending: list[PublishBotDeliveryTask] = []
+        skipped: set[UUID] = set()
+        for task in tasks:
+            event = events.get(task.outbox_id)
+            telegram_id = telegram_ids.get(task.subscription_id)
+            if event is None or telegram_id is None:
+                self._logger.warning(
+                    f"Missing data for delivery task {task.id}"
+                    f"(event={event is not None} telegram={telegram_id is not None})"
                 )
+                skipped.add(task.id)
+                continue
+
+            for_sending.append(
+                PublishBotDeliveryTask(event=event, telegram_id=telegram_id)
+            )
 
-            sended_tasks = [task for task in tasks if task.id not in skipped]
-            publish_results = await self._publisher.publish_batch(for_sending)
-            success_count = 0
-            for success, task in zip(publish_results, sended_tasks):
-                if success:
-                    await uow.tasks.mark_published(task.id)
-                    success_count += 1
+        sended_tasks = [task for task in tasks if task.id not in skipped]
+        publish_results = await self._publisher.publish_batch(for_sending)
+        now = now_utc()
+        published: list[UUID] = []
+        failed: dict[UUID, datetime] = {
+            task.id: now + timedelta(seconds=task.attempts**2)
+            for task in tasks
+            if task.id in skipped  # Retried until out of attempts
+        }
+        # Held back by the send limits; not an attempt, the claim is undone
+        postponed: dict[UUID, datetime] = {}
+        for result, task in zip(publish_results, sended_tasks):
+            if result.success:
+                published.append(task.id)
+            elif result.postponed_for is not None:
+                retry_at = now + timedelta(seconds=result.postponed_for)
+                if now - task.created_at < self._max_postpone:
+                    postponed[task.id] = retry_at
                 else:
-                    next_attempt_at = now_utc() + timedelta(seconds=task.attempts**2)
-                    await uow.tasks.mark_failed(next_attempt_at, task_id=task.id)
+                    failed[task.id] = retry_at  # Runs out of attempts eventually
+            else:
+                failed[task.id] = now + timedelta(seconds=task.attempts**2)
 
-            self._logger.info(
-                f"Processed {len(tasks)} delivery tasks, success: {success_count}, skipped: {len(skipped)}"
+        async with self._uow.begin(with_tx=True) as uow:
+            acknowledged = await uow.tasks.acknowledge(
+                leased_until=leased_until,
+                created_at={task.id: task.created_at for task in tasks},
+                published=published,
+                failed=failed,
+                postponed=postponed,
+            )
+        if acknowledged != len(tasks):
+            self._logger.warning(
+                f"Leases of {len(tasks) - acknowledged} delivery tasks expired before acknowledgement"
             )
 
-            return len(tasks)
+        self._logger.info(
+            f"Processed {len(tasks)} delivery tasks, success: {len(published)}, "
+            f"postponed: {len(postponed)}, skipped: {len(skipped)}"
+        )
+
+        return len(tasks)
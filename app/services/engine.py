@@ -1,14 +1,26 @@
 from logging import Logger
 from uuid import UUID
 
-from app.domains.engine import Engine, EngineStatus, Version
+from app.domains.engine import (
+    Engine,
+    EngineDead,
+    EngineRestored,
+    EngineStatus,
+    EngineUpdated,
+    Version,
+)
+from app.domains.event import DomainEvent
 from app.infra.database.uows import (
     PgEngineTxUOWContext,
     PgEngineUOWContext,
     PgUnitOfWork,
 )
 from app.infra.grpc.engine import GRPCEngineManager
-from app.schemas.engine import EngineCmd
+from app.infra.redis.snapshots import EngineSnapshot, EngineSnapshotCache
+from app.infra.utils.digest import Digest
+from app.infra.utils.lru import LRUCache
+from app.infra.utils.time import now_utc
+from app.schemas.engine import EngineCmd, EngineStateCmd
 from app.services.exceptions.engine import EngineDeadError, EngineNotExistError
 
 
@@ -23,10 +35,65 @@ class EngineService:
         manager: GRPCEngineManager,
         *,
         logger: Logger,
+        versions: LRUCache[UUID, Version] | None = None,
+        fast_transitions: bool = False,
+        snapshots: EngineSnapshotCache | None = None,
     ):
         self._uow = uow
         self._manager = manager
         self._logger = logger
+        self._versions = versions
+        self._fast_transitions = fast_transitions
+        self._snapshots = snapshots
+
+    def _is_stale(self, id: UUID, version: Version) -> bool:
+        """
+        Check `version` against the last version known to be persisted.
+
+        Stored versions only ever grow, so an event that is not newer than a
+        version committed earlier is a no-op for every replica.
+        """
+        if self._versions is None:
+            return False
+
+        applied = self._versions.get(id)
+        return applied is not None and not applied.is_newer(version)
+
+    def _remember(self, id: UUID, version: Version):
+        """Record that the stored version of engine `id` is at least `version`."""
+        if self._versions is None:
+            return
+
+        applied = self._versions.peek(id)
+        if applied is None or applied.is_newer(version):
+            self._versions.put(id, version)
+
+    async def _publish(self, engines: list[Engine]):
+        """
+        Refresh snapshots of committed engines.
+
+        Snapshots are a cache: a failure here must not fail the already
+        committed change. The snapshots which may be stale are discarded
+        instead, so readers fall back to Postgres.
+        """
+        if self._snapshots is None or not engines:
+            return
+
+        try:
+            await self._snapshots.put([EngineSnapshot.from_engine(e) for e in engines])
+        except Exception:
+            self._logger.warning("Failed to refresh engine snapshots:", exc_info=True)
+            await self._discard([e.id for e in engines])
+
+    async def _discard(self, ids: list[UUID]):
+        """Drop the snapshots of `ids`; they expire on their own if this fails."""
+        if self._snapshots is None or not ids:
+            return
+
+        try:
+            await self._snapshots.discard(ids)
+        except Exception:
+            self._logger.error("Failed to discard engine snapshots:", exc_info=True)
 
     async def mark_dead(self, id, *, caused_by: str, version: Version):
         """
@@ -45,20 +112,23 @@ class EngineService:
             EngineNotExistError
                 If the engine does not exist.
         """
+        if self._is_stale(id, version):
+            self._logger.info(_is_not_newer_msg(id))
+            return
+
         async with self._uow.begin(with_tx=True) as uow:
-            current_engine = await uow.engines.get_for_update(id)
-            self._logger.info(f"Marking engine with ID [{id}] as dead...")
-            if current_engine is None:
-                raise EngineNotExistError(id)
-            current_engine.mark_dead(version)
-
-            changed = await uow.engines.save(current_engine)
-            if changed:
-                await uow.outbox.store(
-                    current_engine.pull_events(), caused_by=caused_by
+            if self._fast_transitions:
+                changed = await self._transit_dead(
+                    uow, id, caused_by=caused_by, version=version
                 )
+            else:
+                changed = await self._mark_dead(
+                    uow, id, caused_by=caused_by, version=version
+                )
+        self._remember(id, version)
 
-        if changed:
+        if changed is not None:
+            await self._publish([changed])
             self._logger.info(f"Engine with ID [{id}] marked as dead.")
         else:
             self._logger.info(_is_not_newer_msg(id))
@@ -76,35 +146,233 @@ class EngineService:
             caused_by: Correlation identifier propagated into the outbox.
             version: Optimistic concurrency token guaranteeing proper ordering.
         """
+        if self._is_stale(engine.id, version):
+            self._logger.info(_is_not_newer_msg(engine.id))
+            return
+
         async with self._uow.begin(with_tx=True) as uow:
-            current_engine = await uow.engines.get_for_update(engine.id)
-            if current_engine is None:
-                self._logger.info(f"Creating new engine with ID [{engine.id}]...")
-                current_engine = Engine(
-                    id=engine.id,
-                    uuid=engine.uuid,
-                    status=EngineStatus.READY,
-                    created=engine.created,
-                    addr=engine.addr,
-                    version=version,
+            if self._fast_transitions:
+                changed = await self._transit_upsert(
+                    uow, engine, caused_by=caused_by, version=version
                 )
-            elif current_engine.status == EngineStatus.DEAD:
-                self._logger.info(f"Restoring dead engine with ID [{engine.id}]...")
-                current_engine.restore(engine.running, engine.uuid, version=version)
             else:
-                self._logger.info(f"Updating engine with ID [{engine.id}]...")
-                current_engine.update(engine.running, engine.uuid, version=version)
-
-            changed = await uow.engines.save(current_engine)
-            if changed:
-                await uow.outbox.store(
-                    current_engine.pull_events(), caused_by=caused_by
+                changed = await self._upsert(
+                    uow, engine, caused_by=caused_by, version=version
                 )
-        if changed:
+        self._remember(engine.id, version)
+
+        if changed is not None:
+            await self._publish([changed])
             self._logger.info(f"Engine with ID [{engine.id}] upserted.")
         else:
             self._logger.info(_is_not_newer_msg(engine.id))
 
+    async def upsert_many(self, cmds: list[EngineStateCmd]) -> int:
+        """
+        Bulk counterpart of `upsert` with the same decision matrix.
+
+        Every command **MUST** carry `engine`.
+
+        Returns:
+            Number of engines whose persistent state changed.
+        """
+        if any(cmd.engine is None for cmd in cmds):
+            raise ValueError("Every upsert command must carry an engine.")
+        return await self.apply(cmds)
+
+    async def mark_dead_many(self, cmds: list[EngineStateCmd]) -> int:
+        """
+        Bulk counterpart of `mark_dead`.
+
+        Every command **MUST NOT** carry `engine`. Engines that do not exist
+        are skipped with a warning instead of aborting the whole batch.
+
+        Returns:
+            Number of engines whose persistent state changed.
+        """
+        if any(cmd.engine is not None for cmd in cmds):
+            raise ValueError("Dead mark commands must not carry an engine.")
+        return await self.apply(cmds)
+
+    async def apply(self, cmds: list[EngineStateCmd]) -> int:
+        """
+        Apply a **batch** of engine state changes inside a single transaction.
+
+        Every command goes through the same version-guarded domain operations
+        as `upsert` and `mark_dead`, so stale duplicates stay *no-ops* and
+        retries are safe. The batch costs a handful of statements regardless
+        of its size: engines are locked with one `SELECT ... FOR UPDATE` in
+        engine ID order, saved with one multi-row version-guarded upsert, and
+        outbox events are stored only for the rows the upsert reports as
+        changed, with one multi-row insert. Several commands for one engine are
+        applied in version order.
+
+        Dead marks for engines that do not exist are skipped with a warning
+        instead of aborting the whole batch.
+
+        Returns:
+            Number of engines whose persistent state changed.
+        """
+        fresh: list[EngineStateCmd] = []
+        for cmd in cmds:
+            if self._is_stale(cmd.id, cmd.version):
+                self._logger.info(_is_not_newer_msg(cmd.id))
+            else:
+                fresh.append(cmd)
+
+        if not fresh:
+            return 0
+        fresh.sort(key=lambda c: (c.id, c.version.ts, c.version.seq))
+
+        applied: list[EngineStateCmd] = []
+        async with self._uow.begin(with_tx=True) as uow:
+            engines = await uow.engines.get_many_for_update(
+                list(dict.fromkeys(cmd.id for cmd in fresh))
+            )
+
+            events: list[tuple[UUID, str, list[DomainEvent]]] = []
+            for cmd in fresh:
+                if cmd.engine is None:
+                    current_engine = engines.get(cmd.id)
+                    if current_engine is None:
+                        self._logger.warning(str(EngineNotExistError(cmd.id)))
+                        continue
+                    current_engine.mark_dead(cmd.version)
+                else:
+                    current_engine = self._apply_engine_cmd(
+                        engines.get(cmd.id), cmd.engine, version=cmd.version
+                    )
+                    engines[cmd.id] = current_engine
+
+                applied.append(cmd)
+                events.append((cmd.id, cmd.caused_by, current_engine.pull_events()))
+
+            changed = await uow.engines.save_many(
+                [engines[id] for id in dict.fromkeys(cmd.id for cmd in applied)]
+            )
+            stored = [
+                (event, caused_by)
+                for id, caused_by, engine_events in events
+                if id in changed
+                for event in engine_events
+            ]
+            if stored:
+                await uow.outbox.store(
+                    [event for event, _ in stored],
+                    caused_by=[caused_by for _, caused_by in stored],
+                )
+
+        for cmd in applied:
+            self._remember(cmd.id, cmd.version)
+        await self._publish([engines[id] for id in changed])
+
+        self._logger.info(
+            f"Applied {len(cmds)} engine changes, changed: {len(changed)}."
+        )
+        return len(changed)
+
+    async def _mark_dead(
+        self, uow: PgEngineTxUOWContext, id, *, caused_by: str, version: Version
+    ) -> Engine | None:
+        current_engine = await uow.engines.get_for_update(id)
+        self._logger.info(f"Marking engine with ID [{id}] as dead...")
+        if current_engine is None:
+            raise EngineNotExistError(id)
+        current_engine.mark_dead(version)
+
+        if not await uow.engines.save(current_engine):
+            return None
+        await uow.outbox.store(current_engine.pull_events(), caused_by=caused_by)
+        return current_engine
+
+    async def _upsert(
+        self,
+        uow: PgEngineTxUOWContext,
+        engine: EngineCmd,
+        *,
+        caused_by: str,
+        version: Version,
+    ) -> Engine | None:
+        current_engine = await uow.engines.get_for_update(engine.id)
+        current_engine = self._apply_engine_cmd(current_engine, engine, version=version)
+
+        if not await uow.engines.save(current_engine):
+            return None
+        await uow.outbox.store(current_engine.pull_events(), caused_by=caused_by)
+        return current_engine
+
+    async def _transit_dead(
+        self, uow: PgEngineTxUOWContext, id, *, caused_by: str, version: Version
+    ) -> Engine | None:
+        """Single-statement equivalent of `_mark_dead`."""
+        self._logger.info(f"Marking engine with ID [{id}] as dead...")
+        found, changed = await uow.engines.transit_dead(
+            id,
+            version=version,
+            dead=EngineDead(id, version.to_stream_id()),
+            caused_by=caused_by,
+        )
+        if not found:
+            raise EngineNotExistError(id)
+        return changed
+
+    async def _transit_upsert(
+        self,
+        uow: PgEngineTxUOWContext,
+        engine: EngineCmd,
+        *,
+        caused_by: str,
+        version: Version,
+    ) -> Engine | None:
+        """
+        Single-statement equivalent of `_upsert`.
+
+        Candidate events are built exactly as the `Engine` aggregate builds
+        them; the database only picks the one matching the stored state.
+        """
+        self._logger.info(f"Upserting engine with ID [{engine.id}]...")
+        status = EngineStatus.ACTIVE if engine.running else EngineStatus.READY
+        v = version.to_stream_id()
+
+        return await uow.engines.transit_upsert(
+            Engine(
+                id=engine.id,
+                uuid=engine.uuid,
+                status=EngineStatus.READY,
+                created=engine.created,
+                addr=engine.addr,
+                version=version,
+            ),
+            status=status,
+            restored=EngineRestored(engine.id, v, engine.uuid, status),
+            updated=EngineUpdated(
+                engine.id, v, new_uuid=engine.uuid, new_status=status
+            ),
+            caused_by=caused_by,
+        )
+
+    def _apply_engine_cmd(
+        self, current_engine: Engine | None, engine: EngineCmd, *, version: Version
+    ) -> Engine:
+        if current_engine is None:
+            self._logger.info(f"Creating new engine with ID [{engine.id}]...")
+            return Engine(
+                id=engine.id,
+                uuid=engine.uuid,
+                status=EngineStatus.READY,
+                created=engine.created,
+                addr=engine.addr,
+                version=version,
+            )
+
+        if current_engine.status == EngineStatus.DEAD:
+            self._logger.info(f"Restoring dead engine with ID [{engine.id}]...")
+            current_engine.restore(engine.running, engine.uuid, version=version)
+        else:
+            self._logger.info(f"Updating engine with ID [{engine.id}]...")
+            current_engine.update(engine.running, engine.uuid, version=version)
+        return current_engine
+
     async def restart(self, id: UUID, *, uuid: UUID):
         """
         Restart the physics engine **instance**.
@@ -121,19 +389,119 @@ class EngineService:
             EngineDeadError
                 If the engine is marked DEAD.
         """
-        async with self._uow.begin(with_tx=False) as uow:
-            engine = await uow.engines.get(id)
-            self._logger.info(f"Restarting engine with ID [{id}]...")
-            if engine is None:
-                raise EngineNotExistError(id)
-            if engine.status == EngineStatus.DEAD:
-                raise EngineDeadError(id)
+        self._logger.info(f"Restarting engine with ID [{id}]...")
+        engine = await self._get_snapshot(id)
+        if engine is None:
+            raise EngineNotExistError(id)
+        if engine.status == EngineStatus.DEAD:
+            raise EngineDeadError(id)
 
         await self._manager.restart(uuid, addr=engine.addr)
         self._logger.info(f"Engine with ID [{id}] restarted.")
 
-    async def remove_dead_engines(self):
+    async def _get_snapshot(self, id: UUID) -> EngineSnapshot | None:
+        """
+        Read an engine snapshot through the snapshot cache.
+
+        On a miss the engine is read from Postgres and cached; the cache only
+        accepts it if nothing newer was stored meanwhile.
+        """
+        if self._snapshots is not None:
+            try:
+                snapshot = await self._snapshots.get(id)
+            except Exception:
+                self._logger.warning("Failed to read engine snapshot:", exc_info=True)
+            else:
+                if snapshot is not None:
+                    return snapshot
+
         async with self._uow.begin(with_tx=False) as uow:
-            self._logger.info("Removing dead engines...")
-            deleted = await uow.engines.remove_dead()
-            self._logger.info(f"Removed {deleted} dead engines.")
+            engine = await uow.engines.get(id)
+        if engine is None:
+            return None
+
+        await self._publish([engine])
+        return EngineSnapshot.from_engine(engine)
+
+    async def get_changes(
+        self, since: Version, *, until: Version, limit: int
+    ) -> list[Engine]:
+        """
+        Engines whose version is newer than `since` and older than `until`,
+        oldest version first.
+        """
+        async with self._uow.begin(with_tx=False) as uow:
+            return await uow.engines.get_changes(since, until=until, limit=limit)
+
+    async def get_settled_version(self, settle: float) -> Version:
+        """
+        First version not older than `settle` seconds.
+
+        Measured by the database clock, not the one of this host.
+        """
+        async with self._uow.begin(with_tx=False) as uow:
+            return await uow.engines.get_settled_version(settle)
+
+    async def get_live_digests(self, buckets: int) -> dict[int, Digest]:
+        """
+        Digest of the ids of engines that are not DEAD, per bucket.
+
+        Digests are maintained by the database from the first call on.
+        """
+        async with self._uow.begin(with_tx=False) as uow:
+            digests = await uow.engines.get_live_digests(buckets)
+        if digests is not None:
+            return digests
+
+        self._logger.info(f"Building engine digests over {buckets} buckets...")
+        async with self._uow.begin(with_tx=True) as uow:
+            return await uow.engines.track_live_digests(buckets)
+
+    async def get_live_ids(self, buckets: int, selected: list[int]) -> set[UUID]:
+        """Ids of engines that are not DEAD and fall into `selected` buckets."""
+        async with self._uow.begin(with_tx=False) as uow:
+            return await uow.engines.get_live_ids(buckets, selected)
+
+    async def purge_dead_engines(
+        self, *, min_age: int, chunk_size: int, max_cascade: int
+    ) -> int:
+        """
+        Delete engines which have been DEAD for at least `min_age` seconds.
+
+        Engines are deleted in ID order, each chunk in its own short
+        transaction. A chunk whose subscriptions and delivery tasks exceed
+        `max_cascade` rows halves the next chunk, a lighter one grows it
+        back up to `chunk_size`.
+
+        Returns:
+            int: Number of deleted engines.
+        """
+        dead_before = int((now_utc().timestamp() - min_age) * 1000)
+        after: UUID | None = None
+        limit = chunk_size
+        total = 0
+
+        self._logger.info("Removing dead engines...")
+        while True:
+            async with self._uow.begin(with_tx=True) as uow:
+                ids, cascade = await uow.engines.remove_dead_chunk(
+                    dead_before=dead_before, after=after, limit=limit
+                )
+            if not ids:
+                break
+            await self._discard(ids)
+
+            after = ids[-1]
+            total += len(ids)
+            self._logger.info(
+                f"Removed {len(ids)} dead engines with {cascade} dependent rows, "
+                f"{total} so far."
+            )
+
+            if cascade > max_cascade:
+                limit = max(1, limit // 2)
+            else:
+                limit = min(chunk_size, limit * 2)
+
+        self._logger.info(f"Removed {total} dead engines.")
+        return total
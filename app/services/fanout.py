@@ -1,15 +1,33 @@
 from logging import Logger
+from typing import Literal
 
 from app.infra.database.uows import PgFullOutboxUOWContext
 from app.infra.database.uows.outbox import PgFullOutboxTxUOWContext
 from app.schemas.outbox import CreateBotDeliveryTask, OutboxDTO
-from app.services.billing import BillingService
+from app.services.routing import SubscriptionRoutingIndex
 
 
 class BotTaskFanoutPlanner:
-    def __init__(self, billing_service: BillingService, *, logger: Logger) -> None:
-        self._billing = billing_service
+    """
+    Creates the delivery tasks of outbox records.
+
+    In `sql` mode the tasks are created by a single `INSERT ... SELECT` in the
+    transaction of `ctx`; in `python` mode the matching subscriptions are
+    looked up in the routing index and the tasks are stored from Python.
+    `auto` mode looks them up in the routing index once it is loaded, e.g.
+    by the delivery of tasks, and falls back to `sql` mode until then.
+    """
+
+    def __init__(
+        self,
+        routes: SubscriptionRoutingIndex,
+        *,
+        logger: Logger,
+        mode: Literal["auto", "sql", "python"] = "auto",
+    ) -> None:
+        self._routes = routes
         self._logger = logger
+        self._mode = mode
 
     async def spawn_engine_delivery_tasks(
         self,
@@ -17,7 +35,15 @@ class BotTaskFanoutPlanner:
         *,
         ctx: PgFullOutboxUOWContext | PgFullOutboxTxUOWContext,
     ):
-        name_ids_dict = await self._billing.get_subscriptions_for_events(
+        if self._mode == "sql" or (self._mode == "auto" and not self._routes.is_loaded):
+            self._logger.info(
+                f"Spawning engine delivery tasks for {len(records)} records..."
+            )
+            spawned = await ctx.tasks.spawn_for_outbox(records)
+            self._logger.info(f"Spawned {spawned} engine delivery tasks")
+            return
+
+        name_ids_dict = await self._routes.get_subscriptions_for_events(
             [rec.event for rec in records]
         )
 
@@ -34,7 +60,9 @@ class BotTaskFanoutPlanner:
 
             tasks.extend(
                 (
-                    CreateBotDeliveryTask(outbox_id=rec.id, subscription_id=id)
+                    CreateBotDeliveryTask(
+                        outbox_id=rec.id, subscription_id=id, created_at=rec.created_at
+                    )
                     for id in ids
                 )
             )
@@ -3,6 +3,7 @@ from datetime import timedelta
 from logging import Logger
 
 from app.domains.engine import EngineDead, EngineRestored, EngineUpdated
+from app.infra.database.ownership import OwnedPartitions
 from app.infra.database.uows import (
     PgFullOutboxTxUOWContext,
     PgFullOutboxUOWContext,
@@ -32,10 +33,15 @@ class OutboxService:
         self._batch = batch
         self._max_attempts = max_publish_attempts
 
-    async def process_outbox_batch(self) -> int:
+    @property
+    def batch_size(self) -> int:
+        return self._batch
+
+    async def process_outbox_batch(self, partitions: OwnedPartitions) -> int:
+        """Fan out a batch of the outbox records of the owned `partitions`."""
         async with self._uow.begin(with_tx=True) as uow:
             records = await uow.outbox.claim_batch(
-                self._batch, max_attempts=self._max_attempts
+                self._batch, max_attempts=self._max_attempts, partitions=partitions
             )
 
             if not records:
@@ -53,10 +59,11 @@ class OutboxService:
                         unhandled.append(rec)
 
             try:
-                await self._fanout_planner.spawn_engine_delivery_tasks(
-                    engine_delivery_tasks, ctx=uow
-                )
-                await self._mark_fanned_out(engine_delivery_tasks, uow=uow)
+                async with uow.savepoint():  # Keeps the batch usable on errors
+                    await self._fanout_planner.spawn_engine_delivery_tasks(
+                        engine_delivery_tasks, ctx=uow
+                    )
+                    await self._mark_fanned_out(engine_delivery_tasks, uow=uow)
             except Exception:
                 self._logger.error(
                     f"Error spawning engine delivery tasks: {traceback.format_exc()}"
@@ -78,9 +85,14 @@ class OutboxService:
         *,
         uow: PgFullOutboxUOWContext | PgFullOutboxTxUOWContext,
     ):
-        for rec in record:
-            next_attempt_at = now_utc() + timedelta(seconds=(rec.attempts + 1) ** 2)
-            await uow.outbox.mark_failed(next_attempt_at, outbox_id=rec.id)
+        now = now_utc()
+        await uow.outbox.mark_failed_many(
+            record,
+            next_attempts={
+                rec.id: now + timedelta(seconds=(rec.attempts + 1) ** 2)
+                for rec in record
+            },
+        )
 
     async def _mark_fanned_out(
         self,
@@ -88,5 +100,4 @@ class OutboxService:
         *,
         uow: PgFullOutboxUOWContext | PgFullOutboxTxUOWContext,
     ):
-        for rec in record:
-            await uow.outbox.mark_fanned_out(rec.id)
+        await uow.outbox.mark_fanned_out_many(record)
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from logging import Logger
+
+from app.infra.database.repositories.partitions import Partition
+from app.infra.database.uows import (
+    PgFullOutboxTxUOWContext,
+    PgFullOutboxUOWContext,
+    PgUnitOfWork,
+)
+from app.infra.utils.time import now_utc
+
+LOCK_KEY = "outbox_partitions"
+LOCK_TIMEOUT_MS = 5000
+DAY = timedelta(days=1)
+
+
+class OutboxRetentionService:
+    """
+    Maintenance of the daily `created_at` partitions of `outbox` and
+    `delivery_tasks`.
+
+    A delivery task is stored in the partition of its outbox record, so both
+    tables have the same partition bounds. Every DDL statement runs in its
+    own short transaction under an advisory lock, so replicas never race
+    and writers are blocked for at most `LOCK_TIMEOUT_MS`.
+    """
+
+    def __init__(
+        self,
+        uow: PgUnitOfWork[PgFullOutboxUOWContext, PgFullOutboxTxUOWContext],
+        *,
+        logger: Logger,
+        max_publish_attempts=5,
+    ) -> None:
+        self._uow = uow
+        self._logger = logger
+        self._max_attempts = max_publish_attempts
+
+    async def _get_partitions(self, table: str) -> list[Partition]:
+        async with self._uow.begin(with_tx=True) as uow:
+            return await uow.partitions.get_partitions(table)
+
+    async def _create(
+        self, table: str, lower: datetime, *, default: str | None
+    ) -> bool:
+        async with self._uow.begin(with_tx=True) as uow:
+            if not await uow.partitions.try_lock(
+                LOCK_KEY, lock_timeout_ms=LOCK_TIMEOUT_MS
+            ):
+                return False
+
+            name, moved = await uow.partitions.create_partition(
+                table, lower=lower, upper=lower + DAY, default=default
+            )
+            if moved:
+                self._logger.warning(
+                    f"Created partition {name} with {moved} rows of {default}."
+                )
+            else:
+                self._logger.info(f"Created partition {name}.")
+            return True
+
+    async def _remove(self, table: str, partition: str, *, drop: bool) -> bool:
+        async with self._uow.begin(with_tx=True) as uow:
+            if not await uow.partitions.try_lock(
+                LOCK_KEY, lock_timeout_ms=LOCK_TIMEOUT_MS
+            ):
+                return False
+            if await uow.partitions.has_pending(
+                table, partition, max_attempts=self._max_attempts
+            ):
+                return False
+
+            await uow.partitions.remove_partition(table, partition, drop=drop)
+            self._logger.info(
+                f"{'Dropped' if drop else 'Detached'} partition {partition}."
+            )
+            return True
+
+    async def maintain_partitions(
+        self, *, premake: int, retention_days: int, drop: bool
+    ) -> tuple[int, int]:
+        """
+        Create the daily partitions of the next `premake` days and remove the
+        partitions which ended `retention_days` ago.
+
+        Rows stored while a day had no partition, e.g. while maintenance was
+        down, are in the DEFAULT partition; they are moved into the partition
+        of their day once it is created.
+
+        A partition is only removed once all its rows are fanned out or
+        published, or ran out of attempts, and an outbox partition only after
+        the delivery task partition with the same bounds.
+
+        Returns:
+            tuple[int, int]: Number of created and removed partitions.
+        """
+        today = now_utc().replace(hour=0, minute=0, second=0, microsecond=0)
+        expired = today - timedelta(days=retention_days)
+        created = removed = 0
+
+        for table in ("delivery_tasks", "outbox"):
+            partitions = await self._get_partitions(table)
+            default = next((p.name for p in partitions if p.is_default), None)
+
+            for offset in range(premake + 1):
+                lower = today + offset * DAY
+                if any(p.covers(lower, lower + DAY) for p in partitions):
+                    continue
+                created += await self._create(table, lower, default=default)
+
+            for p in partitions:
+                if p.is_default or p.upper is None or p.upper > expired:
+                    continue
+                if table == "outbox" and any(
+                    t.upper == p.upper
+                    for t in await self._get_partitions("delivery_tasks")
+                ):
+                    continue  # Delivery tasks of the partition are still kept
+                removed += await self._remove(table, p.name, drop=drop)
+
+        return created, removed
@@ -0,0 +1,141 @@
+import asyncio
+from logging import Logger
+from uuid import UUID
+
+from app.domains.event import DomainEvent
+from app.infra.database.uows import (
+    PgBillingTxUOWContext,
+    PgBillingUOWContext,
+    PgUnitOfWork,
+)
+from app.schemas.billing import SubscriptionRouteDTO
+
+
+class SubscriptionRoutingIndex:
+    """
+    In-process routes from `(engine_id, event)` to subscriptions and from
+    subscriptions to telegram ids, answering what `BillingService` queries.
+
+    Every route is loaded on the first lookup, then kept fresh by
+    `invalidate`, which is fed with the payloads of the subscription change
+    notifications: the engines named in a payload are reloaded on the next
+    lookup, and an empty payload or `None` reloads every route. A change is
+    visible once its notification has arrived, shortly after its commit.
+    """
+
+    def __init__(
+        self,
+        uow: PgUnitOfWork[PgBillingUOWContext, PgBillingTxUOWContext],
+        *,
+        logger: Logger,
+    ) -> None:
+        self._uow = uow
+        self._logger = logger
+
+        self._by_engine: dict[UUID, list[SubscriptionRouteDTO]] = {}
+        self._subscriptions: dict[tuple[UUID, str], list[UUID]] = {}
+        self._telegram_ids: dict[UUID, str] = {}
+
+        self._stale_engines: set[UUID] = set()
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether every route is loaded; engines to reload are refreshed on lookup."""
+        return not self._stale
+
+    def invalidate(self, payload: str | None):
+        """Mark the engines of a change notification `payload` as stale."""
+        if not payload:
+            self._stale = True
+            return
+
+        try:
+            self._stale_engines.update(UUID(id) for id in payload.split(","))
+        except ValueError:
+            self._logger.warning(f"Invalid subscriptions notification: {payload}")
+            self._stale = True
+
+    def _remove(self, engine_id: UUID):
+        for route in self._by_engine.pop(engine_id, []):
+            self._subscriptions.pop((engine_id, route.event), None)
+            self._telegram_ids.pop(route.id, None)
+
+    def _add(self, route: SubscriptionRouteDTO):
+        self._by_engine.setdefault(route.engine_id, []).append(route)
+        self._subscriptions.setdefault((route.engine_id, route.event), []).append(
+            route.id
+        )
+        self._telegram_ids[route.id] = route.telegram_id
+
+    async def _load(self, engine_ids: list[UUID] | None):
+        async with self._uow.begin(with_tx=False) as ctx:
+            return await ctx.subscriptions.get_routes(engine_ids)
+
+    async def _refresh(self):
+        async with self._lock:
+            if self._stale:
+                # Taken before loading, so changes during the load are kept
+                self._stale = False
+                self._stale_engines.clear()
+                try:
+                    routes = await self._load(None)
+                except BaseException:
+                    self._stale = True
+                    raise
+
+                self._by_engine.clear()
+                self._subscriptions.clear()
+                self._telegram_ids.clear()
+                for route in routes:
+                    self._add(route)
+                self._logger.info(f"Loaded {len(routes)} subscription routes.")
+
+            elif self._stale_engines:
+                engine_ids = list(self._stale_engines)
+                self._stale_engines.clear()
+                try:
+                    routes = await self._load(engine_ids)
+                except BaseException:
+                    self._stale_engines.update(engine_ids)
+                    raise
+
+                for engine_id in engine_ids:
+                    self._remove(engine_id)
+                for route in routes:
+                    self._add(route)
+
+    async def get_subscriptions_for_events(
+        self, events: list[DomainEvent]
+    ) -> dict[DomainEvent, list[UUID]]:
+        await self._refresh()
+        return {
+            event: list(self._subscriptions.get((event.aggregate_id, event.name), []))
+            for event in events
+        }
+
+    async def get_telegram_ids_for_subscriptions(
+        self, subscription_ids: list[UUID]
+    ) -> dict[UUID, str]:
+        """
+        Telegram ids of the subscriptions; the ones not routed yet, such as
+        subscriptions whose notification is still on its way, are queried.
+        """
+        await self._refresh()
+
+        result: dict[UUID, str] = {}
+        missing: list[UUID] = []
+        for id in subscription_ids:
+            if id in self._telegram_ids:
+                result[id] = self._telegram_ids[id]
+            else:
+                missing.append(id)
+
+        if missing:
+            async with self._uow.begin(with_tx=False) as ctx:
+                result |= await ctx.subscriptions.get_telegram_ids_for_subscriptions(
+                    missing
+                )
+
+        return result
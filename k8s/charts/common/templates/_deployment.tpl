@@ -35,6 +35,12 @@ spec:
           ports:
             - containerPort: {{ .Values.container.port }}
 
+          env:
+            - name: POD_NAME
+              valueFrom:
+                fieldRef:
+                  fieldPath: metadata.name
+
           envFrom:
             - configMapRef:
                 name: {{ include "common.fullname" . }}
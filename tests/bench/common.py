@@ -0,0 +1,30 @@
+import timeit
+import tracemalloc
+from typing import Callable
+
+
+def measure(fn: Callable[[], object], *, number: int) -> tuple[float, int]:
+    """Mean seconds per call of `fn` and peak bytes allocated by one call."""
+    fn()  # Warm up caches and lazily built validators
+
+    elapsed = timeit.timeit(fn, number=number) / number
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def report(title: str, rows: list[tuple[str, float, int]]):
+    """Print `(name, seconds, bytes)` rows, each relative to the first one."""
+    print(title)
+    base_time, base_peak = rows[0][1], rows[0][2]
+    for name, elapsed, peak in rows:
+        print(
+            f"  {name:<24} {elapsed * 1e6:>10.1f} us {elapsed / base_time:>6.2f}x"
+            f" {peak / 1024:>10.1f} KiB {peak / max(base_peak, 1):>6.2f}x"
+        )
@@ -0,0 +1,86 @@
+"""
+Delivering one event to many subscribers: messages rendered per delivery,
+as before, against messages rendered once through the publisher's cache.
+
+    python -m tests.bench.fanout
+"""
+
+import asyncio
+import logging
+import time
+from uuid import uuid4
+
+from app.domains.engine import EngineStatus, EngineUpdated
+from app.domains.event import DomainEvent
+from app.infra.aiogram.event import AiogramEventPublisher
+from app.infra.aiogram.limits import TelegramRateLimiter
+from app.infra.database.repositories.outbox import outbox_row
+from app.infra.utils.lru import LRUCache
+from app.schemas.outbox import PublishBotDeliveryTask
+from tests.bench.common import measure, report
+
+SUBSCRIBERS = 1000
+BATCH = 200  # Delivery tasks per batch, as claimed by `BotDeliveryTaskService`
+NUMBER = 20  # Timed runs of every case
+
+
+class Bot:
+    """Bot which keeps the sent messages, like requests in flight."""
+
+    def __init__(self):
+        self.sent: list[str] = []
+
+    async def send_message(self, *, chat_id: str, text: str):
+        self.sent.append(text)
+
+
+def deliver(texts: LRUCache | None, tasks: list[PublishBotDeliveryTask]):
+    bot = Bot()
+    publisher = AiogramEventPublisher(
+        bot,  # type: ignore
+        logger=logging.getLogger(__name__),
+        limiter=TelegramRateLimiter(global_rate=1e9, chat_rate=1e9),
+        texts=texts,
+    )
+
+    async def main():
+        for start in range(0, len(tasks), BATCH):
+            await publisher.publish_batch(tasks[start : start + BATCH])
+
+    asyncio.run(main())
+    return bot.sent
+
+
+def main():
+    # Decoded from the outbox body, as the delivery service does
+    event = DomainEvent.from_dict(
+        outbox_row(
+            EngineUpdated(
+                uuid4(), f"{int(time.time() * 1000)}-0", uuid4(), EngineStatus.ACTIVE
+            ),
+            caused_by="bench",
+        )["body"]
+    )
+    tasks = [
+        PublishBotDeliveryTask(event=event, telegram_id=str(1_000_000 + i))
+        for i in range(SUBSCRIBERS)
+    ]
+    assert deliver(None, tasks) == deliver(LRUCache(16), tasks)
+
+    report(
+        f"Delivering one event to {SUBSCRIBERS} subscribers",
+        [
+            (
+                "rendered per delivery",
+                *measure(lambda: deliver(None, tasks), number=NUMBER),
+            ),
+            (
+                "rendered once",
+                *measure(lambda: deliver(LRUCache(16), tasks), number=NUMBER),
+            ),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Keyevent decoding: `decode_keyevent` against the previous pydantic path.
+
+    python -m tests.bench.keyevents
+"""
+
+import json
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel, computed_field
+
+from app.domains.engine import Version
+from app.infra.redis.keyevents import decode_keyevent
+from app.schemas.engine import EngineCmd, EngineInfoDTO, EngineStateCmd
+from tests.bench.common import measure, report
+
+STREAM = "engines"
+BATCH = 100  # Entries of one read, kept alive like a batch being applied
+NUMBER = 200  # Timed runs of every case
+
+
+class RedisKeyEvent(BaseModel):
+    """Message model of the previous subscriber."""
+
+    event: str
+    key: str
+    payload: str | None = None
+
+    @computed_field
+    @property
+    def parsed_payload(self) -> dict | None:
+        if self.payload:
+            return json.loads(self.payload)
+        return None
+
+
+def decode_previous(stream_id: bytes, fields: dict[bytes, bytes]) -> EngineStateCmd:
+    """The previous path: fields decoded by the broker, then validated thrice."""
+    key_event = RedisKeyEvent.model_validate(
+        {k.decode(): v.decode() for k, v in fields.items()}
+    )
+    sid = stream_id.decode()
+    engine_key = key_event.key.removeprefix("xrayEngines:")
+    version = Version.from_stream_id(sid)
+
+    if key_event.event == "expired":
+        return EngineStateCmd(
+            id=UUID(engine_key), version=version, caused_by=f"{STREAM}:{sid}"
+        )
+
+    payload = key_event.parsed_payload
+    assert payload is not None
+    payload["id"] = engine_key
+    engine = EngineCmd.model_validate(EngineInfoDTO.model_validate_strings(payload))
+    return EngineStateCmd(
+        id=engine.id, version=version, caused_by=f"{STREAM}:{sid}", engine=engine
+    )
+
+
+def entries(count: int) -> list[tuple[bytes, dict[bytes, bytes]]]:
+    """Stream entries as the engines write them: mostly `hset`, some `expired`."""
+    result = []
+    for i in range(count):
+        key = f"xrayEngines:{uuid4()}".encode()
+        stream_id = f"{1_760_000_000_000 + i}-0".encode()
+        if i % 10 == 9:
+            result.append((stream_id, {b"event": b"expired", b"key": key}))
+            continue
+
+        payload = dict(
+            created=datetime.now(timezone.utc).isoformat(),
+            running="true" if i % 2 else "false",
+            uuid=str(uuid4()),
+            addr=f"10.0.{i % 256}.{i % 200}:8080",
+        )
+        result.append(
+            (
+                stream_id,
+                {
+                    b"event": b"hset",
+                    b"key": key,
+                    b"payload": json.dumps(payload).encode(),
+                },
+            )
+        )
+    return result
+
+
+def main():
+    batch = entries(BATCH)
+    assert [decode_previous(*e) for e in batch] == [
+        decode_keyevent(*e, stream=STREAM) for e in batch
+    ]
+
+    entry = batch[0]
+    report(
+        "Decoding one hset keyevent",
+        [
+            ("previous", *measure(lambda: decode_previous(*entry), number=NUMBER)),
+            (
+                "decode_keyevent",
+                *measure(lambda: decode_keyevent(*entry, stream=STREAM), number=NUMBER),
+            ),
+        ],
+    )
+    report(
+        f"Decoding a batch of {BATCH} keyevents",
+        [
+            (
+                "previous",
+                *measure(lambda: [decode_previous(*e) for e in batch], number=NUMBER),
+            ),
+            (
+                "decode_keyevent",
+                *measure(
+                    lambda: [decode_keyevent(*e, stream=STREAM) for e in batch],
+                    number=NUMBER,
+                ),
+            ),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
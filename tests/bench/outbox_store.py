@@ -0,0 +1,139 @@
+"""
+Outbox storing: `PgOutboxRepository.store` against the previous path of one
+`INSERT` per event, serialized with a `json.dumps`/`json.loads` round trip.
+
+Serialization is measured everywhere; storing needs the configured Postgres
+and is rolled back after every run.
+
+    python -m tests.bench.outbox_store
+"""
+
+import asyncio
+import json
+import time
+from uuid import NAMESPACE_URL, uuid4, uuid5
+
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domains.engine import EngineStatus, EngineUpdated
+from app.domains.event import DomainEvent
+from app.infra.database.models import Outbox
+from app.infra.database.repositories.outbox import PgOutboxRepository, outbox_row
+from tests.bench.common import measure, report
+
+SIZES = [1, 10, 100, 1000]
+NUMBER = 20  # Timed runs of every case
+
+
+def previous_row(ev: DomainEvent, *, caused_by: str) -> dict:
+    oid = uuid5(NAMESPACE_URL, f"{caused_by}:{ev.id}")
+    return dict(
+        id=oid,
+        caused_by=caused_by,
+        aggregate_id=ev.aggregate_id,
+        body=json.loads(json.dumps(ev.to_dict(), default=str)),
+        created_at=outbox_row(ev, caused_by=caused_by)["created_at"],
+    )
+
+
+async def previous_store(session: AsyncSession, events: list[DomainEvent]):
+    for ev in events:
+        stmt = (
+            pg_insert(Outbox)
+            .values(**previous_row(ev, caused_by=str(ev.id)))
+            .on_conflict_do_nothing(index_elements=["id", "created_at"])
+        )
+        await session.execute(stmt)
+
+
+async def store(session: AsyncSession, events: list[DomainEvent]):
+    await PgOutboxRepository(session).store(
+        events, caused_by=[str(ev.id) for ev in events]
+    )
+
+
+def generate(size: int) -> list[DomainEvent]:
+    ts = int(time.time() * 1000)
+    return [
+        EngineUpdated(uuid4(), f"{ts}-{i}", uuid4(), EngineStatus.ACTIVE)
+        for i in range(size)
+    ]
+
+
+def bench_serialization():
+    for size in SIZES:
+        events = generate(size)
+        report(
+            f"Serializing {size} events",
+            [
+                (
+                    "previous",
+                    *measure(
+                        lambda: [previous_row(ev, caused_by="c") for ev in events],
+                        number=NUMBER,
+                    ),
+                ),
+                (
+                    "outbox_row",
+                    *measure(
+                        lambda: [outbox_row(ev, caused_by="c") for ev in events],
+                        number=NUMBER,
+                    ),
+                ),
+            ],
+        )
+
+
+async def bench_store():
+    from app.container import Container
+    from app.infra.config import settings
+
+    container = Container()
+    container.config.from_pydantic(settings)
+    engine = container.tx_engine()
+
+    round_trips = 0
+
+    def count(*_):
+        nonlocal round_trips
+        round_trips += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+        for size in SIZES:
+            print(f"Storing {size} events")
+            for name, fn in (("previous", previous_store), ("store", store)):
+                elapsed = 0.0
+                round_trips = 0
+                for _ in range(NUMBER):
+                    events = generate(size)
+                    async with engine.connect() as conn:
+                        session = AsyncSession(bind=conn)
+                        started = time.perf_counter()
+                        await fn(session, events)
+                        elapsed += time.perf_counter() - started
+                        await session.rollback()
+
+                print(
+                    f"  {name:<24} {elapsed / NUMBER * 1e3:>10.2f} ms"
+                    f" {round_trips // NUMBER:>6} round trips"
+                )
+    finally:
+        await engine.dispose()
+
+
+def main():
+    bench_serialization()
+    try:
+        asyncio.run(bench_store())
+    except Exception as e:
+        print(f"Storing is not measured: {e!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from dependency_injector import providers
+from sqlalchemy import text
+
+
+@pytest.fixture
+def container():
+    """Container of the configured database; tests are skipped without one."""
+    try:
+        from app.infra.config import settings
+    except Exception:
+        pytest.skip("Settings are not configured.")
+
+    from app.container import Container
+
+    container = Container()
+    container.config.from_pydantic(settings)
+    container.config.engines.snapshot_backend.from_value("local")
+    container.engine_manager.override(providers.Object(None))
+
+    async def ping():
+        engine = container.plain_engine()
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(ping())
+    except Exception:
+        pytest.skip("Postgres is not reachable.")
+    return container
+
+
+@pytest.fixture
+def run(container):
+    """Run a coroutine in a fresh event loop, closing the pools afterwards."""
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await container.plain_engine().dispose()
+                await container.tx_engine().dispose()
+
+        return asyncio.run(main())
+
+    return run
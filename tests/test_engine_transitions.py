@@ -0,0 +1,204 @@
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.domains.engine import Engine, EngineStatus, Version
+from app.infra.database.models import Engine as EngineModel
+from app.infra.database.models import Outbox
+from app.schemas.engine import EngineCmd
+from app.services.engine import EngineService
+
+OLD_UUID = UUID(int=1)
+NEW_UUID = UUID(int=2)
+
+# Stored engine (status, uuid) or None, then the upsert (running, uuid)
+SCENARIOS = {
+    "created": (None, (False, OLD_UUID)),
+    "unchanged": ((EngineStatus.READY, OLD_UUID), (False, OLD_UUID)),
+    "started": ((EngineStatus.READY, OLD_UUID), (True, OLD_UUID)),
+    "uuid_changed": ((EngineStatus.ACTIVE, OLD_UUID), (True, NEW_UUID)),
+    "uuid_cleared": ((EngineStatus.ACTIVE, OLD_UUID), (True, None)),
+    "restored": ((EngineStatus.DEAD, OLD_UUID), (True, OLD_UUID)),
+    "restored_same": ((EngineStatus.DEAD, OLD_UUID), (False, OLD_UUID)),
+}
+
+
+async def _transit(
+    container, id: UUID, scenario: str, *, ts: int, fast: bool, stale: bool
+):
+    stored, (running, uuid) = SCENARIOS[scenario]
+    uow = container.engine_uow()
+    created = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    async with uow.begin(with_tx=True) as ctx:
+        await ctx.outbox._session.execute(
+            delete(Outbox).where(Outbox.body["aggregate_id"].astext == str(id))
+        )
+        await ctx.outbox._session.execute(
+            delete(EngineModel).where(EngineModel.id == id)
+        )
+        if stored is not None:
+            status, stored_uuid = stored
+            await ctx.engines.save(
+                Engine(
+                    id=id,
+                    uuid=stored_uuid,
+                    status=status,
+                    created=created,
+                    addr="addr",
+                    version=Version(ts, 1),
+                )
+            )
+
+    service = EngineService(
+        uow, None, logger=logging.getLogger(__name__), fast_transitions=fast
+    )
+    await service.upsert(
+        EngineCmd(id=id, uuid=uuid, running=running, created=created, addr="addr"),
+        caused_by=f"{ts}-0",
+        version=Version(ts, 0 if stale else 2),
+    )
+
+    async with uow.begin(with_tx=False) as ctx:
+        engine = await ctx.engines.get(id)
+        rows = await ctx.outbox._session.execute(
+            select(Outbox.id, Outbox.caused_by, Outbox.aggregate_id, Outbox.body)
+            .where(Outbox.body["aggregate_id"].astext == str(id))
+            .order_by(Outbox.id)
+        )
+        events = []
+        for row in rows:
+            body = dict(row.body)
+            body.pop("occurred_at")
+            events.append((row.id, row.caused_by, row.aggregate_id, body))
+
+    assert engine is not None
+    return (engine.status, engine.uuid, engine.version.seq), events
+
+
+@pytest.mark.parametrize("stale", [False, True])
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_fast_upsert_matches_aggregate(container, run, scenario, stale):
+    if stale and SCENARIOS[scenario][0] is None:
+        pytest.skip("A missing engine has no version to be stale against.")
+
+    id = uuid4()
+    ts = int(time.time() * 1000)
+
+    async def main():
+        expected = await _transit(
+            container, id, scenario, ts=ts, fast=False, stale=stale
+        )
+        actual = await _transit(container, id, scenario, ts=ts, fast=True, stale=stale)
+        return expected, actual
+
+    expected, actual = run(main())
+    assert actual == expected
+
+
+UUIDS = [None, OLD_UUID, NEW_UUID]
+SEEDS = range(25)
+STEPS = 10
+
+
+def _generate(seed: int, ts: int) -> list[tuple]:
+    """
+    Random transitions of one engine: upserts of any running flag and uuid
+    and dead marks, at new, duplicate and stale versions.
+    """
+    rng = random.Random(seed)
+    issued: list[Version] = []
+    ops = []
+    for step in range(STEPS):
+        kind = rng.choice(["new", "new", "duplicate", "stale"]) if issued else "new"
+        if kind == "new":
+            version = Version(ts + step, rng.randint(0, 2))
+        elif kind == "duplicate":
+            version = issued[-1]
+        else:
+            version = rng.choice(issued)
+            version = Version(version.ts, version.seq - 1)
+        issued.append(max(issued[-1:] + [version], key=lambda v: (v.ts, v.seq)))
+
+        if rng.random() < 0.3:
+            ops.append(("dead", version))
+        else:
+            ops.append(("upsert", version, rng.random() < 0.5, rng.choice(UUIDS)))
+    return ops
+
+
+async def _replay(container, id: UUID, ops: list[tuple], *, fast: bool):
+    uow = container.engine_uow()
+    created = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    async with uow.begin(with_tx=True) as ctx:
+        await ctx.outbox._session.execute(
+            delete(Outbox).where(Outbox.aggregate_id == id)
+        )
+        await ctx.outbox._session.execute(
+            delete(EngineModel).where(EngineModel.id == id)
+        )
+
+    service = EngineService(
+        uow, None, logger=logging.getLogger(__name__), fast_transitions=fast
+    )
+    states = []
+    for op in ops:
+        version = op[1]
+        try:
+            if op[0] == "dead":
+                await service.mark_dead(
+                    id, caused_by=version.to_stream_id(), version=version
+                )
+            else:
+                _, _, running, uuid = op
+                await service.upsert(
+                    EngineCmd(
+                        id=id, uuid=uuid, running=running, created=created, addr="addr"
+                    ),
+                    caused_by=version.to_stream_id(),
+                    version=version,
+                )
+        except Exception as e:
+            states.append(type(e).__name__)
+            continue
+
+        async with uow.begin(with_tx=False) as ctx:
+            engine = await ctx.engines.get(id)
+        states.append(
+            engine and (engine.status, engine.uuid, engine.version.to_stream_id())
+        )
+
+    async with uow.begin(with_tx=False) as ctx:
+        rows = await ctx.outbox._session.execute(
+            select(Outbox.id, Outbox.caused_by, Outbox.aggregate_id, Outbox.body)
+            .where(Outbox.aggregate_id == id)
+            .order_by(Outbox.id)
+        )
+        events = []
+        for row in rows:
+            body = dict(row.body)
+            body.pop("occurred_at")
+            events.append((row.id, row.caused_by, row.aggregate_id, body))
+
+    return states, events
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_fast_transitions_match_aggregate_on_generated_sequences(container, run, seed):
+    id = uuid4()
+    ops = _generate(seed, int(time.time() * 1000))
+
+    async def main():
+        expected = await _replay(container, id, ops, fast=False)
+        actual = await _replay(container, id, ops, fast=True)
+        return expected, actual
+
+    (expected_states, expected_events), (actual_states, actual_events) = run(main())
+    assert actual_states == expected_states, ops
+    assert actual_events == expected_events, ops
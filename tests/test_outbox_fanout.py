@@ -0,0 +1,109 @@
+import logging
+import time
+from uuid import uuid4
+
+from sqlalchemy import delete, func, select, text
+
+from app.domains.engine import EngineDead, EngineStatus, EngineUpdated
+from app.infra.database.models import Outbox
+from app.infra.database.ownership import OwnedPartitions
+from app.infra.database.repositories.outbox import outbox_row
+from app.services.outbox import OutboxService
+
+ALL_PARTITIONS = OwnedPartitions(owned=frozenset({0}), count=1)
+
+
+class FailingPlanner:
+    """Planner whose fan-out statement fails, aborting what it runs in."""
+
+    async def spawn_engine_delivery_tasks(self, records, *, ctx):
+        await ctx._session.execute(text("SELECT 1 / 0"))
+
+
+def test_fanout_error_keeps_relay_running(container, run):
+    event = EngineDead(uuid4(), f"{int(time.time() * 1000)}-0")
+    uow = container.outbox_uow()
+    service = OutboxService(
+        uow,
+        FailingPlanner(),  # type: ignore
+        logger=logging.getLogger(__name__),
+    )
+
+    async def main():
+        async with uow.begin(with_tx=True) as ctx:
+            await ctx.outbox.store([event], caused_by=str(event.id))
+
+        # Relay loop iterations: the failure is recorded, not raised
+        await service.process_outbox_batch(ALL_PARTITIONS)
+        await service.process_outbox_batch(ALL_PARTITIONS)
+
+        async with uow.begin(with_tx=False) as ctx:
+            return (
+                await ctx.outbox._session.execute(
+                    select(Outbox.fanned_out, Outbox.attempts).where(
+                        Outbox.aggregate_id == event.aggregate_id
+                    )
+                )
+            ).one()
+
+    fanned_out, attempts = run(main())
+    assert not fanned_out
+    assert attempts == 1
+
+
+def test_store_skips_stored_events(container, run):
+    event = EngineDead(uuid4(), f"{int(time.time() * 1000)}-0")
+    uow = container.outbox_uow()
+
+    async def main():
+        for _ in range(2):
+            async with uow.begin(with_tx=True) as ctx:
+                await ctx.outbox.store([event], caused_by=str(event.id))
+
+        async with uow.begin(with_tx=False) as ctx:
+            return await ctx.outbox._session.scalar(
+                select(func.count()).where(Outbox.aggregate_id == event.aggregate_id)
+            )
+
+    assert run(main()) == 1
+
+
+def test_claim_skips_locked_records(container, run):
+    ts = int(time.time() * 1000)
+    dead = EngineDead(uuid4(), f"{ts}-0")
+    # Stored after `dead`, of the same aggregate
+    updated = EngineUpdated(dead.aggregate_id, f"{ts}-1", uuid4(), EngineStatus.ACTIVE)
+    other = EngineDead(uuid4(), f"{ts}-2")
+
+    events = [dead, updated, other]
+    uow = container.outbox_uow()
+
+    async def main():
+        async with uow.begin(with_tx=True) as ctx:
+            await ctx.outbox.store(events, caused_by=[str(ev.id) for ev in events])
+
+        try:
+            # The previous owner, still relaying `dead`
+            async with uow.begin(with_tx=True) as owner:
+                await owner.outbox._session.execute(
+                    select(Outbox.id)
+                    .where(Outbox.id == outbox_row(dead, caused_by=str(dead.id))["id"])
+                    .with_for_update()
+                )
+                async with uow.begin(with_tx=True) as ctx:
+                    claimed = await ctx.outbox.claim_batch(
+                        1000, max_attempts=5, partitions=ALL_PARTITIONS
+                    )
+            return {record.event.id for record in claimed}
+        finally:
+            async with uow.begin(with_tx=True) as ctx:
+                await ctx.outbox._session.execute(
+                    delete(Outbox).where(
+                        Outbox.aggregate_id.in_([ev.aggregate_id for ev in events])
+                    )
+                )
+
+    claimed = run(main())
+    assert other.id in claimed
+    assert dead.id not in claimed
+    assert updated.id not in claimed
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import text
+
+from app.infra.database.repositories.partitions import partition_name
+
+# Far ahead of the partitions made by maintenance
+LOWER = datetime(2100, 1, 1, tzinfo=timezone.utc)
+UPPER = LOWER + timedelta(days=1)
+
+
+def test_create_partition_moves_default_rows(container, run):
+    uow = container.outbox_uow()
+    id = uuid4()
+
+    async def main():
+        async with uow.begin(with_tx=True) as ctx:
+            partitions = await ctx.partitions.get_partitions("outbox")
+            if any(p.name == partition_name("outbox", LOWER) for p in partitions):
+                await ctx.partitions.remove_partition(
+                    "outbox", partition_name("outbox", LOWER), drop=True
+                )
+            default = next(p.name for p in partitions if p.is_default)
+
+            await ctx.outbox._session.execute(
+                text(
+                    "INSERT INTO outbox (id, caused_by, body, created_at, attempts, "
+                    "fanned_out, next_attempt_at) "
+                    "VALUES (:id, 'test', '{}', :created_at, 0, true, now())"
+                ),
+                dict(id=id, created_at=LOWER + timedelta(hours=1)),
+            )
+
+        try:
+            async with uow.begin(with_tx=True) as ctx:
+                created = await ctx.partitions.create_partition(
+                    "outbox", lower=LOWER, upper=UPPER, default=default
+                )
+                # Another runner which saw the day without a partition
+                again = await ctx.partitions.create_partition(
+                    "outbox", lower=LOWER, upper=UPPER, default=default
+                )
+                stored_in = await ctx.outbox._session.scalar(
+                    text("SELECT tableoid::regclass::text FROM outbox WHERE id = :id"),
+                    dict(id=id),
+                )
+                return created, again, stored_in
+        finally:
+            async with uow.begin(with_tx=True) as ctx:
+                await ctx.outbox._session.execute(
+                    text("DELETE FROM outbox WHERE id = :id"), dict(id=id)
+                )
+                if any(
+                    p.name == partition_name("outbox", LOWER)
+                    for p in await ctx.partitions.get_partitions("outbox")
+                ):
+                    await ctx.partitions.remove_partition(
+                        "outbox", partition_name("outbox", LOWER), drop=True
+                    )
+
+    (name, moved), again, stored_in = run(main())
+    assert moved == 1
+    assert again == (name, 0)
+    assert stored_in.rpartition(".")[2] == name